@@ -0,0 +1,111 @@
+"""
+Benchmark PDF text extraction on a generated corpus.
+
+    python bench_pdf_extraction.py --docs 20 --pages 1 5 40
+
+Builds multi-page PDFs in memory (same minimal structure as create_dummy_pdf.py,
+with computed xref offsets) and times:
+  - pdfplumber, sequential (the old _extract_pdf_text)
+  - fast path (pypdfium2) in-thread
+  - pooled: process pool + page-range parallelism
+  - cached: second pass over the same bytes
+"""
+import argparse
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List
+
+import pdf_extraction
+from pdf_extraction import (
+    _extract_range_fast,
+    _extract_range_pdfplumber,
+    extract_pdf_text_pooled,
+    get_extraction_executor,
+)
+
+LINES_PER_PAGE = 40
+
+
+def make_pdf(pages: int, seed: int = 0) -> bytes:
+    objects = []
+    kids = " ".join(f"{3 + i * 2} 0 R" for i in range(pages))
+    objects.append(b"<< /Type /Catalog /Pages 2 0 R >>")
+    objects.append(f"<< /Type /Pages /Kids [{kids}] /Count {pages} >>".encode())
+    for i in range(pages):
+        content_id = 4 + i * 2
+        objects.append(
+            (
+                "<< /Type /Page /Parent 2 0 R "
+                "/Resources << /Font << /F1 << /Type /Font /Subtype /Type1 /BaseFont /Helvetica >> >> >> "
+                f"/MediaBox [0 0 595 842] /Contents {content_id} 0 R >>"
+            ).encode()
+        )
+        lines = ["BT", "/F1 10 Tf", "50 800 Td", "12 TL"]
+        for n in range(LINES_PER_PAGE):
+            lines.append(f"(Doc {seed} page {i + 1} line {n + 1}: Python, SQL, AWS, Docker, Kubernetes) '")
+        lines.append("ET")
+        stream = "\n".join(lines).encode()
+        objects.append(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n" % number + body + b"\nendobj\n"
+
+    xref_at = len(out)
+    out += b"xref\n0 %d\n" % (len(objects) + 1)
+    out += b"0000000000 65535 f \n"
+    for offset in offsets:
+        out += b"%010d 00000 n \n" % offset
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref_at)
+    return bytes(out)
+
+
+def _time(label: str, corpus: List[bytes], fn: Callable[[bytes], str], concurrency: int = 1):
+    samples = []
+
+    def run(doc: bytes):
+        start = time.perf_counter()
+        fn(doc)
+        samples.append((time.perf_counter() - start) * 1000)
+
+    wall = time.perf_counter()
+    if concurrency > 1:
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            list(pool.map(run, corpus))
+    else:
+        for doc in corpus:
+            run(doc)
+    wall_ms = (time.perf_counter() - wall) * 1000
+    print(
+        f"  {label:<28} total {wall_ms:9.1f} ms   "
+        f"p50 {statistics.median(samples):8.1f} ms   max {max(samples):8.1f} ms"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--docs", type=int, default=20, help="documents per size")
+    parser.add_argument("--pages", type=int, nargs="+", default=[1, 5, 40], help="page counts to test")
+    parser.add_argument("--concurrency", type=int, default=4, help="concurrent callers for the pooled run")
+    args = parser.parse_args()
+
+    get_extraction_executor().submit(int).result()  # spawn workers outside the timings
+
+    for pages in args.pages:
+        corpus = [make_pdf(pages, seed=(pages * 1000 + i)) for i in range(args.docs)]
+        print(f"\n{args.docs} docs x {pages} pages ({sum(map(len, corpus)) // 1024} KB)")
+        _time("pdfplumber sequential", corpus, lambda d, p=pages: _extract_range_pdfplumber(d, 0, p))
+        _time("fast path sequential", corpus, lambda d, p=pages: _extract_range_fast(d, 0, p))
+        with pdf_extraction._cache_lock:
+            pdf_extraction._text_cache.clear()
+        _time("pooled (cold cache)", corpus, extract_pdf_text_pooled, concurrency=args.concurrency)
+        _time("pooled (cached)", corpus, extract_pdf_text_pooled, concurrency=args.concurrency)
+
+    print(f"\nstats: {pdf_extraction.get_pdf_extraction_stats()}")
+
+
+if __name__ == "__main__":
+    main()
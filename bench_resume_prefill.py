@@ -0,0 +1,187 @@
+"""
+Rule-based prefill vs the LLM parse: latency, field coverage and agreement.
+
+    python bench_resume_prefill.py --docs 200                 # synthetic resumes with known fields
+    python bench_resume_prefill.py --dir ./resumes            # .pdf/.txt files, agreement needs --llm
+    python bench_resume_prefill.py --dir ./resumes --llm      # also run the full Gemini parse per file
+
+Reports per-document latency of prefill_resume / parse_resume_offline (and the
+LLM parse with --llm), and for each prefilled field how often the rules found
+it ("coverage") and how often they agree with the reference ("agree"). The
+reference is the generator's ground truth for synthetic docs, or the LLM parse.
+Synthetic docs follow a few tidy layouts, so their agreement is an upper
+bound; use --dir with real resumes and --llm for representative numbers.
+"prompt" is the average size of the field list + response schema the LLM
+call no longer carries because of the prefilled email/phone.
+"""
+import argparse
+import json
+import os
+import random
+import re
+import statistics
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from resume_parser import RESUME_SCHEMA, _field_guide, _is_prefilled, _object_schema, _parse_resume_text_uncached
+from resume_prefill import PREFILL_FIELDS, SKILL_ALIASES, parse_resume_offline, prefill_resume
+
+_FIRST = ["Jane", "Arjun", "Maria", "Wei", "Olu", "Sofia", "Liam", "Priya", "Diego", "Hannah"]
+_LAST = ["Doe", "Sharma", "Garcia", "Zhang", "Adeyemi", "Rossi", "Murphy", "Nair", "Lopez", "Schmidt"]
+_TITLES = ["Senior Data Engineer", "Backend Developer", "Machine Learning Engineer", "Product Manager",
+           "DevOps Engineer", "Frontend Developer", "Data Analyst", "Solutions Architect"]
+_PHONES = ["+1 (415) 555-{n:04d}", "+91 98450 {n:05d}", "415.555.{n:04d}", "+44 20 7946 {n:04d}"]
+
+
+def _synthetic(i: int, rng: random.Random) -> Tuple[str, Dict[str, Any]]:
+    name = f"{rng.choice(_FIRST)} {rng.choice(_LAST)}"
+    title = rng.choice(_TITLES)
+    email = f"{name.lower().replace(' ', '.')}{i}@example.com"
+    phone = rng.choice(_PHONES).format(n=rng.randrange(10000))
+    years = rng.randint(1, 20)
+    skills = rng.sample(sorted(SKILL_ALIASES), 8)
+    header = rng.choice([
+        f"{name.upper()}\n{title}\n{email} | {phone}",
+        f"{name} | {title} | {email} | {phone}",
+        f"Resume\n{name}\n{email}\n{phone}\n{title}",
+    ])
+    text = f"""{header}
+
+SUMMARY
+{title} with {years}+ years of experience delivering production systems.
+
+Technical Skills:
+{", ".join(rng.choice(SKILL_ALIASES[s]) for s in skills)}
+
+EXPERIENCE
+{title}, Acme Corp, {2024 - years} - 2024
+- Built and operated services used by millions of users.
+
+EDUCATION
+Bachelor of Science in Computer Science, State University, {2024 - years - 4}
+"""
+    truth = {
+        "candidate_name": name,
+        "email": email,
+        "phone": phone,
+        "current_title": title,
+        "total_experience_years": years,
+        "skills": skills,
+    }
+    return text, truth
+
+
+def _load_dir(path: str) -> List[Tuple[str, str]]:
+    from pdf_extraction import extract_pdf_text_pooled
+
+    docs = []
+    for name in sorted(os.listdir(path)):
+        full = os.path.join(path, name)
+        if name.lower().endswith(".pdf"):
+            with open(full, "rb") as fh:
+                docs.append((name, extract_pdf_text_pooled(fh.read())))
+        elif name.lower().endswith(".txt"):
+            with open(full, encoding="utf-8", errors="replace") as fh:
+                docs.append((name, fh.read()))
+    return [(name, text) for name, text in docs if text and text.strip()]
+
+
+def _norm(field: str, value: Any) -> Any:
+    if value is None:
+        return None
+    if field == "phone":
+        return re.sub(r"\D", "", str(value))[-10:]
+    if field == "total_experience_years":
+        try:
+            return round(float(value))
+        except (TypeError, ValueError):
+            return None
+    return " ".join(str(value).lower().split())
+
+
+def _agrees(field: str, ours: Any, reference: Any) -> bool:
+    ours, reference = _norm(field, ours), _norm(field, reference)
+    if field == "total_experience_years":
+        return reference is not None and abs(ours - reference) <= 1
+    if field == "current_title":
+        return bool(reference) and (ours in reference or reference in ours)
+    return ours == reference
+
+
+def _timed(fn: Callable[[str], Any], texts: List[str]) -> Tuple[List[Any], List[float]]:
+    results, samples = [], []
+    for text in texts:
+        start = time.perf_counter()
+        results.append(fn(text))
+        samples.append((time.perf_counter() - start) * 1000)
+    return results, samples
+
+
+def _latency(label: str, samples: List[float]):
+    ordered = sorted(samples)
+    p95 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+    print(f"  {label:<16} p50 {statistics.median(ordered):9.3f} ms   p95 {p95:9.3f} ms")
+
+
+def _prompt_saving(prefilled: Dict[str, Any]) -> int:
+    all_fields = list(RESUME_SCHEMA["properties"])
+    asked = [f for f in all_fields if not _is_prefilled(f, prefilled)]
+    size = lambda fields: len(_field_guide(fields)) + len(json.dumps(_object_schema(fields)))
+    return size(all_fields) - size(asked)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--docs", type=int, default=200, help="synthetic documents (ignored with --dir)")
+    parser.add_argument("--dir", help="directory of .pdf/.txt resumes")
+    parser.add_argument("--llm", action="store_true", help="run the full Gemini parse as the reference")
+    args = parser.parse_args()
+
+    truths: List[Optional[Dict[str, Any]]]
+    if args.dir:
+        docs = _load_dir(args.dir)
+        texts = [text for _, text in docs]
+        truths = [None] * len(texts)
+    else:
+        rng = random.Random(7)
+        pairs = [_synthetic(i, rng) for i in range(args.docs)]
+        texts = [text for text, _ in pairs]
+        truths = [truth for _, truth in pairs]
+    if not texts:
+        raise SystemExit("no documents")
+
+    print(f"{len(texts)} documents, avg {statistics.mean(len(t) for t in texts):.0f} chars")
+    prefills, prefill_ms = _timed(prefill_resume, texts)
+    offlines, offline_ms = _timed(parse_resume_offline, texts)
+    _latency("prefill", prefill_ms)
+    _latency("offline parse", offline_ms)
+
+    if args.llm:
+        # prefill=False: the LLM extracts every field, including the prefilled ones.
+        llm, llm_ms = _timed(lambda text: _parse_resume_text_uncached(text, prefill=False), texts)
+        _latency("LLM parse", llm_ms)
+        truths = [t or l for t, l in zip(truths, llm)]
+
+    print(f"\n  {'field':<24}{'coverage':>10}{'agree':>10}")
+    for field in PREFILL_FIELDS:
+        found = [(p[field], t) for p, t in zip(prefills, truths) if field in p]
+        judged = [(ours, t.get(field)) for ours, t in found if t and t.get(field) is not None]
+        agree = sum(_agrees(field, ours, ref) for ours, ref in judged)
+        agree_txt = f"{agree / len(judged):.1%}" if judged else "n/a"
+        print(f"  {field:<24}{len(found) / len(texts):>10.1%}{agree_txt:>10}")
+
+    recalls = []
+    for offline, truth in zip(offlines, truths):
+        if truth and truth.get("skills"):
+            reference = {s.lower() for s in truth["skills"]}
+            ours = {s.lower() for s in offline["skills"]}
+            recalls.append(len(ours & reference) / len(reference))
+    if recalls:
+        print(f"  {'skills (dictionary)':<24}{'':>10}{statistics.mean(recalls):>10.1%}  recall vs reference")
+
+    saved = [_prompt_saving(p) for p in prefills]
+    print(f"\n  prompt: {statistics.mean(saved):.0f} chars of field list + schema skipped per resume (avg)")
+
+
+if __name__ == "__main__":
+    main()
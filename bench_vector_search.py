@@ -0,0 +1,104 @@
+"""
+Compare top-K latency of the local NumPy index against pgvector.
+
+    python bench_vector_search.py --rows 50000 --queries 200
+    python bench_vector_search.py --jd-id <memories.id> --queries 50   # also time pgvector
+
+The local index is always benchmarked on synthetic unit vectors (float32 and
+float16, in RAM and memory-mapped). With --jd-id the pgvector path in
+ranking.py is timed against the live database for the same top_k, along
+with the per-match explanation query (explain_matches) over its results.
+"""
+import argparse
+import json
+import statistics
+import tempfile
+import time
+from typing import Callable, List
+
+import numpy as np
+
+from local_vector_index import LocalVectorIndex
+
+DIM = 768
+
+
+def _time(label: str, runs: int, fn: Callable[[int], object]):
+    samples: List[float] = []
+    for i in range(runs):
+        start = time.perf_counter()
+        fn(i)
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    p95 = samples[min(len(samples) - 1, int(len(samples) * 0.95))]
+    print(f"  {label:<34} p50 {statistics.median(samples):8.2f} ms   p95 {p95:8.2f} ms")
+
+
+def _synthetic_index(directory: str, dtype: str, rows: int, rng: np.random.Generator) -> LocalVectorIndex:
+    matrix = rng.standard_normal((rows, DIM), dtype=np.float32)
+    matrix /= np.linalg.norm(matrix, axis=1, keepdims=True)
+    index = LocalVectorIndex(directory=directory, dtype=dtype)
+    index._base = matrix.astype(dtype)
+    index._base_ids = [f"r{i}" for i in range(rows)]
+    index._base_info = [(f"Candidate {i}", "Engineer", f"r{i}.pdf") for i in range(rows)]
+    index._base_alive = np.ones(rows, dtype=bool)
+    return index
+
+
+def _snapshot_reload(index: LocalVectorIndex) -> LocalVectorIndex:
+    """Write the synthetic base the way build_snapshot() does, then reopen it memory-mapped."""
+    matrix_path, meta_path = index._paths()
+    np.save(matrix_path, np.asarray(index._base))
+    with open(meta_path, "w", encoding="utf-8") as f:
+        json.dump(
+            {"dtype": index.dtype.name, "ids": index._base_ids, "info": index._base_info, "watermark": None},
+            f,
+        )
+    reopened = LocalVectorIndex(directory=index.directory, dtype=index.dtype.name)
+    start = time.perf_counter()
+    reopened._load_snapshot()
+    print(f"  snapshot open (mmap)               {((time.perf_counter() - start) * 1000):8.2f} ms")
+    return reopened
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=50000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--jd-id", default=None, help="memories.id of a JD to time the pgvector path with")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(7)
+    queries = rng.standard_normal((args.queries, DIM), dtype=np.float32)
+
+    for dtype in ("float32", "float16"):
+        with tempfile.TemporaryDirectory() as directory:
+            print(f"\nlocal index: {args.rows} x {DIM} {dtype}")
+            index = _synthetic_index(directory, dtype, args.rows, rng)
+            _time("in RAM", args.queries, lambda i: index.search(queries[i], args.top_k))
+            mapped = _snapshot_reload(index)
+            _time("memory-mapped", args.queries, lambda i: mapped.search(queries[i], args.top_k))
+
+    if args.jd_id:
+        from ranking import get_top_k_resumes_for_jd_memory
+        import ranking
+
+        print(f"\npgvector (live DB, jd={args.jd_id})")
+        ranking.VECTOR_SEARCH_BACKEND = "pgvector"
+        _time("get_top_k_resumes_for_jd_memory", args.queries, lambda i: get_top_k_resumes_for_jd_memory(args.jd_id, args.top_k))
+        matches = get_top_k_resumes_for_jd_memory(args.jd_id, args.top_k, explain=False)
+        _time(
+            f"explain_matches ({len(matches)} matches)",
+            args.queries,
+            lambda i: ranking.explain_matches({args.jd_id: [dict(m) for m in matches]}),
+        )
+
+        from local_vector_index import search_local_index
+
+        search_local_index(args.jd_id, args.top_k)  # initial sync outside the timings
+        _time("local index (live DB sync)", args.queries, lambda i: search_local_index(args.jd_id, args.top_k))
+
+
+if __name__ == "__main__":
+    main()
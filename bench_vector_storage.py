@@ -0,0 +1,171 @@
+"""
+Recall / latency / size of the three embedding representations.
+
+    python bench_vector_storage.py --rows 20000 --queries 100
+    python bench_vector_storage.py --rows 20000 --queries 100 --db   # also build and time them in Postgres
+
+  vector   float32, exact cosine (ground truth)
+  halfvec  float16 storage (EMBEDDING_STORAGE=halfvec)
+  binary   Hamming top-N on sign bits, exact re-rank (VECTOR_PREFILTER=binary)
+
+The offline pass scores clustered synthetic unit vectors with NumPy and
+reports recall@k against float32 and bytes per row. With --db the same data
+goes into TEMP tables (dropped with the session) with the HNSW indexes
+migrations.py builds, and each representation is timed through SQL.
+Binary recall depends on how clustered the embeddings are, so treat the
+synthetic numbers as indicative.
+"""
+import argparse
+import statistics
+import time
+from typing import Callable, List
+
+import numpy as np
+
+from vector_codec import vector_param
+
+DIM = 768
+# pgvector on-disk sizes: 8-byte header + payload.
+ROW_BYTES = {"vector": 8 + 4 * DIM, "halfvec": 8 + 2 * DIM, "binary": 8 + DIM // 8}
+
+
+def _clustered(rows: int, rng: np.random.Generator, centers: np.ndarray) -> np.ndarray:
+    data = centers[rng.integers(0, len(centers), rows)] + 0.6 * rng.standard_normal((rows, DIM), dtype=np.float32)
+    return data / np.linalg.norm(data, axis=1, keepdims=True)
+
+
+def _recall(found: List[List[int]], truth: np.ndarray) -> float:
+    k = truth.shape[1]
+    hits = sum(len(set(f[:k]) & set(t.tolist())) for f, t in zip(found, truth))
+    return hits / (k * len(truth))
+
+
+def _top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    part = np.argpartition(-scores, k, axis=1)[:, :k]
+    order = np.take_along_axis(scores, part, axis=1).argsort(axis=1)[:, ::-1]
+    return np.take_along_axis(part, order, axis=1)
+
+
+_POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint16)
+
+
+def _bench_offline(data: np.ndarray, queries: np.ndarray, k: int, candidates: int) -> np.ndarray:
+    truth = _top_k(queries @ data.T, k)
+
+    half = data.astype(np.float16).astype(np.float32)
+    half_found = _top_k(queries @ half.T, k).tolist()
+
+    bits = np.packbits(data > 0, axis=1)
+    binary_found = []
+    for q in queries:
+        hamming = _POPCOUNT[np.bitwise_xor(bits, np.packbits(q > 0))].sum(axis=1)
+        cand = np.argpartition(hamming, candidates)[:candidates]
+        exact = data[cand] @ q
+        binary_found.append(cand[np.argsort(-exact)[:k]].tolist())
+
+    print(f"\noffline ({len(data)} rows, recall@{k} vs float32 exact, binary re-ranks top {candidates})")
+    print(f"  {'vector':<8} recall 1.000   {ROW_BYTES['vector']:5d} B/row")
+    print(f"  {'halfvec':<8} recall {_recall(half_found, truth):.3f}   {ROW_BYTES['halfvec']:5d} B/row")
+    print(f"  {'binary':<8} recall {_recall(binary_found, truth):.3f}   {ROW_BYTES['binary']:5d} B/row (index; vectors kept for re-rank)")
+    return truth
+
+
+def _time(label: str, queries: np.ndarray, fn: Callable[[np.ndarray], List[int]], truth: np.ndarray):
+    samples, found = [], []
+    for q in queries:
+        start = time.perf_counter()
+        found.append(fn(q))
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    p95 = samples[min(len(samples) - 1, int(len(samples) * 0.95))]
+    print(
+        f"  {label:<8} recall {_recall(found, truth):.3f}   "
+        f"p50 {statistics.median(samples):7.2f} ms   p95 {p95:7.2f} ms"
+    )
+
+
+def _bench_db(data: np.ndarray, queries: np.ndarray, truth: np.ndarray, k: int, candidates: int):
+    from psycopg2.extras import execute_values
+
+    from db import get_connection
+
+    conn = get_connection()
+    try:
+        cur = conn.cursor()
+        cur.execute(f"CREATE TEMP TABLE bench_vec (id INT PRIMARY KEY, embedding vector({DIM}))")
+        cur.execute(f"CREATE TEMP TABLE bench_half (id INT PRIMARY KEY, embedding halfvec({DIM}))")
+        rows = [(i, vector_param(vec)) for i, vec in enumerate(data)]
+        for table in ("bench_vec", "bench_half"):
+            execute_values(cur, f"INSERT INTO {table} (id, embedding) VALUES %s", rows, page_size=500)
+
+        start = time.perf_counter()
+        cur.execute("CREATE INDEX bench_vec_hnsw ON bench_vec USING hnsw (embedding vector_cosine_ops)")
+        cur.execute("CREATE INDEX bench_half_hnsw ON bench_half USING hnsw (embedding halfvec_cosine_ops)")
+        cur.execute(
+            f"CREATE INDEX bench_vec_bq ON bench_vec USING hnsw "
+            f"((binary_quantize(embedding)::bit({DIM})) bit_hamming_ops)"
+        )
+        print(f"\nPostgres ({len(data)} rows; indexes built in {time.perf_counter() - start:.1f} s)")
+        cur.execute("ANALYZE bench_vec; ANALYZE bench_half;")
+        cur.execute("SELECT set_config('hnsw.ef_search', %s, false)", [str(max(candidates, 100))])
+
+        def search(sql: str, extra: list) -> Callable[[np.ndarray], List[int]]:
+            def run(q: np.ndarray) -> List[int]:
+                cur.execute(sql, [vector_param(q), *extra])
+                return [row[0] for row in cur.fetchall()]
+            return run
+
+        _time("vector", queries, search(
+            "SELECT id FROM bench_vec ORDER BY embedding <=> %s::vector LIMIT %s", [k]), truth)
+        _time("halfvec", queries, search(
+            "SELECT id FROM bench_half ORDER BY embedding <=> %s::halfvec LIMIT %s", [k]), truth)
+        _time("binary", queries, search(
+            f"""
+            WITH q AS (SELECT %s::vector AS v),
+            candidates AS (
+                SELECT id FROM bench_vec
+                ORDER BY binary_quantize(embedding)::bit({DIM}) <~> binary_quantize((SELECT v FROM q))
+                LIMIT %s
+            )
+            SELECT b.id FROM candidates c JOIN bench_vec b ON b.id = c.id
+            ORDER BY b.embedding <=> (SELECT v FROM q)
+            LIMIT %s
+            """, [candidates, k]), truth)
+
+        print("\nsizes")
+        for label, relation, size_fn in (
+            ("vector table", "bench_vec", "pg_table_size"),
+            ("vector hnsw", "bench_vec_hnsw", "pg_relation_size"),
+            ("halfvec table", "bench_half", "pg_table_size"),
+            ("halfvec hnsw", "bench_half_hnsw", "pg_relation_size"),
+            ("bit hnsw", "bench_vec_bq", "pg_relation_size"),
+        ):
+            # pg_table_size: heap + TOAST, without indexes.
+            cur.execute(f"SELECT {size_fn}(%s::regclass)", [relation])
+            print(f"  {label:<14} {cur.fetchone()[0] / 1024 / 1024:8.1f} MB")
+        cur.close()
+    finally:
+        conn.rollback()
+        conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=20000)
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--candidates", type=int, default=200, help="binary pre-filter size (BINARY_PREFILTER_CANDIDATES)")
+    parser.add_argument("--db", action="store_true", help="also load TEMP tables and time pgvector")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(7)
+    centers = rng.standard_normal((64, DIM), dtype=np.float32)
+    data = _clustered(args.rows, rng, centers)
+    queries = _clustered(args.queries, rng, centers)
+    truth = _bench_offline(data, queries, args.top_k, args.candidates)
+    if args.db:
+        _bench_db(data, queries, truth, args.top_k, args.candidates)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""
+Measure the cost of moving embeddings between Python and Postgres.
+
+    python bench_vector_transfer.py --runs 2000
+    python bench_vector_transfer.py --jd-id <memories.id> --runs 200   # also time the live DB
+
+Client side: the old str()-per-element literal vs vector_codec.format_vector,
+for Gemini-style Python float lists and float32 arrays, plus bytes on the wire
+and parsing the column's text form back. With --jd-id, times the similarity
+query both ways: reading the JD vector into Python and sending it back as a
+parameter (the old send_emails/ranking path) vs referencing it server-side.
+"""
+import argparse
+import json
+import statistics
+import time
+from typing import Callable, List
+
+import numpy as np
+
+from vector_codec import format_vector, parse_vector, vector_param
+
+DIM = 768
+
+
+def _old_literal(vec) -> str:
+    return "[" + ",".join(str(x) for x in vec) + "]"
+
+
+def _time(label: str, runs: int, fn: Callable[[], object]):
+    samples: List[float] = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1e6)
+    samples.sort()
+    p95 = samples[min(len(samples) - 1, int(len(samples) * 0.95))]
+    print(f"  {label:<40} p50 {statistics.median(samples):9.1f} us   p95 {p95:9.1f} us")
+
+
+def _bench_client(runs: int):
+    rng = np.random.default_rng(7)
+    as_list = (rng.standard_normal(DIM) * 0.05).tolist()
+    as_array = np.asarray(as_list, dtype=np.float32)
+    old_text = _old_literal(as_list)
+    new_text = format_vector(as_list)
+
+    print(f"\nencode one {DIM}-d embedding")
+    _time("str() per element (list)", runs, lambda: _old_literal(as_list))
+    _time("format_vector (list)", runs, lambda: format_vector(as_list))
+    _time("format_vector (float32 array)", runs, lambda: format_vector(as_array))
+    _time("vector_param(...).getquoted()", runs, lambda: vector_param(as_list).getquoted())
+
+    print("\nliteral size")
+    print(f"  str() per element                        {len(old_text):9d} bytes")
+    print(f"  format_vector                            {len(new_text):9d} bytes")
+    assert np.array_equal(parse_vector(new_text), as_array), "format_vector must round-trip float4"
+
+    print("\ndecode the column's text form")
+    _time("json.loads + np.asarray", runs, lambda: np.asarray(json.loads(new_text), dtype=np.float32))
+    _time("parse_vector", runs, lambda: parse_vector(new_text))
+
+
+def _bench_db(jd_id: str, runs: int):
+    from db import get_connection
+
+    conn = get_connection()
+    try:
+        cur = conn.cursor()
+
+        def round_trip():
+            cur.execute("SELECT embedding::text FROM memories WHERE id = %s", [jd_id])
+            literal = cur.fetchone()[0]
+            cur.execute(
+                "SELECT id FROM resumes WHERE embedding IS NOT NULL ORDER BY embedding <=> %s::vector LIMIT 10",
+                [literal],
+            )
+            cur.fetchall()
+
+        def server_side():
+            cur.execute(
+                """
+                SELECT id FROM resumes WHERE embedding IS NOT NULL
+                ORDER BY embedding <=> (SELECT embedding FROM memories WHERE id = %s) LIMIT 10
+                """,
+                [jd_id],
+            )
+            cur.fetchall()
+
+        print(f"\nlive DB top-10 (jd={jd_id})")
+        round_trip()
+        server_side()
+        _time("JD vector via Python (old)", runs, round_trip)
+        _time("JD vector referenced server-side", runs, server_side)
+        cur.close()
+    finally:
+        conn.rollback()
+        conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=2000)
+    parser.add_argument("--jd-id", default=None, help="memories.id of a JD to time the live query paths with")
+    args = parser.parse_args()
+
+    _bench_client(args.runs)
+    if args.jd_id:
+        _bench_db(args.jd_id, max(1, args.runs // 10))
+
+
+if __name__ == "__main__":
+    main()
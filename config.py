@@ -30,15 +30,144 @@ GEMINI_BASE_URL = "https://generativelanguage.googleapis.com/v1beta"
 
 CHAT_MODEL = get_env("CHAT_MODEL", "gemini-2.0-flash-exp")
 EMBEDDING_MODEL = get_env("EMBEDDING_MODEL", "text-embedding-004")
+
+# Shared Gemini client (see llm_client.py). Per-minute limits are token
+# buckets per process; 0 disables a limit.
+LLM_TIMEOUT_SECONDS = float(get_env("LLM_TIMEOUT_SECONDS", "60"))
+LLM_MAX_RETRIES = int(get_env("LLM_MAX_RETRIES", "4"))
+LLM_RETRY_BASE_SECONDS = float(get_env("LLM_RETRY_BASE_SECONDS", "1"))
+LLM_RETRY_MAX_SECONDS = float(get_env("LLM_RETRY_MAX_SECONDS", "30"))
+LLM_MAX_CONCURRENCY = max(1, int(get_env("LLM_MAX_CONCURRENCY", "8")))
+LLM_REQUESTS_PER_MINUTE = float(get_env("LLM_REQUESTS_PER_MINUTE", "1000"))
+LLM_TOKENS_PER_MINUTE = float(get_env("LLM_TOKENS_PER_MINUTE", "1000000"))
+EMBEDDING_REQUESTS_PER_MINUTE = float(get_env("EMBEDDING_REQUESTS_PER_MINUTE", "1500"))
+# JSON-mode parser replies (see structured_output.py): stream and stop reading at
+# the closing bracket; re-call the model only when local repair fails.
+LLM_JSON_STREAM = get_env("LLM_JSON_STREAM", "true").lower() in ("1", "true", "yes")
+LLM_JSON_MAX_RECALLS = max(0, int(get_env("LLM_JSON_MAX_RECALLS", "1")))
+
+# Cache of LLM resume/JD parses keyed by content hash (see parse_cache.py)
+PARSE_CACHE_ENABLED = get_env("PARSE_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+PARSE_CACHE_LRU_SIZE = int(get_env("PARSE_CACHE_LRU_SIZE", "256"))
  
 DB_HOST = get_env("DB_HOST", "localhost")
 DB_PORT = int(get_env("DB_PORT", "5432"))
 DB_NAME = get_env("DB_NAME", "recruitment_ai")
 DB_USER = get_env("DB_USER", "postgres")
 DB_PASSWORD = get_env("DB_PASSWORD", "postgres")
+
+# Connection pool (see db.py). Set DB_POOL_ENABLED=false to open a fresh
+# connection per get_connection() call like one-off scripts used to.
+DB_POOL_ENABLED = get_env("DB_POOL_ENABLED", "true").lower() in ("1", "true", "yes")
+DB_POOL_MIN_SIZE = int(get_env("DB_POOL_MIN_SIZE", "1"))
+DB_POOL_MAX_SIZE = int(get_env("DB_POOL_MAX_SIZE", "10"))
+DB_POOL_TIMEOUT_SECONDS = float(get_env("DB_POOL_TIMEOUT_SECONDS", "30"))
+DB_POOL_MAX_LIFETIME_SECONDS = float(get_env("DB_POOL_MAX_LIFETIME_SECONDS", "1800"))
+DB_POOL_HEALTHCHECK_IDLE_SECONDS = float(get_env("DB_POOL_HEALTHCHECK_IDLE_SECONDS", "30"))
  
 EMBEDDING_DIM = 768  # text-embedding-004 outputs 768-d vectors
 
+# Embedding cache + request coalescing (see embedding_service.py).
+# The Gemini batch embedding endpoint accepts up to 100 texts per call.
+EMBEDDING_CACHE_ENABLED = get_env("EMBEDDING_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+EMBEDDING_BATCH_SIZE = min(int(get_env("EMBEDDING_BATCH_SIZE", "100")), 100)
+EMBEDDING_BATCH_WINDOW_MS = float(get_env("EMBEDDING_BATCH_WINDOW_MS", "25"))
+
+# PDF text extraction (see pdf_extraction.py)
+PDF_EXTRACT_WORKERS = max(1, int(get_env("PDF_EXTRACT_WORKERS", "2")))
+PDF_MAX_BYTES = int(get_env("PDF_MAX_BYTES", str(20 * 1024 * 1024)))
+PDF_MAX_PAGES = int(get_env("PDF_MAX_PAGES", "50"))
+PDF_PARALLEL_PAGE_THRESHOLD = int(get_env("PDF_PARALLEL_PAGE_THRESHOLD", "12"))
+PDF_TEXT_CACHE_SIZE = int(get_env("PDF_TEXT_CACHE_SIZE", "512"))
+# Wall-clock limit for one document on the process pool; a PDF that takes
+# longer fails on its own instead of holding a worker (and a job file lock).
+PDF_EXTRACT_TIMEOUT_SECONDS = float(get_env("PDF_EXTRACT_TIMEOUT_SECONDS", "60"))
+
+# Bulk resume ingestion (see resume_pipeline.py)
+RESUME_PIPELINE_PARSE_CONCURRENCY = int(get_env("RESUME_PIPELINE_PARSE_CONCURRENCY", "4"))
+# Several short resumes share one parse prompt (see resume_parser.parse_resume_texts).
+# RESUME_BATCH_MAX_CHARS bounds the resume text per prompt, which also keeps the
+# JSON array reply inside the model's output limit; longer resumes go alone.
+RESUME_BATCH_PARSE_ENABLED = get_env("RESUME_BATCH_PARSE_ENABLED", "true").lower() in ("1", "true", "yes")
+RESUME_BATCH_MAX_DOCS = max(1, int(get_env("RESUME_BATCH_MAX_DOCS", "8")))
+RESUME_BATCH_MAX_CHARS = int(get_env("RESUME_BATCH_MAX_CHARS", "12000"))
+# Rule-based pre-extraction (see resume_prefill.py). RESUME_PARSE_MODE: "llm"
+# (default; prefilled fields are left out of the prompt) or "offline" (rules
+# only, no Gemini calls). RESUME_OFFLINE_FALLBACK serves the rule-based parse
+# when the LLM call fails (quota, outage) instead of failing the upload.
+RESUME_PARSE_MODE = get_env("RESUME_PARSE_MODE", "llm").lower()
+RESUME_PREFILL_ENABLED = get_env("RESUME_PREFILL_ENABLED", "true").lower() in ("1", "true", "yes")
+RESUME_OFFLINE_FALLBACK = get_env("RESUME_OFFLINE_FALLBACK", "true").lower() in ("1", "true", "yes")
+
+# Ingest-time resume dedup (see resume_dedup.py). RESUME_DEDUP_NEAR_DISTANCE is
+# the cosine distance under which a new resume updates a neighbour with the
+# same name or phone instead of inserting a new row (0 disables the check).
+RESUME_DEDUP_ENABLED = get_env("RESUME_DEDUP_ENABLED", "true").lower() in ("1", "true", "yes")
+RESUME_DEDUP_NEAR_DISTANCE = float(get_env("RESUME_DEDUP_NEAR_DISTANCE", "0.02"))
+
+# Background upload jobs (see ingest_jobs.py)
+JOB_WORKER_IN_PROCESS = get_env("JOB_WORKER_IN_PROCESS", "true").lower() in ("1", "true", "yes")
+JOB_WORKER_CONCURRENCY = int(get_env("JOB_WORKER_CONCURRENCY", "4"))
+JOB_WORKER_POLL_SECONDS = float(get_env("JOB_WORKER_POLL_SECONDS", "2"))
+JOB_LOCK_TIMEOUT_SECONDS = float(get_env("JOB_LOCK_TIMEOUT_SECONDS", "900"))
+JOB_MAX_ATTEMPTS = int(get_env("JOB_MAX_ATTEMPTS", "3"))
+
+# pgvector ANN indexes on resumes.embedding / memories.embedding (see migrations.py)
+# VECTOR_INDEX_TYPE: "hnsw" (default), "ivfflat" or "none"
+VECTOR_INDEX_TYPE = get_env("VECTOR_INDEX_TYPE", "hnsw").lower()
+HNSW_M = int(get_env("HNSW_M", "16"))
+HNSW_EF_CONSTRUCTION = int(get_env("HNSW_EF_CONSTRUCTION", "64"))
+HNSW_EF_SEARCH = int(get_env("HNSW_EF_SEARCH", "100"))
+IVFFLAT_LISTS = int(get_env("IVFFLAT_LISTS", "100"))
+IVFFLAT_PROBES = int(get_env("IVFFLAT_PROBES", "10"))
+# EMBEDDING_STORAGE: "vector" (float32) or "halfvec" (float16: half the heap and
+# ANN index size, pgvector >= 0.7). init_db converts the embedding columns.
+EMBEDDING_STORAGE = get_env("EMBEDDING_STORAGE", "vector").lower()
+# VECTOR_PREFILTER: "none" or "binary" (Hamming top-N over binary_quantize(embedding)
+# from a bit index, re-ranked by exact cosine on the stored vectors)
+VECTOR_PREFILTER = get_env("VECTOR_PREFILTER", "none").lower()
+BINARY_PREFILTER_CANDIDATES = int(get_env("BINARY_PREFILTER_CANDIDATES", "200"))
+
+# Where vector top-K runs: "pgvector" (SQL) or "local" (in-process NumPy
+# index, see local_vector_index.py; filtered/hybrid queries still use SQL)
+VECTOR_SEARCH_BACKEND = get_env("VECTOR_SEARCH_BACKEND", "pgvector").lower()
+LOCAL_INDEX_DIR = get_env("LOCAL_INDEX_DIR", ".vector_index")
+LOCAL_INDEX_DTYPE = get_env("LOCAL_INDEX_DTYPE", "float32").lower()  # float32 | float16
+LOCAL_INDEX_SYNC_SECONDS = float(get_env("LOCAL_INDEX_SYNC_SECONDS", "5"))
+LOCAL_INDEX_COMPACT_RATIO = float(get_env("LOCAL_INDEX_COMPACT_RATIO", "0.1"))
+
+# Match result cache (see match_cache.py)
+MATCH_CACHE_ENABLED = get_env("MATCH_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+MATCH_CACHE_TTL_SECONDS = float(get_env("MATCH_CACHE_TTL_SECONDS", "300"))
+MATCH_CACHE_MAX_ENTRIES = int(get_env("MATCH_CACHE_MAX_ENTRIES", "1024"))
+MATCH_CACHE_VERSION_CHECK_SECONDS = float(get_env("MATCH_CACHE_VERSION_CHECK_SECONDS", "2"))
+
+# Match scoring (see ranking.py). MATCH_SCORING: "vector" (cosine only) or
+# "hybrid" (cosine fused with full-text skill matching)
+MATCH_SCORING = get_env("MATCH_SCORING", "vector").lower()
+HYBRID_FUSION = get_env("HYBRID_FUSION", "rrf").lower()  # rrf | weighted
+HYBRID_RRF_K = int(get_env("HYBRID_RRF_K", "60"))
+HYBRID_LEXICAL_WEIGHT = float(get_env("HYBRID_LEXICAL_WEIGHT", "0.3"))
+HYBRID_CANDIDATES = int(get_env("HYBRID_CANDIDATES", "200"))
+
+# Per-match explanation (ranking.explain_matches): JD skills covered by the
+# resume, experience fit, and a weighted coverage score (0-100). Weights are
+# renormalized over the parts a JD actually specifies.
+MATCH_EXPLAIN = get_env("MATCH_EXPLAIN", "true").lower() in ("1", "true", "yes")
+COVERAGE_PRIMARY_WEIGHT = float(get_env("COVERAGE_PRIMARY_WEIGHT", "0.6"))
+COVERAGE_SECONDARY_WEIGHT = float(get_env("COVERAGE_SECONDARY_WEIGHT", "0.2"))
+COVERAGE_EXPERIENCE_WEIGHT = float(get_env("COVERAGE_EXPERIENCE_WEIGHT", "0.2"))
+
+# Second-stage re-ranking (reranker.py) of the top RERANK_CANDIDATES matches.
+# RERANK_MODE: "off", "local" (rule score over canonical_json) or "llm"
+# (Gemini judge per candidate). RERANK_WEIGHT blends it with the ATS score.
+RERANK_MODE = get_env("RERANK_MODE", "off").lower()
+RERANK_CANDIDATES = int(get_env("RERANK_CANDIDATES", "20"))
+RERANK_WEIGHT = float(get_env("RERANK_WEIGHT", "0.5"))
+RERANK_BUDGET_SECONDS = float(get_env("RERANK_BUDGET_SECONDS", "5"))
+RERANK_MAX_CONCURRENCY = int(get_env("RERANK_MAX_CONCURRENCY", "4"))
+RERANK_CACHE_MAX_ENTRIES = int(get_env("RERANK_CACHE_MAX_ENTRIES", "20000"))
+
 # Email Configuration
 SMTP_HOST = get_env("SMTP_HOST", "smtp.gmail.com")
 SMTP_PORT = int(get_env("SMTP_PORT", "587"))
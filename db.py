@@ -1,33 +1,436 @@
+"""
+Database access helpers.
 
-import psycopg2
+All modules get connections through `get_connection()` / `db_cursor()`. By
+default these hand out connections from a process-wide pool, so callers keep
+their existing `conn = get_connection() ... conn.close()` pattern while
+`close()` actually returns the physical connection to the pool.
+"""
+import os
+import threading
+import time
+from collections import deque
 from contextlib import contextmanager
+from typing import Any, Dict, Optional
+
+import psycopg2
+from psycopg2 import extensions
 
-from config import DB_HOST, DB_PORT, DB_NAME, DB_USER, DB_PASSWORD
+from config import (
+    DB_HOST,
+    DB_PORT,
+    DB_NAME,
+    DB_USER,
+    DB_PASSWORD,
+    DB_POOL_ENABLED,
+    DB_POOL_MIN_SIZE,
+    DB_POOL_MAX_SIZE,
+    DB_POOL_TIMEOUT_SECONDS,
+    DB_POOL_MAX_LIFETIME_SECONDS,
+    DB_POOL_HEALTHCHECK_IDLE_SECONDS,
+)
 
-def get_connection():
-    conn = psycopg2.connect(
+
+class PoolTimeout(Exception):
+    """Raised when no pooled connection becomes available in time."""
+
+
+def _connect():
+    return psycopg2.connect(
         host=DB_HOST,
         port=DB_PORT,
         dbname=DB_NAME,
         user=DB_USER,
         password=DB_PASSWORD,
     )
+
+
+def _register_vector(conn) -> bool:
     # If pgvector is installed, register the vector adapter so we can
     # pass Python lists or pgvector.Vector objects as parameters.
     try:
         from pgvector.psycopg2 import register_vector
 
         register_vector(conn)
+        return True
     except Exception:
-        # If pgvector is not installed or registration fails, continue
-        # without adapter (raw SQL operations still work).
-        pass
+        # If pgvector is not installed or the extension does not exist yet
+        # (e.g. before init_db), continue without adapter (raw SQL still works).
+        return False
+    finally:
+        try:
+            conn.rollback()
+        except Exception:
+            pass
+
+
+class _PoolEntry:
+    __slots__ = ("conn", "created_at", "last_used_at", "vector_registered")
+
+    def __init__(self, conn):
+        now = time.monotonic()
+        self.conn = conn
+        self.created_at = now
+        self.last_used_at = now
+        self.vector_registered = False
+
+
+class PooledConnection:
+    """
+    Thin proxy around a pooled psycopg2 connection.
+
+    Everything is delegated to the real connection except `close()`, which
+    hands the connection back to the pool instead of tearing it down.
+    """
+
+    _entry = None
+    _released = True
+
+    def __init__(self, pool: "ConnectionPool", entry: _PoolEntry):
+        self._pool = pool
+        self._entry = entry
+        self._released = False
+
+    def __getattr__(self, name):
+        if self._entry is None or self._released:
+            raise psycopg2.InterfaceError("connection already returned to pool")
+        return getattr(self._entry.conn, name)
+
+    def __setattr__(self, name, value):
+        # `conn.autocommit = True` etc. must reach the real connection; the
+        # pool resets autocommit (and rolls back) when the connection returns.
+        if name in ("_pool", "_entry", "_released"):
+            object.__setattr__(self, name, value)
+            return
+        if self._entry is None or self._released:
+            raise psycopg2.InterfaceError("connection already returned to pool")
+        setattr(self._entry.conn, name, value)
+
+    @property
+    def closed(self):
+        return 1 if self._released else self._entry.conn.closed
+
+    @property
+    def raw(self):
+        return self._entry.conn
+
+    def close(self):
+        if not self._released:
+            self._released = True
+            self._pool._release(self._entry)
+
+    def __enter__(self):
+        return self._entry.conn.__enter__()
+
+    def __exit__(self, exc_type, exc, tb):
+        return self._entry.conn.__exit__(exc_type, exc, tb)
+
+    def __del__(self):
+        # Scripts that forget conn.close() must not leak pool slots.
+        try:
+            self.close()
+        except Exception:
+            pass
+
+
+class ConnectionPool:
+    """
+    Thread-safe psycopg2 connection pool.
+
+    - keeps between `min_size` and `max_size` physical connections
+    - blocks up to `timeout` seconds when saturated, then raises PoolTimeout
+    - pings connections idle for longer than `healthcheck_idle` before reuse
+    - recycles connections older than `max_lifetime`
+    - registers the pgvector adapter once per physical connection
+    """
+
+    def __init__(
+        self,
+        min_size: int = DB_POOL_MIN_SIZE,
+        max_size: int = DB_POOL_MAX_SIZE,
+        timeout: float = DB_POOL_TIMEOUT_SECONDS,
+        max_lifetime: float = DB_POOL_MAX_LIFETIME_SECONDS,
+        healthcheck_idle: float = DB_POOL_HEALTHCHECK_IDLE_SECONDS,
+    ):
+        if max_size < 1:
+            raise ValueError("max_size must be at least 1")
+        self.min_size = max(0, min(min_size, max_size))
+        self.max_size = max_size
+        self.timeout = timeout
+        self.max_lifetime = max_lifetime
+        self.healthcheck_idle = healthcheck_idle
+
+        self._idle: deque = deque()
+        self._size = 0  # physical connections (idle + checked out)
+        self._in_use = 0
+        self._waiting = 0
+        self._cond = threading.Condition()
+        self._closed = False
+
+        self._stats = {
+            "checkouts": 0,
+            "connections_opened": 0,
+            "connections_closed": 0,
+            "connections_recycled": 0,
+            "healthcheck_failures": 0,
+            "timeouts": 0,
+            "waits": 0,
+            "wait_time_total_ms": 0.0,
+            "wait_time_max_ms": 0.0,
+            "peak_in_use": 0,
+        }
+
+    # ------------------------------------------------------------------ #
+    # physical connection management
+    # ------------------------------------------------------------------ #
+    def _open_entry(self) -> _PoolEntry:
+        entry = _PoolEntry(_connect())
+        entry.vector_registered = _register_vector(entry.conn)
+        with self._cond:
+            self._stats["connections_opened"] += 1
+        return entry
+
+    def _discard(self, entry: _PoolEntry):
+        try:
+            entry.conn.close()
+        except Exception:
+            pass
+        with self._cond:
+            self._size -= 1
+            self._stats["connections_closed"] += 1
+            self._cond.notify()
+
+    def _is_expired(self, entry: _PoolEntry, now: float) -> bool:
+        return self.max_lifetime > 0 and now - entry.created_at > self.max_lifetime
+
+    def _is_healthy(self, entry: _PoolEntry, now: float) -> bool:
+        if entry.conn.closed:
+            return False
+        if now - entry.last_used_at < self.healthcheck_idle:
+            return True
+        try:
+            cur = entry.conn.cursor()
+            cur.execute("SELECT 1")
+            cur.close()
+            entry.conn.rollback()
+            return True
+        except Exception:
+            return False
+
+    def _prepare(self, entry: _PoolEntry) -> Optional[_PoolEntry]:
+        """Validate an idle entry before handing it out; None if it was dropped."""
+        now = time.monotonic()
+        if self._is_expired(entry, now):
+            with self._cond:
+                self._stats["connections_recycled"] += 1
+            self._discard(entry)
+            return None
+        if not self._is_healthy(entry, now):
+            with self._cond:
+                self._stats["healthcheck_failures"] += 1
+            self._discard(entry)
+            return None
+        if not entry.vector_registered:
+            entry.vector_registered = _register_vector(entry.conn)
+        return entry
+
+    # ------------------------------------------------------------------ #
+    # checkout / release
+    # ------------------------------------------------------------------ #
+    def getconn(self) -> PooledConnection:
+        started = time.monotonic()
+        deadline = started + self.timeout
+        waited = False
+
+        while True:
+            entry = None
+            should_open = False
+            with self._cond:
+                if self._closed:
+                    raise psycopg2.InterfaceError("connection pool is closed")
+                while not self._idle and self._size >= self.max_size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._stats["timeouts"] += 1
+                        raise PoolTimeout(
+                            f"Timed out after {self.timeout}s waiting for a DB connection "
+                            f"(pool max_size={self.max_size})"
+                        )
+                    waited = True
+                    self._waiting += 1
+                    try:
+                        self._cond.wait(remaining)
+                    finally:
+                        self._waiting -= 1
+                if self._idle:
+                    entry = self._idle.pop()  # LIFO keeps hot connections hot
+                else:
+                    self._size += 1
+                    should_open = True
+                self._in_use += 1
+
+            if should_open:
+                try:
+                    entry = self._open_entry()
+                except Exception:
+                    with self._cond:
+                        self._size -= 1
+                        self._in_use -= 1
+                        self._cond.notify()
+                    raise
+            else:
+                entry = self._prepare(entry)
+                if entry is None:
+                    with self._cond:
+                        self._in_use -= 1
+                    continue
+
+            wait_ms = (time.monotonic() - started) * 1000
+            with self._cond:
+                self._stats["checkouts"] += 1
+                if waited:
+                    self._stats["waits"] += 1
+                    self._stats["wait_time_total_ms"] += wait_ms
+                    self._stats["wait_time_max_ms"] = max(self._stats["wait_time_max_ms"], wait_ms)
+                self._stats["peak_in_use"] = max(self._stats["peak_in_use"], self._in_use)
+            return PooledConnection(self, entry)
+
+    def _release(self, entry: _PoolEntry):
+        conn = entry.conn
+        reusable = not conn.closed and not self._closed
+        if reusable:
+            try:
+                # Never hand out a connection with an open/aborted transaction,
+                # or with a borrower's session settings.
+                if conn.info.transaction_status != extensions.TRANSACTION_STATUS_IDLE:
+                    conn.rollback()
+                if conn.autocommit or conn.readonly or conn.isolation_level != extensions.ISOLATION_LEVEL_DEFAULT:
+                    conn.reset()
+                    conn.autocommit = False
+            except Exception:
+                reusable = False
+
+        if reusable and self._is_expired(entry, time.monotonic()):
+            with self._cond:
+                self._stats["connections_recycled"] += 1
+            reusable = False
+
+        with self._cond:
+            self._in_use -= 1
+        if not reusable:
+            self._discard(entry)
+            return
+
+        entry.last_used_at = time.monotonic()
+        with self._cond:
+            self._idle.append(entry)
+            self._cond.notify()
+
+    def warm_up(self):
+        """Open connections until `min_size` physical connections exist."""
+        while True:
+            with self._cond:
+                if self._size >= self.min_size:
+                    return
+                self._size += 1
+            try:
+                entry = self._open_entry()
+            except Exception:
+                with self._cond:
+                    self._size -= 1
+                raise
+            with self._cond:
+                self._idle.append(entry)
+                self._cond.notify()
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            idle = list(self._idle)
+            self._idle.clear()
+        for entry in idle:
+            self._discard(entry)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            stats = dict(self._stats)
+            stats.update(
+                {
+                    "size": self._size,
+                    "idle": len(self._idle),
+                    "in_use": self._in_use,
+                    "waiting": self._waiting,
+                    "min_size": self.min_size,
+                    "max_size": self.max_size,
+                    "saturation": round(self._in_use / self.max_size, 3),
+                }
+            )
+        waits = stats["waits"]
+        stats["wait_time_avg_ms"] = round(stats["wait_time_total_ms"] / waits, 3) if waits else 0.0
+        stats["wait_time_total_ms"] = round(stats["wait_time_total_ms"], 3)
+        stats["wait_time_max_ms"] = round(stats["wait_time_max_ms"], 3)
+        return stats
+
+
+_pool: Optional[ConnectionPool] = None
+_pool_pid: Optional[int] = None
+_pool_lock = threading.Lock()
+
+
+def get_pool() -> ConnectionPool:
+    """
+    Return the process-wide pool, creating it lazily.
+
+    The pid check matters under gunicorn: a pool inherited through fork()
+    shares sockets with the parent, so each worker builds its own.
+    """
+    global _pool, _pool_pid
+    pid = os.getpid()
+    if _pool is not None and _pool_pid == pid:
+        return _pool
+    with _pool_lock:
+        if _pool is None or _pool_pid != pid:
+            _pool = ConnectionPool()
+            _pool_pid = pid
+            try:
+                _pool.warm_up()
+            except Exception:
+                # DB may be unreachable at import/startup; connections are
+                # opened on demand and the error surfaces there.
+                pass
+    return _pool
+
+
+def get_pool_stats() -> Dict[str, Any]:
+    """Pool size, saturation and wait-time metrics for the current process."""
+    if not DB_POOL_ENABLED:
+        return {"enabled": False}
+    stats = get_pool().stats()
+    stats["enabled"] = True
+    return stats
+
+
+def close_pool():
+    global _pool, _pool_pid
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close()
+        _pool = None
+        _pool_pid = None
+
+
+def get_connection():
+    if not DB_POOL_ENABLED:
+        conn = _connect()
+        _register_vector(conn)
+        return conn
+    return get_pool().getconn()
 
-    return conn
 
 @contextmanager
 def db_cursor():
     conn = get_connection()
+    cur = None
     try:
         cur = conn.cursor()
         yield cur
@@ -36,5 +439,6 @@ def db_cursor():
         conn.rollback()
         raise
     finally:
-        cur.close()
+        if cur is not None:
+            cur.close()
         conn.close()
@@ -0,0 +1,249 @@
+"""
+Shared embedding layer used by resume_memory and jd_memory.
+
+- identical texts are embedded once: vectors are cached in the embedding_cache
+  table keyed by sha256(EMBEDDING_MODEL, task_type, text)
+- cache misses from all threads are coalesced by a small background batcher
+  into batched embed_content calls (up to EMBEDDING_BATCH_SIZE texts each)
+- concurrent requests for the same text share one in-flight API call
+"""
+import hashlib
+import os
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from typing import Any, Dict, List, Optional, Sequence
+
+from psycopg2.extras import execute_values
+
+from config import (
+    EMBEDDING_MODEL,
+    GEMINI_API_KEY,
+    EMBEDDING_BATCH_SIZE,
+    EMBEDDING_BATCH_WINDOW_MS,
+    EMBEDDING_CACHE_ENABLED,
+    LLM_TIMEOUT_SECONDS,
+    LLM_MAX_RETRIES,
+    LLM_RETRY_MAX_SECONDS,
+)
+from db import db_cursor
+from llm_client import embed
+
+DEFAULT_TASK_TYPE = "retrieval_document"
+
+# Longest one batched call can take in llm_client (every attempt times out,
+# every backoff is at its cap), doubled because the single batcher thread may
+# be busy with the batch queued ahead of ours. Past this a caller gives up
+# rather than blocking forever on a wedged batcher.
+_RESULT_TIMEOUT_SECONDS = 2 * (
+    (LLM_MAX_RETRIES + 1) * LLM_TIMEOUT_SECONDS
+    + LLM_MAX_RETRIES * LLM_RETRY_MAX_SECONDS
+) + EMBEDDING_BATCH_WINDOW_MS / 1000.0
+
+_stats_lock = threading.Lock()
+_stats = {
+    "requested": 0,
+    "cache_hits": 0,
+    "inflight_dedup": 0,
+    "api_calls": 0,
+    "api_texts": 0,
+    "cache_errors": 0,
+}
+
+
+def _bump(counter: str, n: int = 1):
+    with _stats_lock:
+        _stats[counter] += n
+
+
+def make_embedding_key(text: str, task_type: str = DEFAULT_TASK_TYPE, model: str = EMBEDDING_MODEL) -> str:
+    digest = hashlib.sha256()
+    for part in (model, task_type, text):
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\x00")
+    return digest.hexdigest()
+
+
+def _embed_batch_via_api(texts: List[str], task_type: str) -> List[List[float]]:
+    if not GEMINI_API_KEY:
+        raise RuntimeError("GEMINI_API_KEY is not set")
+
+    embeddings = embed(texts, task_type)
+    if len(embeddings) != len(texts):
+        raise RuntimeError(
+            f"Embedding API returned {len(embeddings)} vectors for {len(texts)} texts"
+        )
+    return embeddings
+
+
+class _EmbeddingBatcher:
+    """
+    Collects embedding requests for up to `window` seconds (or until `max_batch`
+    are queued) and resolves them with a single API call per batch.
+    """
+
+    def __init__(self, max_batch: int, window: float):
+        self.max_batch = max(1, max_batch)
+        self.window = max(0.0, window)
+        self._cond = threading.Condition()
+        self._pending: Dict[str, Future] = {}
+        self._queue: List[tuple] = []  # (key, text, task_type)
+        self._thread: Optional[threading.Thread] = None
+        self._pid: Optional[int] = None
+
+    def _ensure_worker(self):
+        # Threads do not survive fork(); gunicorn workers start their own.
+        if self._thread is None or not self._thread.is_alive() or self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name="embedding-batcher", daemon=True)
+            self._thread.start()
+
+    def submit(self, key: str, text: str, task_type: str) -> Future:
+        with self._cond:
+            fut = self._pending.get(key)
+            if fut is not None:
+                _bump("inflight_dedup")
+                return fut
+            fut = Future()
+            self._pending[key] = fut
+            self._queue.append((key, text, task_type))
+            self._ensure_worker()
+            self._cond.notify()
+            return fut
+
+    def _take_batch(self) -> List[tuple]:
+        with self._cond:
+            while not self._queue:
+                self._cond.wait()
+            deadline = time.monotonic() + self.window
+            while len(self._queue) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+
+            # embed_content takes one task_type per call
+            task_type = self._queue[0][2]
+            batch, rest = [], []
+            for item in self._queue:
+                if item[2] == task_type and len(batch) < self.max_batch:
+                    batch.append(item)
+                else:
+                    rest.append(item)
+            self._queue = rest
+            return batch
+
+    def _run(self):
+        while True:
+            batch = self._take_batch()
+            texts = [text for _, text, _ in batch]
+            try:
+                vectors = _embed_batch_via_api(texts, batch[0][2])
+                _bump("api_calls")
+                _bump("api_texts", len(texts))
+                error = None
+            except Exception as e:
+                vectors = None
+                error = e
+
+            with self._cond:
+                futures = [self._pending.pop(key) for key, _, _ in batch]
+            for i, fut in enumerate(futures):
+                if error is not None:
+                    fut.set_exception(error)
+                else:
+                    fut.set_result(vectors[i])
+
+
+_batcher = _EmbeddingBatcher(EMBEDDING_BATCH_SIZE, EMBEDDING_BATCH_WINDOW_MS / 1000.0)
+
+
+def _load_cached(keys: Sequence[str]) -> Dict[str, List[float]]:
+    if not EMBEDDING_CACHE_ENABLED or not keys:
+        return {}
+    try:
+        with db_cursor() as cur:
+            cur.execute(
+                "SELECT cache_key, embedding FROM embedding_cache WHERE cache_key = ANY(%s)",
+                [list(keys)],
+            )
+            rows = cur.fetchall()
+    except Exception as e:
+        print(f"Embedding cache lookup failed: {e}")
+        _bump("cache_errors")
+        return {}
+    return {key: list(vec) for key, vec in rows}
+
+
+def _store_cached(entries: Dict[str, List[float]], task_type: str):
+    if not EMBEDDING_CACHE_ENABLED or not entries:
+        return
+    try:
+        with db_cursor() as cur:
+            execute_values(
+                cur,
+                """
+                INSERT INTO embedding_cache (cache_key, model, task_type, embedding)
+                VALUES %s
+                ON CONFLICT (cache_key) DO NOTHING
+                """,
+                [(key, EMBEDDING_MODEL, task_type, vec) for key, vec in entries.items()],
+            )
+    except Exception as e:
+        print(f"Embedding cache write failed: {e}")
+        _bump("cache_errors")
+
+
+def embed_texts(texts: Sequence[str], task_type: str = DEFAULT_TASK_TYPE) -> List[List[float]]:
+    """
+    Embed many texts, returning vectors in input order.
+
+    Duplicates (within the call, in the cache, or in flight on other threads)
+    are only sent to the API once.
+    """
+    if not texts:
+        return []
+    _bump("requested", len(texts))
+
+    keys = [make_embedding_key(text, task_type) for text in texts]
+    unique: Dict[str, str] = {}
+    for key, text in zip(keys, texts):
+        unique.setdefault(key, text)
+
+    vectors = _load_cached(list(unique))
+    _bump("cache_hits", sum(1 for key in keys if key in vectors))
+
+    futures = {
+        key: _batcher.submit(key, text, task_type)
+        for key, text in unique.items()
+        if key not in vectors
+    }
+    deadline = time.monotonic() + _RESULT_TIMEOUT_SECONDS
+    fresh = {}
+    for key, fut in futures.items():
+        try:
+            fresh[key] = fut.result(timeout=max(0.0, deadline - time.monotonic()))
+        except FutureTimeoutError:
+            raise TimeoutError(f"Embedding batch did not finish within {_RESULT_TIMEOUT_SECONDS:.0f}s")
+    _store_cached(fresh, task_type)
+    vectors.update(fresh)
+
+    return [vectors[key] for key in keys]
+
+
+def embed_text(text: str, task_type: str = DEFAULT_TASK_TYPE) -> List[float]:
+    return embed_texts([text], task_type=task_type)[0]
+
+
+def get_embedding_stats() -> Dict[str, Any]:
+    with _stats_lock:
+        stats = dict(_stats)
+    stats["enabled"] = EMBEDDING_CACHE_ENABLED
+    stats["batch_size"] = _batcher.max_batch
+    stats["cache_hit_rate"] = (
+        round(stats["cache_hits"] / stats["requested"], 3) if stats["requested"] else 0.0
+    )
+    stats["avg_batch_size"] = (
+        round(stats["api_texts"] / stats["api_calls"], 2) if stats["api_calls"] else 0.0
+    )
+    return stats
@@ -1,23 +1,19 @@
 """Helpers for inserting/updating embeddings and performing ANN searches.
 
-This module uses the `pgvector` adapter (registered in `db.get_connection`) so
-you can pass Python lists or `pgvector.Vector` objects as the embedding parameter.
+Embedding parameters go through `vector_codec.vector_param`, so you can pass
+Python lists, NumPy arrays or `pgvector.Vector` objects.
 """
 from typing import Any, Dict, Iterable, List, Optional
 from uuid import UUID
 
 from db import db_cursor
+from match_cache import bump_index_version
+from vector_codec import vector_param
 
 
 def _to_vector(obj: Iterable[float]):
-    try:
-        # Try to use pgvector.Vector if available
-        from pgvector import Vector
-
-        return Vector(obj)
-    except Exception:
-        # Fallback: pass plain list, adapter registration may still cast it
-        return list(obj)
+    # Compact float4 text literal; see vector_codec for why not str() per element.
+    return vector_param(obj)
 
 
 def upsert_memory(
@@ -47,6 +43,7 @@ def upsert_memory(
             """,
             (str(id), type, title, text, vec, metadata, canonical_json),
         )
+    bump_index_version()
 
 
 def upsert_resume(
@@ -93,12 +90,14 @@ def upsert_resume(
                 canonical_json,
             ),
         )
+    bump_index_version()
 
 
 def search_memories_by_embedding(query_embedding: Iterable[float], limit: int = 10):
-    """Return nearest memories by cosine distance using the ivfflat index.
+    """Return nearest memories by cosine distance.
 
-    Orders by cosine distance (smaller is better).
+    Orders by cosine distance (smaller is better), which lets Postgres use the
+    vector_cosine_ops ANN index created by `migrations.ensure_vector_indexes`.
     """
     vec = _to_vector(query_embedding)
     with db_cursor() as cur:
@@ -106,7 +105,7 @@ def search_memories_by_embedding(query_embedding: Iterable[float], limit: int =
             """
             SELECT id, type, title, text, metadata, canonical_json, created_at, updated_at
             FROM memories
-            ORDER BY embedding <#> %s
+            ORDER BY embedding <=> %s
             LIMIT %s;
             """,
             (vec, limit),
@@ -123,7 +122,7 @@ def search_resumes_by_embedding(query_embedding: Iterable[float], limit: int = 1
             """
             SELECT id, candidate_name, email, phone, type, title, text, metadata, canonical_json, created_at, updated_at
             FROM resumes
-            ORDER BY embedding <#> %s
+            ORDER BY embedding <=> %s
             LIMIT %s;
             """,
             (vec, limit),
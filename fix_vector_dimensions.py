@@ -67,7 +67,6 @@ def fix_vector_dimensions():
                 candidate_name VARCHAR(255),
                 email_subject TEXT,
                 email_body TEXT,
-                embedding vector(768),
                 sent_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
                 acknowledgement VARCHAR(20),
                 acknowledged_at TIMESTAMP WITH TIME ZONE,
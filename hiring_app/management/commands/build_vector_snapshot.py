@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = 'Write the on-disk snapshot used by the local (NumPy) vector search backend'
+
+    def handle(self, *args, **options):
+        from local_vector_index import get_local_index
+
+        index = get_local_index()
+        self.stdout.write(f'Building vector snapshot in {index.directory} ({index.dtype.name})...')
+        try:
+            count = index.build_snapshot()
+            self.stdout.write(self.style.SUCCESS(f'Snapshot written with {count} resumes'))
+        except Exception as e:
+            self.stdout.write(self.style.ERROR(f'Error building vector snapshot: {e}'))
@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+
+from config import CHAT_MODEL
+from parse_cache import invalidate_parse_cache
+
+class Command(BaseCommand):
+    help = 'Invalidate cached LLM resume/JD parses'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--kind', choices=['resume', 'jd'], default=None,
+                            help='Only clear one kind of parse')
+        parser.add_argument('--stale-only', action='store_true',
+                            help='Keep entries for the current CHAT_MODEL and prompt versions')
+
+    def handle(self, *args, **options):
+        from resume_parser import RESUME_PROMPT_VERSION
+        from jd_parser import JD_PROMPT_VERSION
+
+        prompt_versions = {'resume': RESUME_PROMPT_VERSION, 'jd': JD_PROMPT_VERSION}
+        kinds = [options['kind']] if options['kind'] else list(prompt_versions)
+        try:
+            deleted = 0
+            for kind in kinds:
+                if options['stale_only']:
+                    deleted += invalidate_parse_cache(
+                        kind, model=CHAT_MODEL, prompt_version=prompt_versions[kind]
+                    )
+                else:
+                    deleted += invalidate_parse_cache(kind)
+            self.stdout.write(self.style.SUCCESS(f'Deleted {deleted} cached parses'))
+        except Exception as e:
+            self.stdout.write(self.style.ERROR(f'Error clearing parse cache: {e}'))
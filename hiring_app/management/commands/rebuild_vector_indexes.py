@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+import migrations
+
+class Command(BaseCommand):
+    help = 'Drop and rebuild the pgvector ANN indexes on resumes and memories'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--type', dest='index_type', default=None,
+                            help='hnsw, ivfflat or none (defaults to VECTOR_INDEX_TYPE)')
+
+    def handle(self, *args, **options):
+        index_type = options.get('index_type') or migrations.VECTOR_INDEX_TYPE
+        self.stdout.write(f'Rebuilding vector indexes ({index_type})...')
+        try:
+            migrations.rebuild_vector_indexes(index_type)
+            self.stdout.write(self.style.SUCCESS('Vector indexes rebuilt successfully'))
+        except Exception as e:
+            self.stdout.write(self.style.ERROR(f'Error rebuilding vector indexes: {e}'))
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from config import JOB_WORKER_CONCURRENCY, JOB_WORKER_POLL_SECONDS
+
+class Command(BaseCommand):
+    help = 'Process queued background resume uploads (safe to run on many hosts at once)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=JOB_WORKER_CONCURRENCY)
+        parser.add_argument('--poll', type=float, default=JOB_WORKER_POLL_SECONDS,
+                            help='Seconds to sleep when the queue is empty')
+
+    def handle(self, *args, **options):
+        from ingest_jobs import run_worker
+
+        self.stdout.write(f"Ingest worker started (concurrency={options['concurrency']})")
+        run_worker(concurrency=options['concurrency'], poll_seconds=options['poll'])
@@ -19,9 +19,11 @@ def get_outreach_logs(request):
                 co.acknowledgement,
                 co.sent_at,
                 co.acknowledged_at,
-                m.title as jd_title
+                m.title as jd_title,
+                1 - (r.embedding <=> m.embedding) as similarity
             FROM candidate_outreach co
             LEFT JOIN memories m ON co.jd_id = m.id
+            LEFT JOIN resumes r ON co.resume_id = r.id
             ORDER BY co.sent_at DESC
             LIMIT 100
         """)
@@ -39,7 +41,9 @@ def get_outreach_logs(request):
                 "acknowledgement": row[4] if row[4] else "pending",
                 "sent_at": str(row[5]) if row[5] else None,
                 "acknowledged_at": str(row[6]) if row[6] else None,
-                "jd_title": row[7]
+                "jd_title": row[7],
+                # Computed from the resume/JD vectors; outreach rows don't store embeddings
+                "similarity": round(float(row[8]), 4) if row[8] is not None else None
             })
         
         return JsonResponse({
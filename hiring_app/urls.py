@@ -6,10 +6,15 @@ from .outreach_views import get_outreach_logs
 urlpatterns = [
     path('', views.index, name='index'),
     path('init-db', views.init_db, name='init_db'),
+    path('metrics', views.metrics, name='metrics'),
     path('jd/analyze/pdf', views.analyze_jd_pdf, name='analyze_jd_pdf'),
     path('resumes/upload', views.upload_resumes, name='upload_resumes'),
+    path('resumes/upload/<str:job_id>', views.upload_job_status, name='upload_job_status'),
+    path('jd/roles', views.search_jd_roles, name='search_jd_roles'),
     path('match/top-by-role', views.get_top_matches_by_role, name='match_top_by_role'),
     path('match/top-by-jd', views.get_top_matches_by_jd_id, name='match_top_by_jd'),
+    path('match/batch', views.get_top_matches_batch, name='match_batch'),
+    path('match/jds-for-resume', views.get_top_jds_for_resume, name='match_jds_for_resume'),
     path('send-emails', views.send_emails_to_candidates, name='send_emails'),
     path('acknowledge/<str:outreach_id>', views.acknowledge_interest, name='acknowledge_interest'),
     path('confirm-interview/<str:interview_id>', views.confirm_interview, name='confirm_interview'),
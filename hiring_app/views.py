@@ -1,15 +1,25 @@
 import json
-from django.http import JsonResponse, HttpResponse, FileResponse
+import time
+from django.http import JsonResponse, HttpResponse, FileResponse, StreamingHttpResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_POST
 from django.shortcuts import render
 
-import pdfplumber
-from io import BytesIO
-
 from jd_agent import analyze_job_description
 from ranker_agent import get_top_matches_for_role
-from resume_agent import process_resume_text
+from resume_pipeline import ingest_resume_files
+from ingest_jobs import enqueue_resume_upload_job, get_job_status, iter_job_status
+from db import get_pool_stats
+from parse_cache import get_parse_cache_stats
+from embedding_service import get_embedding_stats
+from pdf_extraction import PDFExtractionError, extract_pdf_text_pooled, get_pdf_extraction_stats
+from ranking import get_vector_search_stats
+from reranker import get_rerank_stats
+from match_cache import get_match_cache_stats
+from resume_dedup import get_resume_dedup_stats
+from llm_client import get_llm_client_stats
+from resume_parser import get_resume_parse_stats
+from structured_output import get_structured_output_stats
 
 
 def index(request):
@@ -30,9 +40,22 @@ def init_db(request):
     return JsonResponse({'status': 'ok', 'message': 'migrations run'})
 
 
-def _extract_pdf_text(contents: bytes) -> str:
-    with pdfplumber.open(BytesIO(contents)) as pdf:
-        return "\n".join([page.extract_text() or "" for page in pdf.pages])
+@csrf_exempt
+def metrics(request):
+    # Runtime performance counters for this worker process
+    return JsonResponse({
+        'db_pool': get_pool_stats(),
+        'parse_cache': get_parse_cache_stats(),
+        'embeddings': get_embedding_stats(),
+        'pdf_extraction': get_pdf_extraction_stats(),
+        'vector_search': get_vector_search_stats(),
+        'match_cache': get_match_cache_stats(),
+        'resume_dedup': get_resume_dedup_stats(),
+        'llm_client': get_llm_client_stats(),
+        'resume_parse': get_resume_parse_stats(),
+        'structured_output': get_structured_output_stats(),
+        'rerank': get_rerank_stats(),
+    })
 
 
 @csrf_exempt
@@ -48,7 +71,10 @@ def analyze_jd_pdf(request):
         return JsonResponse({'error': 'Only PDF supported'}, status=400)
 
     contents = file.read()
-    raw_jd_text = _extract_pdf_text(contents)
+    try:
+        raw_jd_text = extract_pdf_text_pooled(contents)
+    except PDFExtractionError as e:
+        return JsonResponse({'error': str(e)}, status=400)
     if not raw_jd_text.strip():
         return JsonResponse({'error': 'no text extracted'}, status=400)
 
@@ -78,46 +104,24 @@ def upload_resumes(request):
         if not files:
             return JsonResponse({'error': 'no files uploaded'}, status=400)
 
-        results = []
-        for idx, file in enumerate(files):
-            filename = file.name
-            print(f"Processing file {idx + 1}/{len(files)}: {filename}")
-            
-            if not filename.lower().endswith('.pdf'):
-                results.append({'file_name': filename, 'status': 'skipped', 'reason': 'not a PDF'})
-                continue
-            try:
-                print(f"  - Reading file contents...")
-                contents = file.read()
-                print(f"  - Extracting text from PDF...")
-                raw_text = _extract_pdf_text(contents).strip()
-                if not raw_text:
-                    results.append({'file_name': filename, 'status': 'error', 'reason': 'no text extracted'})
-                    continue
-                
-                print(f"  - Processing resume with AI (this may take 10-30 seconds)...")
-                processed = process_resume_text(raw_text=raw_text, source_url=source_url, file_name=filename)
-                resume_id = processed.get('resume_id')
-                parsed = processed.get('parsed', {})
-                
-                print(f"  - ✅ Successfully processed: {parsed.get('candidate_name', 'Unknown')}")
-                
-                results.append({
-                    'file_name': filename,
-                    'status': 'ok',
-                    'resume_id': resume_id,
-                    'candidate_name': parsed.get('candidate_name'),
-                    'current_title': parsed.get('current_title'),
-                })
-            except Exception as e:
-                import traceback
-                error_msg = str(e)
-                print(f"  - ❌ Error processing file {filename}: {error_msg}")
-                print(traceback.format_exc())
-                results.append({'file_name': filename, 'status': 'error', 'reason': error_msg})
+        payload = [(file.name, file.read()) for file in files]
 
-        print(f"=== Resume Upload Completed: {len(results)} files processed ===")
-        return JsonResponse({'count': len(results), 'items': results})
+        if request.POST.get('background', '').lower() in ('1', 'true', 'yes', 'on'):
+            job = enqueue_resume_upload_job(payload, source_url=source_url)
+            print(f"=== Resume Upload Queued as job {job['job_id']} ===")
+            return JsonResponse(job, status=202)
+
+        print(f"  - Running ingestion pipeline (extract -> parse -> embed -> store)...")
+        result = ingest_resume_files(payload, source_url=source_url)
+
+        for item in result['items']:
+            if item['status'] == 'ok':
+                print(f"  - ✅ Successfully processed: {item.get('candidate_name') or 'Unknown'} ({item['file_name']})")
+            else:
+                print(f"  - ❌ {item['file_name']}: {item.get('reason')}")
+
+        print(f"=== Resume Upload Completed: {result['count']} files processed, timings={result['timings']} ===")
+        return JsonResponse(result)
         
     except Exception as e:
         import traceback
@@ -127,15 +131,56 @@ def upload_resumes(request):
         return JsonResponse({'error': f'Server error: {error_msg}'}, status=500)
 
 
+@csrf_exempt
+def upload_job_status(request, job_id):
+    # Per-file progress of a background upload; ?stream=true pushes server-sent events until done
+    try:
+        status = get_job_status(job_id)
+    except Exception as e:
+        return JsonResponse({'error': str(e)}, status=500)
+    if status is None:
+        return JsonResponse({'error': f'Upload job not found: {job_id}'}, status=404)
+
+    if request.GET.get('stream', '').lower() in ('1', 'true', 'yes'):
+        def event_stream():
+            for update in iter_job_status(job_id, initial=status):
+                yield f"data: {json.dumps(update)}\n\n"
+
+        return StreamingHttpResponse(event_stream(), content_type='text/event-stream')
+    return JsonResponse(status)
+
+
+def search_jd_roles(request):
+    q = request.GET.get('q', '')
+    try:
+        try:
+            limit = min(max(int(request.GET.get('limit', 5)), 1), 50)
+        except (TypeError, ValueError):
+            raise ValueError('limit must be an integer')
+        from ranking import find_jds_by_role
+        matches = find_jds_by_role(q, limit)
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    except Exception as e:
+        return JsonResponse({'error': str(e)}, status=500)
+    return JsonResponse({'query': q, 'matches': matches})
+
+
 @csrf_exempt
 @require_POST
 def get_top_matches_by_role(request):
     role_name = request.POST.get('role_name')
     top_k = int(request.POST.get('top_k', 3))
+    recall = request.POST.get('recall')
+    filters = request.POST.get('filters')
+    scoring = request.POST.get('scoring')
+    rerank = request.POST.get('rerank')
     if not role_name:
         return JsonResponse({'error': 'role_name required'}, status=400)
     try:
-        matches = get_top_matches_for_role(role_name=role_name, top_k=top_k)
+        matches = get_top_matches_for_role(role_name=role_name, top_k=top_k, recall=recall, filters=filters, scoring=scoring, rerank=rerank)
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
     except Exception as e:
         return JsonResponse({'error': str(e)}, status=500)
     return JsonResponse({'role_name': role_name, 'top_k': top_k, 'matches': matches})
@@ -146,13 +191,19 @@ def get_top_matches_by_role(request):
 def get_top_matches_by_jd_id(request):
     jd_id = request.POST.get('jd_id')
     top_k = int(request.POST.get('top_k', 3))
+    recall = request.POST.get('recall')
+    filters = request.POST.get('filters')
+    scoring = request.POST.get('scoring')
+    rerank = request.POST.get('rerank')
     
     if not jd_id:
         return JsonResponse({'error': 'jd_id required'}, status=400)
         
     try:
         from ranking import get_top_k_resumes_for_jd_memory
-        matches = get_top_k_resumes_for_jd_memory(jd_memory_id=jd_id, top_k=top_k)
+        matches = get_top_k_resumes_for_jd_memory(jd_memory_id=jd_id, top_k=top_k, recall=recall, filters=filters, scoring=scoring, rerank=rerank)
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
     except Exception as e:
         return JsonResponse({'error': str(e)}, status=500)
         
@@ -163,6 +214,70 @@ def get_top_matches_by_jd_id(request):
     })
 
 
+@csrf_exempt
+@require_POST
+def get_top_matches_batch(request):
+    jd_ids = request.POST.getlist('jd_ids')
+    top_k = int(request.POST.get('top_k', 3))
+    recall = request.POST.get('recall')
+    filters = request.POST.get('filters')
+
+    # Accept a repeated field, a JSON list, or a comma-separated string
+    if len(jd_ids) == 1 and jd_ids[0].strip().startswith('['):
+        try:
+            jd_ids = json.loads(jd_ids[0])
+        except ValueError:
+            return JsonResponse({'error': 'jd_ids must be a JSON list'}, status=400)
+    elif len(jd_ids) == 1:
+        jd_ids = [part for part in jd_ids[0].split(',') if part.strip()]
+    jd_ids = [str(jd_id).strip() for jd_id in jd_ids]
+
+    if not jd_ids:
+        return JsonResponse({'error': 'jd_ids required'}, status=400)
+
+    try:
+        from ranking import get_top_k_resumes_for_jd_memories
+        by_jd = get_top_k_resumes_for_jd_memories(jd_ids, top_k, recall=recall, filters=filters)
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    except Exception as e:
+        return JsonResponse({'error': str(e)}, status=500)
+
+    return JsonResponse({
+        "top_k": top_k,
+        "results": [{"jd_id": jd_id, "matches": by_jd[jd_id]} for jd_id in jd_ids if jd_id in by_jd],
+        "missing": [jd_id for jd_id in jd_ids if jd_id not in by_jd],
+    })
+
+
+@csrf_exempt
+@require_POST
+def get_top_jds_for_resume(request):
+    resume_id = request.POST.get('resume_id')
+    top_k = int(request.POST.get('top_k', 3))
+    recall = request.POST.get('recall')
+    filters = request.POST.get('filters')
+
+    if not resume_id:
+        return JsonResponse({'error': 'resume_id required'}, status=400)
+
+    started = time.perf_counter()
+    try:
+        from ranking import get_top_k_jds_for_resume
+        matches = get_top_k_jds_for_resume(resume_id, top_k, recall=recall, filters=filters)
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    except Exception as e:
+        return JsonResponse({'error': str(e)}, status=500)
+
+    return JsonResponse({
+        "resume_id": resume_id,
+        "top_k": top_k,
+        "matches": matches,
+        "latency_ms": round((time.perf_counter() - started) * 1000, 1),
+    })
+
+
 @csrf_exempt
 @require_POST
 def send_emails_to_candidates(request):
@@ -189,10 +304,10 @@ def send_emails_to_candidates(request):
     conn = get_connection()
     
     try:
-        # Fetch JD details including embedding
+        # Fetch JD details
         cur = conn.cursor()
         cur.execute(
-            "SELECT id, title, canonical_json, embedding FROM memories WHERE id = %s",
+            "SELECT id, title, canonical_json FROM memories WHERE id = %s",
             [jd_id]
         )
         jd_row = cur.fetchone()
@@ -205,16 +320,13 @@ def send_emails_to_candidates(request):
             "title": jd_row[1],
             "canonical_json": jd_row[2],
             "role": jd_row[2].get("role") if jd_row[2] else "Position",
-            "embedding": jd_row[3] # Get the JD embedding
         }
         
         # Process each candidate
         for idx, resume_id in enumerate(candidate_ids, start=1):
             try:
                 # Fetch resume details AND calculate similarity on the fly
-                # We use the JD embedding literal for the distance calculation
-                jd_embedding_literal = jd_data["embedding"]
-                
+                # The JD vector is referenced server-side; it never round-trips through Python
                 cur.execute(
                     """
                     SELECT 
@@ -223,12 +335,11 @@ def send_emails_to_candidates(request):
                         email, 
                         canonical_json, 
                         metadata, 
-                        embedding,
-                        1 - (embedding <=> %s::vector) as similarity
+                        1 - (embedding <=> (SELECT embedding FROM memories WHERE id = %s)) as similarity
                     FROM resumes 
                     WHERE id = %s
                     """,
-                    [jd_embedding_literal, resume_id]
+                    [jd_id, resume_id]
                 )
                 resume_row = cur.fetchone()
                 
@@ -240,7 +351,7 @@ def send_emails_to_candidates(request):
                     })
                     continue
                 
-                similarity = float(resume_row[6])
+                similarity = float(resume_row[5])
                 ats_score = int(max(0.0, min(1.0, similarity)) * 100)
                 
                 candidate_data = {
@@ -249,7 +360,6 @@ def send_emails_to_candidates(request):
                     "email": resume_row[2],
                     "canonical_json": resume_row[3],
                     "metadata": resume_row[4],
-                    "embedding": resume_row[5]
                 }
                 
                 candidate_email = candidate_data.get("email")
@@ -282,15 +392,13 @@ def send_emails_to_candidates(request):
                 )
                 
                 if send_result["success"]:
-                    # Store in database with embedding and REAL ATS score
-                    embedding_literal = candidate_data.get("embedding")
-                    
+                    # Store in database with REAL ATS score (the resume vector stays in resumes)
                     cur.execute(
                         """
                         INSERT INTO candidate_outreach 
                         (id, resume_id, jd_id, candidate_email, candidate_name, 
-                         email_subject, email_body, embedding, rank, ats_score)
-                        VALUES (%s, %s, %s, %s, %s, %s, %s, %s::vector, %s, %s)
+                         email_subject, email_body, rank, ats_score)
+                        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
                         """,
                         [
                             outreach_id,
@@ -300,7 +408,6 @@ def send_emails_to_candidates(request):
                             candidate_data.get("candidate_name"),
                             email_content["subject"],
                             email_content["body"],
-                            embedding_literal,
                             idx,
                             ats_score
                         ]
@@ -0,0 +1,341 @@
+"""
+Durable background jobs for bulk resume uploads.
+
+POST /resumes/upload with background=true stores the PDFs in ingest_job_files
+and returns a job id right away. Workers claim queued files with
+FOR UPDATE SKIP LOCKED, so any number of worker threads/processes/hosts can
+drain the same queue without double-processing a file. Each file is handled by
+resume_agent.process_resume_text and its result row is what the
+/resumes/upload/<job_id> status endpoint reports.
+
+Run a standalone worker with `python ingest_jobs.py` or
+`python manage.py run_ingest_worker`; with JOB_WORKER_IN_PROCESS=true the web
+process also runs one in a daemon thread.
+"""
+import os
+import socket
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+import psycopg2
+from psycopg2.extras import Json, execute_values
+
+from config import (
+    JOB_WORKER_IN_PROCESS,
+    JOB_WORKER_CONCURRENCY,
+    JOB_WORKER_POLL_SECONDS,
+    JOB_LOCK_TIMEOUT_SECONDS,
+    JOB_MAX_ATTEMPTS,
+)
+from db import db_cursor
+from pdf_extraction import extract_pdf_text_pooled
+from resume_agent import process_resume_text
+from resume_dedup import summarize_dedup
+
+
+def enqueue_resume_upload_job(
+    files: List[Tuple[str, bytes]],
+    source_url: Optional[str] = None,
+) -> Dict[str, Any]:
+    """
+    Persist an upload as a job. Non-PDF and empty files are resolved
+    immediately so they never reach a worker.
+    """
+    job_id = str(uuid.uuid4())
+    rows = []
+    finished = 0
+    for position, (filename, contents) in enumerate(files):
+        result = None
+        if not filename.lower().endswith(".pdf"):
+            result = {"file_name": filename, "status": "skipped", "reason": "not a PDF"}
+        elif not contents:
+            result = {"file_name": filename, "status": "error", "reason": "empty file"}
+
+        if result:
+            finished += 1
+            rows.append((str(uuid.uuid4()), job_id, position, filename, None, result["status"], Json(result)))
+        else:
+            rows.append((str(uuid.uuid4()), job_id, position, filename, psycopg2.Binary(contents), "queued", None))
+
+    status = "done" if finished == len(files) else "queued"
+    with db_cursor() as cur:
+        cur.execute(
+            """
+            INSERT INTO ingest_jobs (id, status, source_url, total_files, processed_files, finished_at)
+            VALUES (%s, %s, %s, %s, %s, CASE WHEN %s = 'done' THEN NOW() END)
+            """,
+            [job_id, status, source_url, len(files), finished, status],
+        )
+        execute_values(
+            cur,
+            """
+            INSERT INTO ingest_job_files (id, job_id, position, file_name, contents, status, result)
+            VALUES %s
+            """,
+            rows,
+        )
+
+    if JOB_WORKER_IN_PROCESS:
+        start_background_worker()
+
+    return {"job_id": job_id, "status": status, "count": len(files)}
+
+
+def iter_job_status(job_id: str, poll_seconds: float = 1.0, initial: Optional[Dict[str, Any]] = None):
+    """
+    Yield the job status each time it changes, until the job is done.
+    Backs the streaming (?stream=true) variant of the status endpoints, which
+    look the job up first (404 before the stream starts) and pass it as
+    `initial`.
+    """
+    last_processed = None
+    status = initial if initial is not None else get_job_status(job_id)
+    while status is not None:
+        if status["processed"] != last_processed or status["status"] == "done":
+            last_processed = status["processed"]
+            yield status
+        if status["status"] == "done":
+            return
+        time.sleep(poll_seconds)
+        status = get_job_status(job_id)
+
+
+def get_job_status(job_id: str) -> Optional[Dict[str, Any]]:
+    """Job summary plus per-file progress in upload order; None if unknown."""
+    try:
+        job_id = str(uuid.UUID(str(job_id)))
+    except ValueError:
+        # Not a job id at all; same answer as an unknown one instead of a DB error.
+        return None
+    with db_cursor() as cur:
+        cur.execute(
+            """
+            SELECT status, total_files, processed_files, created_at, started_at, finished_at
+            FROM ingest_jobs
+            WHERE id = %s
+            """,
+            [job_id],
+        )
+        job = cur.fetchone()
+        if not job:
+            return None
+        cur.execute(
+            """
+            SELECT file_name, status, result, attempts
+            FROM ingest_job_files
+            WHERE job_id = %s
+            ORDER BY position
+            """,
+            [job_id],
+        )
+        files = cur.fetchall()
+
+    if JOB_WORKER_IN_PROCESS and job[0] != "done":
+        # Picks queued work back up after a web restart.
+        start_background_worker()
+
+    items = []
+    for file_name, status, result, attempts in files:
+        if result:
+            items.append(result)
+        else:
+            items.append({"file_name": file_name, "status": status, "attempts": attempts})
+
+    return {
+        "job_id": job_id,
+        "status": job[0],
+        "total": job[1],
+        "processed": job[2],
+        "created_at": str(job[3]) if job[3] else None,
+        "started_at": str(job[4]) if job[4] else None,
+        "finished_at": str(job[5]) if job[5] else None,
+        "items": items,
+        "dedup": summarize_dedup(items),
+    }
+
+
+# ---------------------------------------------------------------------- #
+# worker side
+# ---------------------------------------------------------------------- #
+def claim_files(worker_id: str, limit: int) -> List[Tuple]:
+    """Atomically claim up to `limit` queued files, skipping rows other workers hold."""
+    with db_cursor() as cur:
+        cur.execute(
+            """
+            WITH claimed AS (
+                SELECT f.id
+                FROM ingest_job_files f
+                WHERE f.status = 'queued'
+                ORDER BY f.created_at, f.position
+                LIMIT %s
+                FOR UPDATE SKIP LOCKED
+            )
+            UPDATE ingest_job_files f
+            SET status = 'running',
+                locked_by = %s,
+                locked_at = NOW(),
+                attempts = f.attempts + 1,
+                updated_at = NOW()
+            FROM claimed, ingest_jobs j
+            WHERE f.id = claimed.id AND j.id = f.job_id
+            RETURNING f.id, f.job_id, f.file_name, f.contents, j.source_url, f.locked_by
+            """,
+            [limit, worker_id],
+        )
+        rows = cur.fetchall()
+        if rows:
+            cur.execute(
+                """
+                UPDATE ingest_jobs
+                SET status = 'running', started_at = COALESCE(started_at, NOW())
+                WHERE id = ANY(%s::uuid[]) AND status = 'queued'
+                """,
+                [list({str(row[1]) for row in rows})],
+            )
+    return rows
+
+
+def _finish_file(file_id: str, job_id: str, result: Dict[str, Any], locked_by: Optional[str] = None):
+    # The locked_by guard stops a worker whose claim was recovered as stale
+    # (and re-claimed elsewhere) from finishing the file a second time.
+    with db_cursor() as cur:
+        cur.execute(
+            """
+            UPDATE ingest_job_files
+            SET status = %s, result = %s, contents = NULL, locked_by = NULL, updated_at = NOW()
+            WHERE id = %s AND status = 'running' AND (%s IS NULL OR locked_by = %s)
+            """,
+            [result["status"], Json(result), file_id, locked_by, locked_by],
+        )
+        if cur.rowcount:
+            cur.execute(
+                """
+                UPDATE ingest_jobs
+                SET processed_files = processed_files + 1,
+                    status = CASE WHEN processed_files + 1 >= total_files THEN 'done' ELSE status END,
+                    finished_at = CASE WHEN processed_files + 1 >= total_files THEN NOW() ELSE finished_at END
+                WHERE id = %s
+                """,
+                [job_id],
+            )
+
+
+def process_claimed_file(row: Tuple) -> Dict[str, Any]:
+    file_id, job_id, file_name, contents, source_url, locked_by = row
+    try:
+        raw_text = extract_pdf_text_pooled(bytes(contents)).strip()
+        if not raw_text:
+            result = {"file_name": file_name, "status": "error", "reason": "no text extracted"}
+        else:
+            processed = process_resume_text(raw_text=raw_text, source_url=source_url, file_name=file_name)
+            parsed = processed["parsed"]
+            result = {
+                "file_name": file_name,
+                "status": "ok",
+                "resume_id": processed["resume_id"],
+                "candidate_name": parsed.get("candidate_name"),
+                "current_title": parsed.get("current_title"),
+                "parse_mode": parsed.get("parse_mode") or "llm",
+            }
+            if processed["dedup"] == "exact":
+                result["status"] = "duplicate"
+            if processed["dedup"] != "new":
+                result["dedup"] = processed["dedup"]
+    except Exception as e:
+        result = {"file_name": file_name, "status": "error", "reason": str(e)}
+
+    _finish_file(str(file_id), str(job_id), result, locked_by=locked_by)
+    return result
+
+
+def recover_stale_files() -> int:
+    """
+    Requeue files whose worker died mid-flight (lock older than
+    JOB_LOCK_TIMEOUT_SECONDS); give up after JOB_MAX_ATTEMPTS.
+    """
+    with db_cursor() as cur:
+        cur.execute(
+            """
+            UPDATE ingest_job_files
+            SET status = 'queued', locked_by = NULL, locked_at = NULL, updated_at = NOW()
+            WHERE status = 'running'
+              AND locked_at < NOW() - make_interval(secs => %s)
+              AND attempts < %s
+            """,
+            [JOB_LOCK_TIMEOUT_SECONDS, JOB_MAX_ATTEMPTS],
+        )
+        requeued = cur.rowcount
+        cur.execute(
+            """
+            SELECT id, job_id, file_name
+            FROM ingest_job_files
+            WHERE status = 'running'
+              AND locked_at < NOW() - make_interval(secs => %s)
+              AND attempts >= %s
+            """,
+            [JOB_LOCK_TIMEOUT_SECONDS, JOB_MAX_ATTEMPTS],
+        )
+        exhausted = cur.fetchall()
+
+    for file_id, job_id, file_name in exhausted:
+        _finish_file(
+            str(file_id),
+            str(job_id),
+            {"file_name": file_name, "status": "error", "reason": f"gave up after {JOB_MAX_ATTEMPTS} attempts"},
+        )
+    return requeued
+
+
+def run_worker(
+    concurrency: int = JOB_WORKER_CONCURRENCY,
+    poll_seconds: float = JOB_WORKER_POLL_SECONDS,
+    stop_event: Optional[threading.Event] = None,
+):
+    """Claim-and-process loop. Claims at most `concurrency` files at a time."""
+    worker_id = f"{socket.gethostname()}:{os.getpid()}:{threading.get_ident()}"
+    stop_event = stop_event or threading.Event()
+    last_recovery = 0.0
+
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="ingest-worker") as pool:
+        while not stop_event.is_set():
+            try:
+                if time.monotonic() - last_recovery > JOB_LOCK_TIMEOUT_SECONDS / 4:
+                    recover_stale_files()
+                    last_recovery = time.monotonic()
+                rows = claim_files(worker_id, concurrency)
+            except Exception as e:
+                print(f"Ingest worker poll failed: {e}")
+                rows = []
+
+            if not rows:
+                stop_event.wait(poll_seconds)
+                continue
+            list(pool.map(process_claimed_file, rows))
+
+
+_background_thread: Optional[threading.Thread] = None
+_background_pid: Optional[int] = None
+_background_lock = threading.Lock()
+
+
+def start_background_worker():
+    """Start (once per process) a daemon thread running run_worker()."""
+    global _background_thread, _background_pid
+    with _background_lock:
+        if (
+            _background_thread is not None
+            and _background_thread.is_alive()
+            and _background_pid == os.getpid()
+        ):
+            return
+        _background_thread = threading.Thread(target=run_worker, name="ingest-worker-loop", daemon=True)
+        _background_pid = os.getpid()
+        _background_thread.start()
+
+
+if __name__ == "__main__":
+    print(f"Ingest worker started (concurrency={JOB_WORKER_CONCURRENCY})")
+    run_worker()
@@ -3,14 +3,14 @@ import uuid
 from datetime import datetime, timezone
 from typing import Any, Dict, List
 
-import google.generativeai as genai
 from psycopg2.extras import Json
 
 from config import EMBEDDING_MODEL, GEMINI_API_KEY
 from db import db_cursor
-
-# Configure Gemini API
-genai.configure(api_key=GEMINI_API_KEY)
+from embedding_service import embed_text
+from match_cache import bump_index_version
+from skills_taxonomy import jd_skill_metadata
+from vector_codec import format_vector, vector_param
 
 
 def _ensure_key():
@@ -40,21 +40,14 @@ def build_embedding_text(structured_jd: Dict[str, Any], summary: str | None = No
 
 
 def get_embedding_vector(text: str) -> List[float]:
-    """Generate embedding using Gemini's embedding API."""
+    """Generate embedding using Gemini's embedding API (cached + batched)."""
     _ensure_key()
     
-    # Use Gemini's embedding model
-    result = genai.embed_content(
-        model=f"models/{EMBEDDING_MODEL}",
-        content=text,
-        task_type="retrieval_document"
-    )
-    
-    return result["embedding"]
+    return embed_text(text, task_type="retrieval_document")
 
 
 def embedding_to_literal(vec: List[float]) -> str:
-    return "[" + ",".join(str(x) for x in vec) + "]"
+    return format_vector(vec)
 
 
 def build_summary(structured_jd: Dict[str, Any], raw_jd_text: str) -> str:
@@ -114,7 +107,6 @@ def create_memory(
     summary = build_summary(structured_jd, raw_jd_text)
     embed_text = build_embedding_text(structured_jd, summary=summary)
     embedding = get_embedding_vector(embed_text)
-    embedding_literal = embedding_to_literal(embedding)
 
     exp = structured_jd.get("experience") or {}
     salary = structured_jd.get("salary") or {}
@@ -142,21 +134,24 @@ def create_memory(
     canonical_json = structured_jd
 
     with db_cursor() as cur:
+        # Canonical skill names + ids (skills_taxonomy), resolved in the same transaction.
+        metadata.update(jd_skill_metadata(cur, metadata["primary_skills"], metadata["secondary_skills"]))
         cur.execute(
             """
             INSERT INTO memories (id, type, title, text, embedding, metadata, canonical_json, created_at, updated_at)
-            VALUES (%s, %s, %s, %s, %s::vector, %s, %s, NOW(), NOW())
+            VALUES (%s, %s, %s, %s, %s, %s, %s, NOW(), NOW())
             """,
             [
                 memory_uuid,
                 "job",
                 title,
                 embed_text,
-                embedding_literal,
+                vector_param(embedding),
                 Json(metadata),
                 Json(canonical_json),
             ],
         )
+    bump_index_version()
 
     memory_id = f"job:{job_id}:v1" if job_id else f"job:{memory_uuid}"
 
@@ -1,13 +1,11 @@
-import json
-from typing import Any, Dict, Iterable
-
-import yaml
-import google.generativeai as genai
+from typing import Any, Dict
 
 from config import CHAT_MODEL, GEMINI_API_KEY
+from parse_cache import cached_parse
+from structured_output import generate_json
 
-# Configure Gemini API
-genai.configure(api_key=GEMINI_API_KEY)
+# Bump whenever the prompts or FUNCTION_SCHEMA change so cached parses are not reused
+JD_PROMPT_VERSION = "2"
 
 FUNCTION_SCHEMA = {
     "name": "extract_jd",
@@ -45,15 +43,6 @@ FUNCTION_SCHEMA = {
     },
 }
 
-FALLBACK_PROMPT = (
-    "You are a structured job-description parser. Output only valid JSON matching this schema: "
-    "{ 'role': string|null, 'team': string|null, 'location': string|null, 'employment_type': string|null, "
-    "'experience': {'min': int|null, 'max': int|null, 'units': 'years'|null}|null, "
-    "'salary': {'min': number|null, 'max': number|null, 'currency': string|null}|null, "
-    "'primary_skills': [strings], 'secondary_skills': [strings], 'responsibilities': [strings], "
-    "'education': [strings], 'nice_to_have': [strings], 'keywords': [strings] }. Return ONLY JSON."
-)
-
 
 def _ensure_key():
     if not GEMINI_API_KEY:
@@ -61,12 +50,9 @@ def _ensure_key():
 
 
 def _call_llm_with_schema(jd_text: str) -> Dict[str, Any]:
-    """Call Gemini API with structured schema for JD parsing."""
+    """Call Gemini API in JSON mode with FUNCTION_SCHEMA as the response schema."""
     _ensure_key()
     
-    # Create the model
-    model = genai.GenerativeModel(CHAT_MODEL)
-    
     # Create structured prompt
     prompt = f"""You are a precise JD parsing assistant. Extract structured fields from this job description.
 
@@ -89,84 +75,19 @@ Extract and return a JSON object with the following fields:
 
 Return ONLY a valid JSON object. Do not include any explanation or markdown formatting."""
 
-    # Generate content
-    response = model.generate_content(prompt)
-    
-    # Extract and parse response
-    response_text = response.text.strip()
-    
-    # Remove markdown code blocks if present
-    if response_text.startswith("```json"):
-        response_text = response_text[7:]
-    if response_text.startswith("```"):
-        response_text = response_text[3:]
-    if response_text.endswith("```"):
-        response_text = response_text[:-3]
-    
-    response_text = response_text.strip()
-    
-    return json.loads(response_text)
-
-
-def _extract_structured_json(content: str) -> Dict[str, Any]:
-    """
-    Try multiple strategies to coerce a JSON-like string into a real dict.
-    LLMs sometimes wrap JSON with prose or swap double quotes for single ones,
-    so we progressively clean until parsing succeeds.
-    """
-
-    def _candidates(raw: str) -> Iterable[str]:
-        stripped = raw.strip()
-        if stripped:
-            yield stripped
-
-        start = stripped.find("{")
-        end = stripped.rfind("}")
-        if start != -1 and end != -1 and end > start:
-            yield stripped[start : end + 1]
-
-    for candidate in _candidates(content):
-        try:
-            parsed = json.loads(candidate)
-            if isinstance(parsed, dict):
-                return parsed
-        except json.JSONDecodeError:
-            pass
-
-        try:
-            parsed = yaml.safe_load(candidate)
-            if isinstance(parsed, dict):
-                return parsed
-        except yaml.YAMLError:
-            pass
-
-    raise ValueError("LLM response missing valid JSON")
-
-
-def _fallback_parse(jd_text: str) -> Dict[str, Any]:
-    """Fallback parsing method using simple prompt."""
-    _ensure_key()
-    
-    model = genai.GenerativeModel(CHAT_MODEL)
-    
-    prompt = f"""{FALLBACK_PROMPT}
-
-Job Description:
-{jd_text}"""
-    
-    response = model.generate_content(prompt)
-    content = response.text or ""
-    
-    return _extract_structured_json(content)
+    return generate_json(prompt, FUNCTION_SCHEMA["parameters"])
 
 
 def parse_jd_with_function_call(jd_text: str) -> Dict[str, Any]:
     """
     Parse job description text using Gemini API.
     
-    Tries structured parsing first, falls back to simpler method if needed.
+    Malformed replies are repaired locally; the model is re-called only if
+    that fails (LLM_JSON_MAX_RECALLS).
+    Repeat uploads of the same text are served from the parse cache.
     """
-    try:
-        return _call_llm_with_schema(jd_text)
-    except Exception:
-        return _fallback_parse(jd_text)
+    return cached_parse("jd", jd_text, CHAT_MODEL, JD_PROMPT_VERSION, _parse_jd_uncached)
+
+
+def _parse_jd_uncached(jd_text: str) -> Dict[str, Any]:
+    return _call_llm_with_schema(jd_text)
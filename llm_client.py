@@ -0,0 +1,267 @@
+"""
+Shared Gemini client for every LLM and embedding call in the app.
+
+- genai.configure runs once, on first use, instead of at import in each module
+- per-minute token buckets for requests and (estimated) tokens, so bulk
+  uploads queue locally instead of collecting 429s
+- jittered exponential backoff on retriable errors (429, 5xx, timeouts)
+- a timeout on every request
+- a process-wide semaphore capping calls in flight (LLM_MAX_CONCURRENCY)
+
+The async helpers run the same sync path on a worker thread, so both share
+the limits above.
+"""
+import asyncio
+import random
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+import google.generativeai as genai
+
+from config import (
+    GEMINI_API_KEY,
+    CHAT_MODEL,
+    EMBEDDING_MODEL,
+    LLM_TIMEOUT_SECONDS,
+    LLM_MAX_RETRIES,
+    LLM_RETRY_BASE_SECONDS,
+    LLM_RETRY_MAX_SECONDS,
+    LLM_MAX_CONCURRENCY,
+    LLM_REQUESTS_PER_MINUTE,
+    LLM_TOKENS_PER_MINUTE,
+    EMBEDDING_REQUESTS_PER_MINUTE,
+)
+
+# HTTP statuses / google.api_core exception names worth retrying.
+_RETRIABLE_CODES = {408, 429, 500, 502, 503, 504}
+_RETRIABLE_NAMES = {
+    "ResourceExhausted",
+    "TooManyRequests",
+    "ServiceUnavailable",
+    "InternalServerError",
+    "DeadlineExceeded",
+    "GatewayTimeout",
+    "BadGateway",
+    "RequestTimeout",
+}
+_CHARS_PER_TOKEN = 4
+
+
+class TokenBucket:
+    """
+    Per-minute budget refilled continuously. reserve() books the cost
+    immediately (the balance may go negative) and returns how long the caller
+    must wait, so concurrent callers queue in arrival order.
+    """
+
+    def __init__(self, per_minute: float, burst_seconds: float = 10.0):
+        self.per_minute = per_minute
+        self.rate = per_minute / 60.0
+        self.capacity = max(1.0, self.rate * burst_seconds)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.per_minute > 0
+
+    def reserve(self, cost: float) -> float:
+        if not self.enabled:
+            return 0.0
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= cost
+            return max(0.0, -self._tokens / self.rate)
+
+    def adjust(self, delta: float):
+        """Correct an estimate once the real cost is known (negative refunds)."""
+        if not self.enabled:
+            return
+        with self._lock:
+            self._tokens = min(self.capacity, self._tokens - delta)
+
+
+_request_buckets = {
+    "chat": TokenBucket(LLM_REQUESTS_PER_MINUTE),
+    "embed": TokenBucket(EMBEDDING_REQUESTS_PER_MINUTE),
+}
+_token_bucket = TokenBucket(LLM_TOKENS_PER_MINUTE)
+_semaphore = threading.BoundedSemaphore(LLM_MAX_CONCURRENCY)
+
+_configure_lock = threading.Lock()
+_configured = False
+
+_stats_lock = threading.Lock()
+_stats = {
+    "calls": 0,
+    "attempts": 0,
+    "retries": 0,
+    "failures": 0,
+    "timeouts": 0,
+    "throttled": 0,
+    "throttle_wait_ms": 0.0,
+    "in_flight": 0,
+    "peak_in_flight": 0,
+    "tokens": 0,
+}
+
+
+def _bump(counter: str, n: float = 1):
+    with _stats_lock:
+        _stats[counter] += n
+
+
+def _ensure_configured():
+    global _configured
+    if not GEMINI_API_KEY:
+        raise RuntimeError("GEMINI_API_KEY is not set")
+    if _configured:
+        return
+    with _configure_lock:
+        if not _configured:
+            genai.configure(api_key=GEMINI_API_KEY)
+            _configured = True
+
+
+def estimate_tokens(text: str) -> int:
+    return max(1, len(text or "") // _CHARS_PER_TOKEN)
+
+
+def is_retriable(error: Exception) -> bool:
+    if isinstance(error, (TimeoutError, ConnectionError)):
+        return True
+    if type(error).__name__ in _RETRIABLE_NAMES:
+        return True
+    code = getattr(error, "code", None)
+    return isinstance(code, int) and code in _RETRIABLE_CODES
+
+
+def _backoff_seconds(attempt: int) -> float:
+    # "Full jitter": spreads retries from many callers hit by the same 429.
+    return random.uniform(0, min(LLM_RETRY_MAX_SECONDS, LLM_RETRY_BASE_SECONDS * (2 ** attempt)))
+
+
+def _throttle(kind: str, tokens: int):
+    wait = _request_buckets[kind].reserve(1)
+    if kind == "chat":
+        wait = max(wait, _token_bucket.reserve(tokens))
+    if wait > 0:
+        _bump("throttled")
+        _bump("throttle_wait_ms", wait * 1000)
+        time.sleep(wait)
+
+
+def _call(kind: str, fn: Callable[[], Any], estimated_tokens: int = 0) -> Any:
+    _ensure_configured()
+    _bump("calls")
+    attempt = 0
+    while True:
+        _throttle(kind, estimated_tokens)
+        with _semaphore:
+            with _stats_lock:
+                _stats["attempts"] += 1
+                _stats["in_flight"] += 1
+                _stats["peak_in_flight"] = max(_stats["peak_in_flight"], _stats["in_flight"])
+            try:
+                return fn()
+            except Exception as e:
+                error = e
+            finally:
+                _bump("in_flight", -1)
+
+        if type(error).__name__ == "DeadlineExceeded" or isinstance(error, TimeoutError):
+            _bump("timeouts")
+        if attempt >= LLM_MAX_RETRIES or not is_retriable(error):
+            _bump("failures")
+            raise error
+        attempt += 1
+        _bump("retries")
+        delay = _backoff_seconds(attempt)
+        print(f"Gemini {kind} call failed ({type(error).__name__}: {error}); retry {attempt} in {delay:.1f}s")
+        time.sleep(delay)
+
+
+def _record_usage(response: Any, estimated_tokens: int):
+    usage = getattr(response, "usage_metadata", None)
+    actual = getattr(usage, "total_token_count", None) if usage is not None else None
+    if actual:
+        _token_bucket.adjust(actual - estimated_tokens)
+        _bump("tokens", actual)
+
+
+def generate(
+    prompt: Any,
+    *,
+    model: str = CHAT_MODEL,
+    generation_config: Optional[Dict[str, Any]] = None,
+    timeout: Optional[float] = None,
+    consume: Optional[Callable[[Any], Any]] = None,
+    **kwargs,
+) -> Any:
+    """
+    generate_content() with rate limiting, retries and a timeout; returns the
+    response, or consume(response) when given. consume runs inside the retry
+    loop and the concurrency slot, which is where a stream=True reply is read.
+    """
+    estimated = estimate_tokens(prompt if isinstance(prompt, str) else str(prompt))
+    request_options = {"timeout": timeout or LLM_TIMEOUT_SECONDS}
+
+    def _run():
+        response = genai.GenerativeModel(model).generate_content(
+            prompt,
+            generation_config=generation_config,
+            request_options=request_options,
+            **kwargs,
+        )
+        result = consume(response) if consume else response
+        _record_usage(response, estimated)
+        return result
+
+    return _call("chat", _run, estimated)
+
+
+def generate_text(prompt: Any, **kwargs) -> str:
+    return (generate(prompt, **kwargs).text or "").strip()
+
+
+async def generate_async(prompt: Any, **kwargs) -> Any:
+    return await asyncio.to_thread(generate, prompt, **kwargs)
+
+
+async def generate_text_async(prompt: Any, **kwargs) -> str:
+    return await asyncio.to_thread(generate_text, prompt, **kwargs)
+
+
+def embed(texts: List[str], task_type: str, *, model: str = EMBEDDING_MODEL, timeout: Optional[float] = None) -> List[List[float]]:
+    """Batched embed_content() through the same limits (own per-minute request budget)."""
+    request_options = {"timeout": timeout or LLM_TIMEOUT_SECONDS}
+
+    def _run():
+        return genai.embed_content(
+            model=f"models/{model}",
+            content=texts,
+            task_type=task_type,
+            request_options=request_options,
+        )
+
+    result = _call("embed", _run)
+    return [list(vec) for vec in result["embedding"]]
+
+
+async def embed_async(texts: List[str], task_type: str, **kwargs) -> List[List[float]]:
+    return await asyncio.to_thread(embed, texts, task_type, **kwargs)
+
+
+def get_llm_client_stats() -> Dict[str, Any]:
+    with _stats_lock:
+        stats = dict(_stats)
+    stats["throttle_wait_ms"] = round(stats["throttle_wait_ms"], 1)
+    stats["max_concurrency"] = LLM_MAX_CONCURRENCY
+    stats["requests_per_minute"] = LLM_REQUESTS_PER_MINUTE
+    stats["tokens_per_minute"] = LLM_TOKENS_PER_MINUTE
+    stats["embedding_requests_per_minute"] = EMBEDDING_REQUESTS_PER_MINUTE
+    return stats
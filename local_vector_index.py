@@ -0,0 +1,394 @@
+"""
+In-process NumPy index over resume embeddings (VECTOR_SEARCH_BACKEND=local).
+
+The dashboard matches the same few JDs over and over; with this backend a
+top-K query is one matmul + argpartition over a contiguous matrix of
+L2-normalized resume vectors instead of an ORDER BY on Postgres.
+
+Layout:
+  - base: a snapshot written by build_snapshot() under LOCAL_INDEX_DIR and
+    opened with np.load(mmap_mode="r"), so gunicorn workers share the pages
+    through the OS cache and start without reading every embedding from SQL
+  - delta: rows inserted/updated since the snapshot, kept in RAM
+  - a tombstone mask hides base rows that were updated (now in delta) or deleted
+
+sync() polls resumes.updated_at (with an overlap window for late commits) at
+most every LOCAL_INDEX_SYNC_SECONDS and detects deletes by row count. When
+the delta grows past LOCAL_INDEX_COMPACT_RATIO of the base, the snapshot is
+rewritten. Metadata filters and hybrid scoring still go to pgvector.
+"""
+import json
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from config import (
+    LOCAL_INDEX_DIR,
+    LOCAL_INDEX_DTYPE,
+    LOCAL_INDEX_SYNC_SECONDS,
+    LOCAL_INDEX_COMPACT_RATIO,
+)
+from db import get_connection
+from vector_codec import to_float32
+
+# Rows committed by a long transaction can carry an updated_at older than our
+# watermark; re-reading this much history on each poll catches them.
+_SYNC_OVERLAP = timedelta(minutes=5)
+# float16 has no BLAS path; score it in float32 chunks of this many rows.
+_SCORE_CHUNK_ROWS = 4096
+
+_MATRIX_FILE = "resumes.npy"
+_META_FILE = "resumes.meta.json"
+
+
+def _to_vector(value: Any) -> np.ndarray:
+    # Text form "[...]" without the pgvector adapter, ndarray with it.
+    vec = to_float32(value)
+    norm = float(np.linalg.norm(vec))
+    return vec / norm if norm > 0 else vec
+
+
+class LocalVectorIndex:
+    def __init__(self, directory: str = LOCAL_INDEX_DIR, dtype: str = LOCAL_INDEX_DTYPE):
+        if dtype not in ("float32", "float16"):
+            raise ValueError(f"Unsupported LOCAL_INDEX_DTYPE: {dtype}")
+        self.directory = directory
+        self.dtype = np.dtype(dtype)
+        self._lock = threading.RLock()
+
+        self._base = np.zeros((0, 0), dtype=self.dtype)
+        self._base_ids: List[str] = []
+        self._base_info: List[Tuple] = []
+        self._base_alive = np.zeros(0, dtype=bool)
+        self._base_pos: Dict[str, int] = {}
+        self._snapshot_mtime: Optional[float] = None
+        self._snapshot_watermark: Optional[datetime] = None
+
+        self._delta: Dict[str, Tuple[np.ndarray, Tuple]] = {}
+        self._delta_matrix: Optional[np.ndarray] = None
+        self._delta_ids: List[str] = []
+
+        self._watermark: Optional[datetime] = None
+        self._last_sync = 0.0
+        self._stats = {"queries": 0, "syncs": 0, "rows_synced": 0, "full_reloads": 0, "compactions": 0}
+
+    # ------------------------------------------------------------------ #
+    # snapshot
+    # ------------------------------------------------------------------ #
+    def _paths(self) -> Tuple[str, str]:
+        return (
+            os.path.join(self.directory, _MATRIX_FILE),
+            os.path.join(self.directory, _META_FILE),
+        )
+
+    def _load_snapshot(self) -> bool:
+        matrix_path, meta_path = self._paths()
+        if not (os.path.exists(matrix_path) and os.path.exists(meta_path)):
+            return False
+        with open(meta_path, "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        if meta.get("dtype") != self.dtype.name:
+            return False
+
+        base = np.load(matrix_path, mmap_mode="r")
+        if len(base) != len(meta["ids"]):
+            return False  # caught between the two renames of a rebuild; retry on next sync
+        self._base = base
+        self._base_ids = meta["ids"]
+        self._base_info = [tuple(info) for info in meta["info"]]
+        self._base_alive = np.ones(len(self._base_ids), dtype=bool)
+        self._base_pos = {rid: i for i, rid in enumerate(self._base_ids)}
+        self._watermark = datetime.fromisoformat(meta["watermark"]) if meta.get("watermark") else None
+        self._snapshot_watermark = self._watermark
+        self._snapshot_mtime = os.path.getmtime(meta_path)
+        self._delta.clear()
+        self._rebuild_delta_matrix()
+        return True
+
+    def build_snapshot(self) -> int:
+        """Read every resume embedding and write a fresh snapshot atomically."""
+        conn = get_connection()
+        try:
+            cur = conn.cursor()
+            cur.execute(
+                """
+                SELECT id, candidate_name, title, metadata->>'file_name', embedding, updated_at
+                FROM resumes
+                WHERE type = 'resume' AND embedding IS NOT NULL
+                ORDER BY id
+                """
+            )
+            rows = cur.fetchall()
+            cur.close()
+        finally:
+            conn.close()
+
+        os.makedirs(self.directory, exist_ok=True)
+        matrix_path, meta_path = self._paths()
+        dim = len(_to_vector(rows[0][4])) if rows else 0
+        matrix = np.zeros((len(rows), dim), dtype=self.dtype)
+        for i, row in enumerate(rows):
+            matrix[i] = _to_vector(row[4])
+        watermark = max((row[5] for row in rows if row[5] is not None), default=None)
+        meta = {
+            "dtype": self.dtype.name,
+            "ids": [str(row[0]) for row in rows],
+            "info": [[row[1], row[2], row[3]] for row in rows],
+            "watermark": watermark.isoformat() if watermark else None,
+            "built_at": datetime.now().isoformat(),
+        }
+
+        # Write-then-rename so workers never open a half-written snapshot.
+        tmp_matrix = matrix_path + f".{os.getpid()}.tmp"
+        tmp_meta = meta_path + f".{os.getpid()}.tmp"
+        with open(tmp_matrix, "wb") as f:
+            np.save(f, matrix)
+        with open(tmp_meta, "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+        os.replace(tmp_matrix, matrix_path)
+        os.replace(tmp_meta, meta_path)
+
+        with self._lock:
+            self._load_snapshot()
+            self._last_sync = 0.0
+        return len(rows)
+
+    # ------------------------------------------------------------------ #
+    # sync
+    # ------------------------------------------------------------------ #
+    def _rebuild_delta_matrix(self):
+        self._delta_ids = list(self._delta)
+        if self._delta_ids:
+            self._delta_matrix = np.stack([self._delta[rid][0] for rid in self._delta_ids]).astype(self.dtype)
+        else:
+            self._delta_matrix = None
+
+    def _live_count(self) -> int:
+        return int(self._base_alive.sum()) + len(self._delta)
+
+    def sync(self, cur, force: bool = False):
+        """Apply changes since the last poll using the caller's cursor."""
+        with self._lock:
+            if not force and time.monotonic() - self._last_sync < LOCAL_INDEX_SYNC_SECONDS:
+                return
+
+            _, meta_path = self._paths()
+            if os.path.exists(meta_path) and os.path.getmtime(meta_path) != self._snapshot_mtime:
+                # Another process compacted; pick up the new snapshot.
+                self._load_snapshot()
+
+            since = (self._watermark - _SYNC_OVERLAP) if self._watermark else datetime(1970, 1, 1)
+            cur.execute(
+                """
+                SELECT id, candidate_name, title, metadata->>'file_name', embedding, updated_at
+                FROM resumes
+                WHERE type = 'resume' AND embedding IS NOT NULL AND updated_at > %s
+                """,
+                [since],
+            )
+            for rid, name, title, file_name, embedding, updated_at in cur.fetchall():
+                rid = str(rid)
+                pos = self._base_pos.get(rid)
+                if pos is not None:
+                    if (
+                        self._snapshot_watermark is not None
+                        and updated_at is not None
+                        and updated_at <= self._snapshot_watermark
+                    ):
+                        continue  # overlap re-read of a row the snapshot already has
+                    self._base_alive[pos] = False
+                self._delta[rid] = (_to_vector(embedding), (name, title, file_name))
+                if updated_at is not None and (self._watermark is None or updated_at > self._watermark):
+                    self._watermark = updated_at
+                self._stats["rows_synced"] += 1
+
+            cur.execute("SELECT COUNT(*) FROM resumes WHERE type = 'resume' AND embedding IS NOT NULL")
+            if cur.fetchone()[0] != self._live_count():
+                # Deletes are invisible to updated_at polling; reconcile ids.
+                cur.execute("SELECT id FROM resumes WHERE type = 'resume' AND embedding IS NOT NULL")
+                live = {str(row[0]) for row in cur.fetchall()}
+                for rid, pos in self._base_pos.items():
+                    if rid not in live:
+                        self._base_alive[pos] = False
+                for rid in [rid for rid in self._delta if rid not in live]:
+                    del self._delta[rid]
+                self._stats["full_reloads"] += 1
+
+            self._rebuild_delta_matrix()
+            self._last_sync = time.monotonic()
+            self._stats["syncs"] += 1
+
+    def needs_compaction(self) -> bool:
+        base = max(len(self._base_ids), 1)
+        return len(self._delta) > max(LOCAL_INDEX_COMPACT_RATIO * base, 1000) or (
+            not self._base_ids and bool(self._delta)
+        )
+
+    # ------------------------------------------------------------------ #
+    # query
+    # ------------------------------------------------------------------ #
+    def _score_base(self, queries: np.ndarray) -> np.ndarray:
+        """(n_base, n_queries) cosine scores; dead rows get -inf."""
+        n_queries = queries.shape[1]
+        if not len(self._base_ids):
+            return np.zeros((0, n_queries), dtype=np.float32)
+        if self._base.dtype == np.float32:
+            scores = self._base @ queries
+        else:
+            scores = np.empty((len(self._base_ids), n_queries), dtype=np.float32)
+            for start in range(0, len(self._base_ids), _SCORE_CHUNK_ROWS):
+                chunk = np.asarray(self._base[start:start + _SCORE_CHUNK_ROWS], dtype=np.float32)
+                scores[start:start + len(chunk)] = chunk @ queries
+        scores[~self._base_alive] = -np.inf
+        return scores
+
+    def _row(self, idx: int, n_base: int) -> Tuple[str, Tuple]:
+        if idx < n_base:
+            return self._base_ids[idx], self._base_info[idx]
+        rid = self._delta_ids[idx - n_base]
+        return rid, self._delta[rid][1]
+
+    def search_many(self, query_vectors: List[Any], top_k: int) -> List[List[Dict[str, Any]]]:
+        """
+        Top-K by cosine similarity for several queries with one matrix product.
+        Each result list has the same shape as ranking's pgvector path.
+        """
+        if not query_vectors:
+            return []
+        queries = np.stack([_to_vector(vec) for vec in query_vectors], axis=1)
+        with self._lock:
+            self._stats["queries"] += len(query_vectors)
+            base_scores = self._score_base(queries)
+            if self._delta_matrix is not None:
+                delta_scores = np.asarray(self._delta_matrix, dtype=np.float32) @ queries
+                scores = np.concatenate([base_scores, delta_scores])
+            else:
+                scores = base_scores
+            n_base = len(base_scores)
+
+            all_results = []
+            for column in scores.T:
+                k = min(top_k, int(np.isfinite(column).sum()))
+                results = []
+                if k > 0:
+                    top = np.argpartition(-column, k - 1)[:k]
+                    top = top[np.argsort(-column[top])]
+                    for rank, idx in enumerate(top, start=1):
+                        rid, (name, title, file_name) = self._row(int(idx), n_base)
+                        similarity = float(column[idx])
+                        results.append(
+                            {
+                                "resume_id": rid,
+                                "candidate_name": name,
+                                "current_title": title,
+                                "file_name": file_name,
+                                "similarity": similarity,
+                                "ats_score": int(max(0.0, min(1.0, similarity)) * 100),
+                                "rank": rank,
+                            }
+                        )
+                all_results.append(results)
+            return all_results
+
+    def search(self, query_vector: Any, top_k: int) -> List[Dict[str, Any]]:
+        """Top-K by cosine similarity; same result shape as ranking's pgvector path."""
+        return self.search_many([query_vector], top_k)[0]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+            stats.update(
+                {
+                    "dtype": self.dtype.name,
+                    "base_rows": len(self._base_ids),
+                    "live_rows": self._live_count(),
+                    "delta_rows": len(self._delta),
+                    "memory_mapped": isinstance(self._base, np.memmap),
+                    "watermark": self._watermark.isoformat() if self._watermark else None,
+                }
+            )
+        return stats
+
+
+_index: Optional[LocalVectorIndex] = None
+_index_pid: Optional[int] = None
+_index_lock = threading.Lock()
+
+
+def get_local_index() -> LocalVectorIndex:
+    """Per-process index, opened from the snapshot (if any) on first use."""
+    global _index, _index_pid
+    with _index_lock:
+        if _index is None or _index_pid != os.getpid():
+            _index = LocalVectorIndex()
+            _index._load_snapshot()
+            _index_pid = os.getpid()
+        return _index
+
+
+def search_local_index(jd_memory_id: str, top_k: int) -> List[Dict[str, Any]]:
+    """Fetch the JD vector and poll for resume changes on one connection, then search in memory."""
+    index = get_local_index()
+    conn = get_connection()
+    try:
+        cur = conn.cursor()
+        cur.execute("SELECT embedding FROM memories WHERE id = %s", [jd_memory_id])
+        row = cur.fetchone()
+        if not row:
+            raise ValueError(f"No memory found with id={jd_memory_id}")
+        if row[0] is None:
+            # Same 400 the SQL path ends in, rather than a crash inside search().
+            raise ValueError(f"Memory id={jd_memory_id} has no embedding")
+        index.sync(cur)
+        cur.close()
+    finally:
+        conn.close()
+
+    if index.needs_compaction():
+        threading.Thread(target=_compact, args=(index,), name="local-index-compact", daemon=True).start()
+    return index.search(row[0], top_k)
+
+
+def search_local_index_batch(jd_memory_ids: List[str], top_k: int) -> Dict[str, List[Dict[str, Any]]]:
+    """Batch variant of search_local_index; JD ids that don't exist are left out."""
+    index = get_local_index()
+    conn = get_connection()
+    try:
+        cur = conn.cursor()
+        cur.execute("SELECT id, embedding FROM memories WHERE id = ANY(%s::uuid[])", [list(jd_memory_ids)])
+        jd_rows = [(str(jd_id), vec) for jd_id, vec in cur.fetchall() if vec is not None]
+        index.sync(cur)
+        cur.close()
+    finally:
+        conn.close()
+
+    if index.needs_compaction():
+        threading.Thread(target=_compact, args=(index,), name="local-index-compact", daemon=True).start()
+    matches = index.search_many([vec for _, vec in jd_rows], top_k)
+    return {jd_id: result for (jd_id, _), result in zip(jd_rows, matches)}
+
+
+_compacting = threading.Lock()
+
+
+def _compact(index: LocalVectorIndex):
+    if not _compacting.acquire(blocking=False):
+        return
+    try:
+        index.build_snapshot()
+        index._stats["compactions"] += 1
+    except Exception as e:
+        print(f"Local vector index compaction failed: {e}")
+    finally:
+        _compacting.release()
+
+
+def get_local_index_stats() -> Optional[Dict[str, Any]]:
+    # Only report once something actually used the local backend.
+    if _index is None or _index_pid != os.getpid():
+        return None
+    return _index.stats()
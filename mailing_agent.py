@@ -2,13 +2,10 @@
 """
 Mailing agent that generates personalized recruitment emails using LLM.
 """
-import google.generativeai as genai
 from typing import Dict, Any
 
-from config import GEMINI_API_KEY, CHAT_MODEL, COMPANY_NAME, BASE_URL
-
-# Configure Gemini API
-genai.configure(api_key=GEMINI_API_KEY)
+from config import COMPANY_NAME, BASE_URL
+from llm_client import generate_text
 
 
 def generate_personalized_email(
@@ -69,10 +66,7 @@ Return ONLY the email body text (no subject line). Use a friendly, professional
 
     try:
         # Use Gemini API to generate email
-        model = genai.GenerativeModel(CHAT_MODEL)
-        response = model.generate_content(prompt)
-        
-        email_body_text = response.text.strip()
+        email_body_text = generate_text(prompt)
         
         # Create HTML email with acknowledgement buttons
         interested_link = f"{BASE_URL}/acknowledge/{outreach_id}?response=interested"
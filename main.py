@@ -2,17 +2,29 @@
 from fastapi import FastAPI, UploadFile, File, Form, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse, JSONResponse
-from typing import Optional, List, Dict, Any
-import pdfplumber
-from io import BytesIO
+from fastapi.responses import FileResponse, JSONResponse, StreamingResponse
+from fastapi.concurrency import run_in_threadpool
+from typing import Optional, List
 import hashlib
+import json
+import time
 import psycopg2
 
 from jd_agent import analyze_job_description
 from ranker_agent import get_top_matches_for_role
-from resume_agent import process_resume_text
-from db import get_connection
+from resume_pipeline import ingest_resume_files
+from ingest_jobs import enqueue_resume_upload_job, get_job_status, iter_job_status
+from db import get_connection, get_pool_stats
+from parse_cache import get_parse_cache_stats
+from embedding_service import get_embedding_stats
+from pdf_extraction import PDFExtractionError, extract_pdf_text_async, get_pdf_extraction_stats
+from ranking import get_vector_search_stats
+from reranker import get_rerank_stats
+from match_cache import get_match_cache_stats
+from resume_dedup import get_resume_dedup_stats
+from llm_client import get_llm_client_stats
+from resume_parser import get_resume_parse_stats
+from structured_output import get_structured_output_stats
 
 
  
@@ -60,6 +72,24 @@ def debug():
         "EMBEDDING_MODEL": os.environ.get("EMBEDDING_MODEL"),
     }
 
+
+@app.get("/metrics")
+def metrics():
+    """Runtime performance counters for this worker process."""
+    return {
+        "db_pool": get_pool_stats(),
+        "parse_cache": get_parse_cache_stats(),
+        "embeddings": get_embedding_stats(),
+        "pdf_extraction": get_pdf_extraction_stats(),
+        "vector_search": get_vector_search_stats(),
+        "match_cache": get_match_cache_stats(),
+        "resume_dedup": get_resume_dedup_stats(),
+        "llm_client": get_llm_client_stats(),
+        "resume_parse": get_resume_parse_stats(),
+        "structured_output": get_structured_output_stats(),
+        "rerank": get_rerank_stats(),
+    }
+
 # Authentication helper
 def hash_password(password: str) -> str:
     """Hash password using SHA-256"""
@@ -188,9 +218,11 @@ async def get_outreach_logs():
                 co.acknowledgement,
                 co.sent_at,
                 co.acknowledged_at,
-                m.title as jd_title
+                m.title as jd_title,
+                1 - (r.embedding <=> m.embedding) as similarity
             FROM candidate_outreach co
             LEFT JOIN memories m ON co.jd_id = m.id
+            LEFT JOIN resumes r ON co.resume_id = r.id
             ORDER BY co.sent_at DESC
             LIMIT 100
         """)
@@ -208,7 +240,9 @@ async def get_outreach_logs():
                 "acknowledgement": row[4] if row[4] else "pending",
                 "sent_at": str(row[5]) if row[5] else None,
                 "acknowledged_at": str(row[6]) if row[6] else None,
-                "jd_title": row[7]
+                "jd_title": row[7],
+                # Computed from the resume/JD vectors; outreach rows don't store embeddings
+                "similarity": round(float(row[8]), 4) if row[8] is not None else None
             })
         
         return {
@@ -221,13 +255,6 @@ async def get_outreach_logs():
     finally:
         conn.close()
  
-def _extract_pdf_text(contents: bytes) -> str:
-    with pdfplumber.open(BytesIO(contents)) as pdf:
-        return "\n".join([page.extract_text() or "" for page in pdf.pages])
-
-
- 
- 
 @app.post("/jd/analyze/pdf")
 async def analyze_jd_pdf(
     job_id: Optional[str] = Form(default=None),
@@ -245,7 +272,10 @@ async def analyze_jd_pdf(
         if not contents:
             raise HTTPException(status_code=400, detail="Uploaded PDF is empty")
  
-        raw_jd_text = _extract_pdf_text(contents)
+        try:
+            raw_jd_text = await extract_pdf_text_async(contents)
+        except PDFExtractionError as e:
+            raise HTTPException(status_code=400, detail=str(e))
  
         if not raw_jd_text.strip():
             raise HTTPException(status_code=400, detail="JD text is empty after PDF extraction")
@@ -272,6 +302,7 @@ async def analyze_jd_pdf(
 async def upload_resumes(
     files: List[UploadFile] = File(...),
     source_url: Optional[str] = Form(default=None),
+    background: bool = Form(False),
 ):
     """
     Upload MULTIPLE resume PDFs.
@@ -279,86 +310,91 @@ async def upload_resumes(
       - Extract text
       - Parse with LLM
       - Store resume + vector
-    Returns basic info for UI.
+    Files go through the staged pipeline in resume_pipeline.py (extraction,
+    parsing, embedding and inserts overlap across files).
+    Returns basic info for UI plus per-stage timings.
+
+    With background=true the files are queued as a job instead and the
+    response (202) carries a job_id to poll at /resumes/upload/{job_id}.
     """
     if not files:
         raise HTTPException(status_code=400, detail="No files uploaded")
 
-    results: List[Dict[str, Any]] = []
-
+    payload = []
     for file in files:
-        filename = file.filename
-
-        if not filename.lower().endswith(".pdf"):
-            results.append({
-                "file_name": filename,
-                "status": "skipped",
-                "reason": "not a PDF",
-            })
-            continue
+        payload.append((file.filename, await file.read()))
 
+    if background:
         try:
-            contents = await file.read()
-            if not contents:
-                results.append({
-                    "file_name": filename,
-                    "status": "error",
-                    "reason": "empty file",
-                })
-                continue
+            job = await run_in_threadpool(enqueue_resume_upload_job, payload, source_url)
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Internal error (resumes/upload): {e}")
+        return JSONResponse(job, status_code=202)
 
-            # Extract text from PDF
-            raw_text = _extract_pdf_text(contents).strip()
-            if not raw_text:
-                results.append({
-                    "file_name": filename,
-                    "status": "error",
-                    "reason": "no text extracted",
-                })
-                continue
-
-            processed = process_resume_text(
-                raw_text=raw_text,
-                source_url=source_url,
-                file_name=filename,
-            )
-            resume_id = processed["resume_id"]
-            parsed = processed["parsed"]
-
-            results.append({
-                "file_name": filename,
-                "status": "ok",
-                "resume_id": resume_id,
-                "candidate_name": parsed.get("candidate_name"),
-                "current_title": parsed.get("current_title"),
-            })
+    try:
+        # Blocking pipeline runs off the event loop so other requests keep flowing.
+        return await run_in_threadpool(ingest_resume_files, payload, source_url)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Internal error (resumes/upload): {e}")
 
-        except Exception as e:
-            results.append({
-                "file_name": filename,
-                "status": "error",
-                "reason": str(e),
-            })
 
-    return {
-        "count": len(results),
-        "items": results,
-    }
+@app.get("/resumes/upload/{job_id}")
+async def get_upload_job_status(job_id: str, stream: bool = False):
+    """
+    Progress of a background upload job: overall status plus per-file items
+    (same shape as the synchronous upload response once a file is done).
+    With ?stream=true the status is pushed as server-sent events until done.
+    """
+    try:
+        status = await run_in_threadpool(get_job_status, job_id)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Internal error (resumes/upload status): {e}")
+    if status is None:
+        raise HTTPException(status_code=404, detail=f"Upload job not found: {job_id}")
 
+    if stream:
+        def event_stream():
+            for update in iter_job_status(job_id, initial=status):
+                yield f"data: {json.dumps(update)}\n\n"
 
+        return StreamingResponse(event_stream(), media_type="text/event-stream")
+    return status
 
-    
+
+@app.get("/jd/roles")
+async def search_jd_roles(q: str, limit: int = 5):
+    """
+    Ranked JD lookup by role name (exact, contains, then fuzzy trigram
+    matches), e.g. to disambiguate before /match/top-by-role.
+    """
+    try:
+        from ranking import find_jds_by_role
+        matches = await run_in_threadpool(find_jds_by_role, q, min(max(limit, 1), 50))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Internal error (jd/roles): {e}")
+    return {"query": q, "matches": matches}
 
 
 @app.post("/match/top-by-role")
 async def get_top_matches_by_role(
     role_name: str = Form(...),
     top_k: int = Form(3),
+    recall: Optional[str] = Form(default=None),
+    filters: Optional[str] = Form(default=None),
+    scoring: Optional[str] = Form(default=None),
+    rerank: Optional[str] = Form(default=None),
 ):
     """
     Input from UI:
       - role_name (e.g. 'Senior Data Scientist')
       - top_k (3 or 5)
+      - recall: optional 'fast' | 'balanced' | 'high' (ANN recall vs latency)
+      - filters: optional JSON, e.g. {"skills": ["python"], "min_experience": 3,
+        "location": "bangalore", "created_after": "2024-01-01"}
+      - scoring: optional 'vector' | 'hybrid' (cosine fused with full-text skill match)
+      - rerank: optional 'off' | 'local' | 'llm' (second-stage re-ranking of the top hits)
 
     Backend:
       - finds latest JD with that role in memories (type='job')
@@ -367,7 +403,12 @@ async def get_top_matches_by_role(
     """
     # If top_k is very large (e.g. 1000), it effectively returns "all"
     try:
-        matches = get_top_matches_for_role(role_name=role_name, top_k=top_k)
+        matches = await run_in_threadpool(
+            get_top_matches_for_role,
+            role_name=role_name, top_k=top_k, recall=recall, filters=filters, scoring=scoring, rerank=rerank,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Internal error (match/top-by-role): {e}")
 
@@ -382,11 +423,19 @@ async def get_top_matches_by_role(
 async def get_top_matches_by_jd_id(
     jd_id: str = Form(...),
     top_k: int = Form(3),
+    recall: Optional[str] = Form(default=None),
+    filters: Optional[str] = Form(default=None),
+    scoring: Optional[str] = Form(default=None),
+    rerank: Optional[str] = Form(default=None),
 ):
     """
     Input from UI:
       - jd_id: database UUID of the uploaded JD
       - top_k (3, 5, or 10)
+      - recall: optional 'fast' | 'balanced' | 'high' (ANN recall vs latency)
+      - filters: optional JSON, same shape as /match/top-by-role
+      - scoring: optional 'vector' | 'hybrid'
+      - rerank: optional 'off' | 'local' | 'llm'
 
     Backend:
       - uses the JD's embedding directly from the database
@@ -395,7 +444,12 @@ async def get_top_matches_by_jd_id(
     """
     try:
         from ranking import get_top_k_resumes_for_jd_memory
-        matches = get_top_k_resumes_for_jd_memory(jd_memory_id=jd_id, top_k=top_k)
+        matches = await run_in_threadpool(
+            get_top_k_resumes_for_jd_memory,
+            jd_memory_id=jd_id, top_k=top_k, recall=recall, filters=filters, scoring=scoring, rerank=rerank,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Internal error (match/top-by-jd): {e}")
 
@@ -406,6 +460,83 @@ async def get_top_matches_by_jd_id(
     }
 
 
+@app.post("/match/batch")
+async def get_top_matches_batch(
+    jd_ids: List[str] = Form(...),
+    top_k: int = Form(3),
+    recall: Optional[str] = Form(default=None),
+    filters: Optional[str] = Form(default=None),
+):
+    """
+    Input from UI:
+      - jd_ids: JD memory UUIDs (repeated field, a JSON list, or comma-separated)
+      - top_k, recall, filters: as in /match/top-by-jd
+
+    Backend:
+      - one query ranks resumes for every JD (LATERAL join per JD)
+      - returns top-K per JD in the order the ids were given; unknown ids are listed in "missing".
+    """
+    try:
+        if len(jd_ids) == 1 and jd_ids[0].strip().startswith("["):
+            jd_ids = json.loads(jd_ids[0])
+        elif len(jd_ids) == 1:
+            jd_ids = [part for part in jd_ids[0].split(",") if part.strip()]
+        jd_ids = [str(jd_id).strip() for jd_id in jd_ids]
+
+        from ranking import get_top_k_resumes_for_jd_memories
+        by_jd = await run_in_threadpool(
+            get_top_k_resumes_for_jd_memories, jd_ids, top_k, recall=recall, filters=filters
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Internal error (match/batch): {e}")
+
+    return {
+        "top_k": top_k,
+        "results": [{"jd_id": jd_id, "matches": by_jd[jd_id]} for jd_id in jd_ids if jd_id in by_jd],
+        "missing": [jd_id for jd_id in jd_ids if jd_id not in by_jd],
+    }
+
+
+@app.post("/match/jds-for-resume")
+async def get_top_jds_for_resume(
+    resume_id: str = Form(...),
+    top_k: int = Form(3),
+    recall: Optional[str] = Form(default=None),
+    filters: Optional[str] = Form(default=None),
+):
+    """
+    Input from UI:
+      - resume_id: database UUID of an uploaded resume
+      - top_k (3, 5, or 10)
+      - recall: optional 'fast' | 'balanced' | 'high'
+      - filters: optional JSON, e.g. {"employment_type": "full-time",
+        "location": "hyderabad", "experience": 5}
+
+    Backend:
+      - ranks open JDs (memories, type='job') against the resume's embedding
+      - returns top-K JDs with match score and the query latency.
+    """
+    started = time.perf_counter()
+    try:
+        from ranking import get_top_k_jds_for_resume
+        matches = await run_in_threadpool(
+            get_top_k_jds_for_resume, resume_id, top_k, recall=recall, filters=filters
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Internal error (match/jds-for-resume): {e}")
+
+    return {
+        "resume_id": resume_id,
+        "top_k": top_k,
+        "matches": matches,
+        "latency_ms": round((time.perf_counter() - started) * 1000, 1),
+    }
+
+
 @app.post("/send-emails")
 async def send_emails_to_candidates(
     jd_id: str = Form(...),
@@ -430,10 +561,10 @@ async def send_emails_to_candidates(
     conn = get_connection()
     
     try:
-        # Fetch JD details including embedding
+        # Fetch JD details
         cur = conn.cursor()
         cur.execute(
-            "SELECT id, title, canonical_json, embedding FROM memories WHERE id = %s",
+            "SELECT id, title, canonical_json FROM memories WHERE id = %s",
             [jd_id]
         )
         jd_row = cur.fetchone()
@@ -446,16 +577,13 @@ async def send_emails_to_candidates(
             "title": jd_row[1],
             "canonical_json": jd_row[2],
             "role": jd_row[2].get("role") if jd_row[2] else "Position",
-            "embedding": jd_row[3] # Get the JD embedding
         }
         
         # Process each candidate
         for idx, resume_id in enumerate(candidate_ids, start=1):
             try:
                 # Fetch resume details AND calculate similarity on the fly
-                # We use the JD embedding literal for the distance calculation
-                jd_embedding_literal = jd_data["embedding"]
-                
+                # The JD vector is referenced server-side; it never round-trips through Python
                 cur.execute(
                     """
                     SELECT 
@@ -464,12 +592,11 @@ async def send_emails_to_candidates(
                         email, 
                         canonical_json, 
                         metadata, 
-                        embedding,
-                        1 - (embedding <=> %s::vector) as similarity
+                        1 - (embedding <=> (SELECT embedding FROM memories WHERE id = %s)) as similarity
                     FROM resumes 
                     WHERE id = %s
                     """,
-                    [jd_embedding_literal, resume_id]
+                    [jd_id, resume_id]
                 )
                 resume_row = cur.fetchone()
                 
@@ -481,7 +608,7 @@ async def send_emails_to_candidates(
                     })
                     continue
                 
-                similarity = float(resume_row[6])
+                similarity = float(resume_row[5])
                 ats_score = int(max(0.0, min(1.0, similarity)) * 100)
                 
                 candidate_data = {
@@ -490,7 +617,6 @@ async def send_emails_to_candidates(
                     "email": resume_row[2],
                     "canonical_json": resume_row[3],
                     "metadata": resume_row[4],
-                    "embedding": resume_row[5]
                 }
                 
                 candidate_email = candidate_data.get("email")
@@ -523,15 +649,13 @@ async def send_emails_to_candidates(
                 )
                 
                 if send_result["success"]:
-                    # Store in database with embedding and REAL ATS score
-                    embedding_literal = candidate_data.get("embedding")
-                    
+                    # Store in database with REAL ATS score (the resume vector stays in resumes)
                     cur.execute(
                         """
                         INSERT INTO candidate_outreach 
                         (id, resume_id, jd_id, candidate_email, candidate_name, 
-                         email_subject, email_body, embedding, rank, ats_score)
-                        VALUES (%s, %s, %s, %s, %s, %s, %s, %s::vector, %s, %s)
+                         email_subject, email_body, rank, ats_score)
+                        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
                         """,
                         [
                             outreach_id,
@@ -541,7 +665,6 @@ async def send_emails_to_candidates(
                             candidate_data.get("candidate_name"),
                             email_content["subject"],
                             email_content["body"],
-                            embedding_literal,
                             idx,
                             ats_score
                         ]
@@ -0,0 +1,126 @@
+"""
+In-process cache for match results (JD -> resumes, resume -> JDs, role -> JD id).
+
+Keys are (kind, normalized query params, index version). The index version
+is the match_index_version_seq sequence in Postgres: every resume/JD write
+calls bump_index_version(), which advances it, so entries cached before the
+write stop matching in every worker process, not just the one that wrote.
+Workers re-read the sequence at most every MATCH_CACHE_VERSION_CHECK_SECONDS;
+the writing process sees its own writes immediately. Entries also expire
+after MATCH_CACHE_TTL_SECONDS.
+"""
+import copy
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict
+
+from config import (
+    MATCH_CACHE_ENABLED,
+    MATCH_CACHE_TTL_SECONDS,
+    MATCH_CACHE_MAX_ENTRIES,
+    MATCH_CACHE_VERSION_CHECK_SECONDS,
+)
+from db import db_cursor
+
+_lock = threading.Lock()
+_cache: "OrderedDict[str, tuple[float, Any]]" = OrderedDict()
+_version = {"value": 0, "checked_at": 0.0}
+_stats = {"hits": 0, "misses": 0, "expired": 0, "invalidations": 0, "version_errors": 0}
+
+
+def _bump(counter: str):
+    with _lock:
+        _stats[counter] += 1
+
+
+def current_index_version() -> int:
+    with _lock:
+        if time.monotonic() - _version["checked_at"] < MATCH_CACHE_VERSION_CHECK_SECONDS:
+            return _version["value"]
+
+    try:
+        with db_cursor() as cur:
+            cur.execute("SELECT last_value FROM match_index_version_seq")
+            value = int(cur.fetchone()[0])
+    except Exception as e:
+        print(f"Match cache version check failed: {e}")
+        _bump("version_errors")
+        value = None
+
+    with _lock:
+        if value is not None and value != _version["value"]:
+            _version["value"] = value
+            _cache.clear()
+        _version["checked_at"] = time.monotonic()
+        return _version["value"]
+
+
+def bump_index_version():
+    """Call after committing a resume/JD write: invalidates cached matches everywhere."""
+    if not MATCH_CACHE_ENABLED:
+        return
+    value = None
+    try:
+        with db_cursor() as cur:
+            cur.execute("SELECT nextval('match_index_version_seq')")
+            value = int(cur.fetchone()[0])
+    except Exception as e:
+        print(f"Match cache invalidation failed: {e}")
+        _bump("version_errors")
+
+    with _lock:
+        _cache.clear()
+        _version["value"] = value if value is not None else _version["value"] + 1
+        # Without the sequence, at least force other callers here to re-check soon.
+        _version["checked_at"] = time.monotonic() if value is not None else 0.0
+        _stats["invalidations"] += 1
+
+
+def cached_match(kind: str, params: Dict[str, Any], compute: Callable[[], Any]) -> Any:
+    """Return the cached result for (kind, params) or compute and store it."""
+    if not MATCH_CACHE_ENABLED:
+        return compute()
+
+    version = current_index_version()
+    key = json.dumps([kind, params, version], sort_keys=True, default=str)
+    now = time.monotonic()
+    with _lock:
+        entry = _cache.get(key)
+        if entry is not None:
+            expires_at, value = entry
+            if expires_at > now:
+                _cache.move_to_end(key)
+                _stats["hits"] += 1
+                return copy.deepcopy(value)
+            del _cache[key]
+            _stats["expired"] += 1
+        _stats["misses"] += 1
+
+    value = compute()
+    with _lock:
+        # Skip the store if a write landed while we were computing.
+        if _version["value"] == version:
+            _cache[key] = (time.monotonic() + MATCH_CACHE_TTL_SECONDS, copy.deepcopy(value))
+            _cache.move_to_end(key)
+            while len(_cache) > MATCH_CACHE_MAX_ENTRIES:
+                _cache.popitem(last=False)
+    return value
+
+
+def clear_match_cache():
+    with _lock:
+        _cache.clear()
+
+
+def get_match_cache_stats() -> Dict[str, Any]:
+    with _lock:
+        stats = dict(_stats)
+        stats["entries"] = len(_cache)
+        stats["index_version"] = _version["value"]
+    lookups = stats["hits"] + stats["misses"]
+    stats["enabled"] = MATCH_CACHE_ENABLED
+    stats["ttl_seconds"] = MATCH_CACHE_TTL_SECONDS
+    stats["hit_rate"] = round(stats["hits"] / lookups, 3) if lookups else 0.0
+    return stats
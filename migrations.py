@@ -1,5 +1,337 @@
 import psycopg2
 from db import get_connection
+from config import (
+    VECTOR_INDEX_TYPE,
+    HNSW_M,
+    HNSW_EF_CONSTRUCTION,
+    IVFFLAT_LISTS,
+    EMBEDDING_STORAGE,
+    VECTOR_PREFILTER,
+)
+from skills_taxonomy import backfill_skill_ids
+
+EMBEDDING_DIM = 768
+# Tables carrying a vector(768) column that gets an ANN index.
+VECTOR_INDEXED_TABLES = ("resumes", "memories")
+# Tables whose embedding column follows EMBEDDING_STORAGE.
+EMBEDDING_STORAGE_TABLES = ("resumes", "memories")
+BINARY_PREFILTER_INDEX = "idx_resumes_embedding_bq"
+
+
+def _vector_index_name(table: str, index_type: str) -> str:
+    return f"idx_{table}_embedding_{index_type}"
+
+
+def _create_vector_index_sql(
+    table: str,
+    index_type: str,
+    *,
+    lists: int = IVFFLAT_LISTS,
+    concurrently: bool = False,
+    storage: str = EMBEDDING_STORAGE,
+) -> str:
+    # Matching orders by `embedding <=> query`, so the indexes use the cosine
+    # opclass of the column type (vector_cosine_ops / halfvec_cosine_ops).
+    name = _vector_index_name(table, index_type)
+    opclass = f"{storage}_cosine_ops"
+    if concurrently:
+        prefix = f"CREATE INDEX CONCURRENTLY {name}"
+    else:
+        prefix = f"CREATE INDEX IF NOT EXISTS {name}"
+
+    if index_type == "hnsw":
+        return (
+            f"{prefix} ON {table} USING hnsw (embedding {opclass}) "
+            f"WITH (m = {int(HNSW_M)}, ef_construction = {int(HNSW_EF_CONSTRUCTION)});"
+        )
+    if index_type == "ivfflat":
+        return (
+            f"{prefix} ON {table} USING ivfflat (embedding {opclass}) "
+            f"WITH (lists = {int(lists)});"
+        )
+    raise ValueError(f"Unsupported vector index type: {index_type}")
+
+
+def ensure_vector_indexes(cur, index_type: str = VECTOR_INDEX_TYPE):
+    """
+    Create the cosine ANN index on each embedding column and drop the index
+    of the other type, so switching VECTOR_INDEX_TYPE only needs another init_db.
+    """
+    if index_type not in ("hnsw", "ivfflat", "none"):
+        raise ValueError(f"Unsupported VECTOR_INDEX_TYPE: {index_type}")
+
+    for table in VECTOR_INDEXED_TABLES:
+        for other in ("hnsw", "ivfflat"):
+            if other != index_type:
+                cur.execute(f"DROP INDEX IF EXISTS {_vector_index_name(table, other)};")
+        if index_type != "none":
+            # IVFFlat centroids are trained on the rows present at build time;
+            # call rebuild_vector_indexes() after loading real data.
+            cur.execute(_create_vector_index_sql(table, index_type))
+
+
+def drop_outreach_embedding(cur):
+    """
+    candidate_outreach used to store a copy of the resume embedding per email
+    sent. Outreach rows now reference the resume by resume_id and similarity
+    is computed from resumes/memories when needed, so the copy is dropped.
+    Rows that never got an ats_score are backfilled from the vectors first.
+    """
+    cur.execute("""
+        SELECT 1 FROM information_schema.columns
+        WHERE table_name = 'candidate_outreach' AND column_name = 'embedding'
+    """)
+    if not cur.fetchone():
+        return
+    cur.execute("""
+        UPDATE candidate_outreach co
+        SET ats_score = floor(GREATEST(0, LEAST(1, 1 - (r.embedding <=> m.embedding))) * 100)::int
+        FROM resumes r, memories m
+        WHERE co.ats_score IS NULL
+          AND r.id = co.resume_id
+          AND m.id = co.jd_id
+          AND r.embedding IS NOT NULL
+          AND m.embedding IS NOT NULL;
+    """)
+    cur.execute("ALTER TABLE candidate_outreach DROP COLUMN IF EXISTS embedding;")
+
+
+def ensure_embedding_storage(cur, storage: str = EMBEDDING_STORAGE):
+    """
+    Convert the embedding columns to vector(768) or halfvec(768). halfvec
+    halves heap and ANN index size; cosine rankings barely move because the
+    embeddings are unit-scale. The ANN indexes are dropped first (their
+    opclass is type-specific) and recreated by ensure_vector_indexes.
+    """
+    if storage not in ("vector", "halfvec"):
+        raise ValueError(f"Unsupported EMBEDDING_STORAGE: {storage}")
+
+    target = f"{storage}({EMBEDDING_DIM})"
+    for table in EMBEDDING_STORAGE_TABLES:
+        cur.execute(
+            """
+            SELECT format_type(atttypid, atttypmod) FROM pg_attribute
+            WHERE attrelid = to_regclass(%s) AND attname = 'embedding' AND NOT attisdropped
+            """,
+            [table],
+        )
+        row = cur.fetchone()
+        if not row or row[0] == target:
+            continue
+        for kind in ("hnsw", "ivfflat"):
+            cur.execute(f"DROP INDEX IF EXISTS {_vector_index_name(table, kind)};")
+        if table == "resumes":
+            cur.execute(f"DROP INDEX IF EXISTS {BINARY_PREFILTER_INDEX};")
+        cur.execute(f"ALTER TABLE {table} ALTER COLUMN embedding TYPE {target} USING embedding::{target};")
+        print(f"{table}.embedding converted from {row[0]} to {target}.")
+
+
+def ensure_binary_prefilter_index(cur, prefilter: str = VECTOR_PREFILTER):
+    """
+    Hamming-distance HNSW index over the sign bits of each resume embedding
+    (96 bytes per row instead of 3 KB) for VECTOR_PREFILTER=binary. It is an
+    expression index, so no extra column is written; the expression must stay
+    identical to ranking.RESUME_BINARY_QUANTIZE_SQL.
+    """
+    if prefilter not in ("none", "binary"):
+        raise ValueError(f"Unsupported VECTOR_PREFILTER: {prefilter}")
+    if prefilter == "none":
+        cur.execute(f"DROP INDEX IF EXISTS {BINARY_PREFILTER_INDEX};")
+        return
+    cur.execute(f"""
+        CREATE INDEX IF NOT EXISTS {BINARY_PREFILTER_INDEX}
+        ON resumes USING hnsw ((binary_quantize(embedding)::bit({EMBEDDING_DIM})) bit_hamming_ops)
+        WITH (m = {int(HNSW_M)}, ef_construction = {int(HNSW_EF_CONSTRUCTION)});
+    """)
+
+
+def ensure_resume_filter_indexes(cur):
+    """
+    Indexes behind the metadata filters in ranking.build_resume_filter_sql.
+    The expressions must stay identical to the ones used there.
+    """
+    # The skills filter runs on skill_ids (skills_taxonomy), so the old
+    # lowercased-skills key and the whole-metadata GIN index that served its
+    # containment query are dead weight on every write.
+    cur.execute("DROP INDEX IF EXISTS idx_resumes_metadata_gin;")
+    cur.execute("""
+        UPDATE resumes SET metadata = metadata - 'skills_lc'
+        WHERE metadata ? 'skills_lc';
+    """)
+    # Backfill experience under the key the parser actually emits
+    # (total_experience_years) for resumes saved before it was derived.
+    cur.execute("""
+        UPDATE resumes
+        SET metadata = jsonb_set(
+            metadata, '{total_experience_yrs}', canonical_json->'total_experience_years'
+        )
+        WHERE metadata IS NOT NULL
+          AND jsonb_typeof(metadata->'total_experience_yrs') IS DISTINCT FROM 'number'
+          AND jsonb_typeof(canonical_json->'total_experience_years') = 'number';
+    """)
+
+    cur.execute("""
+        CREATE INDEX IF NOT EXISTS idx_resumes_experience
+        ON resumes ((CASE WHEN jsonb_typeof(metadata->'total_experience_yrs') = 'number'
+                     THEN (metadata->>'total_experience_yrs')::numeric END));
+    """)
+    cur.execute("""
+        CREATE INDEX IF NOT EXISTS idx_resumes_location
+        ON resumes (lower(metadata->>'location') text_pattern_ops);
+    """)
+    cur.execute("""
+        CREATE INDEX IF NOT EXISTS idx_resumes_created_at
+        ON resumes (created_at);
+    """)
+
+
+def ensure_resume_dedup_columns(cur):
+    """
+    Lookups behind resume_dedup: content hash of the extracted text and
+    case-insensitive email. Rows saved before content_hash existed have no
+    hash (only a text snippet is stored) and dedup by email / vector only.
+    """
+    cur.execute("ALTER TABLE resumes ADD COLUMN IF NOT EXISTS content_hash TEXT;")
+    cur.execute("""
+        CREATE INDEX IF NOT EXISTS idx_resumes_content_hash
+        ON resumes (content_hash) WHERE content_hash IS NOT NULL;
+    """)
+    cur.execute("""
+        CREATE INDEX IF NOT EXISTS idx_resumes_email_lower
+        ON resumes (lower(email));
+    """)
+
+
+def ensure_skills_taxonomy(cur):
+    """
+    Skill ids (skills_taxonomy) behind the skills filter in
+    ranking.build_resume_filter_sql: one id per canonical skill, and a
+    GIN-indexed int[] of them per resume. JD skill ids live in metadata.
+    """
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS skills (
+            id SERIAL PRIMARY KEY,
+            key TEXT UNIQUE NOT NULL,
+            name TEXT NOT NULL
+        );
+    """)
+    cur.execute("ALTER TABLE resumes ADD COLUMN IF NOT EXISTS skill_ids INTEGER[];")
+    backfilled = backfill_skill_ids(cur)
+    if backfilled:
+        print(f"Skill ids backfilled for {backfilled} rows.")
+    cur.execute("""
+        CREATE INDEX IF NOT EXISTS idx_resumes_skill_ids
+        ON resumes USING GIN (skill_ids);
+    """)
+
+
+def ensure_jd_filter_indexes(cur):
+    """
+    Indexes behind the JD filters in ranking.build_jd_filter_sql (reverse
+    matching). The expressions must stay identical to the ones used there.
+    """
+    cur.execute("""
+        CREATE INDEX IF NOT EXISTS idx_memories_employment_type
+        ON memories (lower(metadata->>'employment_type'));
+    """)
+    cur.execute("""
+        CREATE INDEX IF NOT EXISTS idx_memories_location
+        ON memories (lower(metadata->>'location') text_pattern_ops);
+    """)
+    cur.execute("""
+        CREATE INDEX IF NOT EXISTS idx_memories_experience
+        ON memories (
+            (CASE WHEN jsonb_typeof(metadata->'experience_min') = 'number'
+             THEN (metadata->>'experience_min')::numeric END),
+            (CASE WHEN jsonb_typeof(metadata->'experience_max') = 'number'
+             THEN (metadata->>'experience_max')::numeric END)
+        );
+    """)
+
+
+def ensure_role_lookup_index(cur):
+    """
+    Normalized role and title columns + trigram indexes for
+    ranking.find_jds_by_role, which matches a query against either (the role
+    a JD was parsed with, or its stored title). The expressions must match
+    ranking.normalize_role.
+    """
+    cur.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm;")
+    cur.execute("""
+        ALTER TABLE memories ADD COLUMN IF NOT EXISTS role_normalized TEXT
+        GENERATED ALWAYS AS (
+            btrim(regexp_replace(lower(COALESCE(canonical_json->>'role', title, '')), '[^a-z0-9+#]+', ' ', 'g'))
+        ) STORED;
+    """)
+    cur.execute("""
+        ALTER TABLE memories ADD COLUMN IF NOT EXISTS title_normalized TEXT
+        GENERATED ALWAYS AS (
+            btrim(regexp_replace(lower(COALESCE(title, '')), '[^a-z0-9+#]+', ' ', 'g'))
+        ) STORED;
+    """)
+    cur.execute("""
+        CREATE INDEX IF NOT EXISTS idx_memories_role_trgm
+        ON memories USING GIN (role_normalized gin_trgm_ops)
+        WHERE type = 'job';
+    """)
+    cur.execute("""
+        CREATE INDEX IF NOT EXISTS idx_memories_title_trgm
+        ON memories USING GIN (title_normalized gin_trgm_ops)
+        WHERE type = 'job';
+    """)
+
+
+def ensure_resume_search_index(cur):
+    """
+    Full-text column for hybrid matching: skills (weight A), title (B) and
+    the embedding text (C). The 'simple' config keeps skill tokens like
+    "c++" or "node.js" unstemmed, matching how JD skills are queried.
+    """
+    cur.execute("""
+        ALTER TABLE resumes ADD COLUMN IF NOT EXISTS search_tsv tsvector
+        GENERATED ALWAYS AS (
+            setweight(to_tsvector('simple', COALESCE(metadata->>'skills', '')), 'A')
+            || setweight(to_tsvector('simple', COALESCE(title, '')), 'B')
+            || setweight(to_tsvector('simple', COALESCE(text, '')), 'C')
+        ) STORED;
+    """)
+    cur.execute("""
+        CREATE INDEX IF NOT EXISTS idx_resumes_search_tsv
+        ON resumes USING GIN (search_tsv);
+    """)
+
+
+def rebuild_vector_indexes(index_type: str = VECTOR_INDEX_TYPE):
+    """
+    Drop and rebuild the ANN indexes (after a bulk load, or to re-train IVFFlat
+    lists on current data). Runs in autocommit so it can build CONCURRENTLY
+    without blocking resume uploads.
+    """
+    if index_type not in ("hnsw", "ivfflat", "none"):
+        raise ValueError(f"Unsupported VECTOR_INDEX_TYPE: {index_type}")
+
+    conn = get_connection()
+    try:
+        conn.autocommit = True
+        cur = conn.cursor()
+        for table in VECTOR_INDEXED_TABLES:
+            for kind in ("hnsw", "ivfflat"):
+                cur.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {_vector_index_name(table, kind)};")
+            lists = IVFFLAT_LISTS
+            if index_type == "ivfflat":
+                cur.execute(f"SELECT COUNT(*) FROM {table}")
+                row_count = cur.fetchone()[0]
+                # pgvector guidance: rows / 1000 lists (up to ~1M rows)
+                if row_count:
+                    lists = max(row_count // 1000, 1)
+            if index_type != "none":
+                cur.execute(_create_vector_index_sql(table, index_type, lists=lists, concurrently=True))
+            cur.execute(f"ANALYZE {table};")
+        cur.close()
+        print(f"Vector indexes rebuilt ({index_type}).")
+    finally:
+        conn.close()
+
 
 def init_db():
     conn = get_connection()
@@ -56,7 +388,6 @@ def init_db():
                 candidate_name VARCHAR(255),
                 email_subject TEXT,
                 email_body TEXT,
-                embedding vector(768),
                 sent_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
                 acknowledgement VARCHAR(20),
                 acknowledged_at TIMESTAMP WITH TIME ZONE,
@@ -67,6 +398,70 @@ def init_db():
             );
         """)
         
+        # Cache of LLM parse results keyed by content hash (parse_cache.py)
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS llm_parse_cache (
+                cache_key TEXT PRIMARY KEY,
+                kind TEXT NOT NULL,
+                model TEXT NOT NULL,
+                prompt_version TEXT NOT NULL,
+                result JSONB NOT NULL,
+                hit_count INTEGER NOT NULL DEFAULT 0,
+                created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+                last_hit_at TIMESTAMP WITH TIME ZONE
+            );
+        """)
+        
+        # Embedding vectors keyed by sha256(model, task_type, text) (embedding_service.py)
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS embedding_cache (
+                cache_key TEXT PRIMARY KEY,
+                model TEXT NOT NULL,
+                task_type TEXT NOT NULL,
+                embedding REAL[] NOT NULL,
+                created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+            );
+        """)
+        
+        # Background resume upload jobs (ingest_jobs.py)
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS ingest_jobs (
+                id UUID PRIMARY KEY,
+                status TEXT NOT NULL DEFAULT 'queued',
+                source_url TEXT,
+                total_files INTEGER NOT NULL DEFAULT 0,
+                processed_files INTEGER NOT NULL DEFAULT 0,
+                created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+                started_at TIMESTAMP WITH TIME ZONE,
+                finished_at TIMESTAMP WITH TIME ZONE
+            );
+        """)
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS ingest_job_files (
+                id UUID PRIMARY KEY,
+                job_id UUID NOT NULL REFERENCES ingest_jobs(id) ON DELETE CASCADE,
+                position INTEGER NOT NULL,
+                file_name TEXT,
+                contents BYTEA,
+                status TEXT NOT NULL DEFAULT 'queued',
+                result JSONB,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                locked_by TEXT,
+                locked_at TIMESTAMP WITH TIME ZONE,
+                created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+                updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+            );
+        """)
+        # Partial index keeps SKIP LOCKED claiming cheap however many finished rows pile up
+        cur.execute("""
+            CREATE INDEX IF NOT EXISTS idx_ingest_job_files_queued
+            ON ingest_job_files(created_at, position) WHERE status = 'queued';
+        """)
+        cur.execute("""
+            CREATE INDEX IF NOT EXISTS idx_ingest_job_files_job
+            ON ingest_job_files(job_id, position);
+        """)
+        
         # 4. Create interview_schedules table
         cur.execute("""
             CREATE TABLE IF NOT EXISTS interview_schedules (
@@ -101,6 +496,23 @@ def init_db():
             CREATE INDEX IF NOT EXISTS idx_candidate_outreach_email 
             ON candidate_outreach(candidate_email);
         """)
+
+        # 5. ANN indexes for vector matching (resumes + JD memories)
+        drop_outreach_embedding(cur)
+        ensure_embedding_storage(cur)
+        ensure_vector_indexes(cur)
+        ensure_binary_prefilter_index(cur)
+
+        # 5a. Version counter for the match result cache (match_cache.py)
+        cur.execute("CREATE SEQUENCE IF NOT EXISTS match_index_version_seq;")
+
+        # 5b. Metadata filter indexes for filtered matching (see ranking.py)
+        ensure_resume_filter_indexes(cur)
+        ensure_resume_dedup_columns(cur)
+        ensure_resume_search_index(cur)
+        ensure_skills_taxonomy(cur)
+        ensure_jd_filter_indexes(cur)
+        ensure_role_lookup_index(cur)
         
         # 6. Create users table for authentication
         cur.execute("""
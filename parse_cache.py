@@ -0,0 +1,198 @@
+"""
+Content-hash cache for LLM parse results (resumes and JDs).
+
+Entries are keyed by sha256(kind, CHAT_MODEL, prompt version, normalized text),
+so a changed prompt or model simply stops matching old rows. Lookups go through
+an in-process LRU first, then the llm_parse_cache table. Cache failures never
+break parsing: on any DB error we fall through to the LLM call.
+"""
+import copy
+import hashlib
+import re
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional
+
+from psycopg2.extras import Json
+
+from config import PARSE_CACHE_ENABLED, PARSE_CACHE_LRU_SIZE
+from db import db_cursor
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+_lock = threading.Lock()
+_lru: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+_stats = {
+    "lru_hits": 0,
+    "db_hits": 0,
+    "misses": 0,
+    "writes": 0,
+    "errors": 0,
+}
+
+
+def normalize_text(text: str) -> str:
+    """Collapse whitespace so re-extracted PDFs with different spacing still hit."""
+    return _WHITESPACE_RE.sub(" ", text or "").strip()
+
+
+def make_cache_key(kind: str, text: str, model: str, prompt_version: str) -> str:
+    digest = hashlib.sha256()
+    for part in (kind, model, prompt_version, normalize_text(text)):
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\x00")
+    return digest.hexdigest()
+
+
+def _bump(counter: str):
+    with _lock:
+        _stats[counter] += 1
+
+
+def _lru_get(key: str) -> Optional[Dict[str, Any]]:
+    with _lock:
+        value = _lru.get(key)
+        if value is not None:
+            _lru.move_to_end(key)
+        return value
+
+
+def _lru_put(key: str, value: Dict[str, Any]):
+    if PARSE_CACHE_LRU_SIZE <= 0:
+        return
+    with _lock:
+        _lru[key] = value
+        _lru.move_to_end(key)
+        while len(_lru) > PARSE_CACHE_LRU_SIZE:
+            _lru.popitem(last=False)
+
+
+def get_cached_parse(kind: str, text: str, model: str, prompt_version: str) -> Optional[Dict[str, Any]]:
+    if not PARSE_CACHE_ENABLED:
+        return None
+
+    key = make_cache_key(kind, text, model, prompt_version)
+    value = _lru_get(key)
+    if value is not None:
+        _bump("lru_hits")
+        return copy.deepcopy(value)
+
+    try:
+        with db_cursor() as cur:
+            cur.execute(
+                """
+                UPDATE llm_parse_cache
+                SET hit_count = hit_count + 1, last_hit_at = NOW()
+                WHERE cache_key = %s
+                RETURNING result
+                """,
+                [key],
+            )
+            row = cur.fetchone()
+    except Exception as e:
+        print(f"Parse cache lookup failed: {e}")
+        _bump("errors")
+        row = None
+
+    if not row:
+        _bump("misses")
+        return None
+
+    _bump("db_hits")
+    _lru_put(key, row[0])
+    return copy.deepcopy(row[0])
+
+
+def store_parse(kind: str, text: str, model: str, prompt_version: str, result: Dict[str, Any]):
+    if not PARSE_CACHE_ENABLED:
+        return
+
+    key = make_cache_key(kind, text, model, prompt_version)
+    _lru_put(key, copy.deepcopy(result))
+    try:
+        with db_cursor() as cur:
+            cur.execute(
+                """
+                INSERT INTO llm_parse_cache (cache_key, kind, model, prompt_version, result)
+                VALUES (%s, %s, %s, %s, %s)
+                ON CONFLICT (cache_key) DO UPDATE SET
+                  result = EXCLUDED.result,
+                  created_at = NOW()
+                """,
+                [key, kind, model, prompt_version, Json(result)],
+            )
+        _bump("writes")
+    except Exception as e:
+        print(f"Parse cache write failed: {e}")
+        _bump("errors")
+
+
+def cached_parse(
+    kind: str,
+    text: str,
+    model: str,
+    prompt_version: str,
+    parse_fn: Callable[[str], Dict[str, Any]],
+) -> Dict[str, Any]:
+    """
+    Return the cached parse for `text`, or call `parse_fn(text)` and cache it.
+    Results flagged with an "error" key, or produced by the offline rule-based
+    parser ("parse_mode": "offline"), are returned but never cached.
+    """
+    cached = get_cached_parse(kind, text, model, prompt_version)
+    if cached is not None:
+        return cached
+
+    result = parse_fn(text)
+    if isinstance(result, dict) and "error" not in result and result.get("parse_mode") != "offline":
+        store_parse(kind, text, model, prompt_version, result)
+    return result
+
+
+def invalidate_parse_cache(
+    kind: Optional[str] = None,
+    *,
+    model: Optional[str] = None,
+    prompt_version: Optional[str] = None,
+) -> int:
+    """
+    Delete cached parses. With model/prompt_version given, only rows that do
+    NOT match them are removed (i.e. purge entries from older prompts/models).
+    Returns the number of rows deleted.
+    """
+    clauses = []
+    params = []
+    if kind:
+        clauses.append("kind = %s")
+        params.append(kind)
+
+    stale = []
+    if model:
+        stale.append("model <> %s")
+        params.append(model)
+    if prompt_version:
+        stale.append("prompt_version <> %s")
+        params.append(prompt_version)
+    if stale:
+        clauses.append("(" + " OR ".join(stale) + ")")
+
+    where = " AND ".join(clauses) if clauses else "TRUE"
+    with db_cursor() as cur:
+        cur.execute(f"DELETE FROM llm_parse_cache WHERE {where}", params)
+        deleted = cur.rowcount
+
+    with _lock:
+        _lru.clear()
+    return deleted
+
+
+def get_parse_cache_stats() -> Dict[str, Any]:
+    with _lock:
+        stats = dict(_stats)
+        stats["lru_entries"] = len(_lru)
+    hits = stats["lru_hits"] + stats["db_hits"]
+    lookups = hits + stats["misses"]
+    stats["enabled"] = PARSE_CACHE_ENABLED
+    stats["lru_size"] = PARSE_CACHE_LRU_SIZE
+    stats["hit_rate"] = round(hits / lookups, 3) if lookups else 0.0
+    return stats
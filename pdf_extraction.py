@@ -0,0 +1,255 @@
+"""
+PDF text extraction shared by the JD and resume upload paths.
+
+- byte and page limits are enforced before any parsing work
+- the fast path uses pypdfium2 (already installed as a pdfplumber dependency);
+  pdfplumber is the fallback when pdfium is unavailable or finds no text
+- CPU-bound work runs in a process pool so it never blocks the web worker;
+  long documents are split into page ranges extracted in parallel
+- results are cached by the SHA-256 of the file, so re-uploads are free
+
+Kept free of Gemini/DB imports so the pool's worker processes start cheaply:
+a spawned worker imports only this module, the PDF libraries and config
+(os + dotenv). The limits are applied in the calling process; the extractors
+get everything they need (bytes, page range) as arguments.
+"""
+import asyncio
+import hashlib
+import multiprocessing
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from io import BytesIO
+from typing import Any, Dict, List, Optional, Tuple
+
+import pdfplumber
+
+from config import (
+    PDF_EXTRACT_TIMEOUT_SECONDS,
+    PDF_EXTRACT_WORKERS,
+    PDF_MAX_BYTES,
+    PDF_MAX_PAGES,
+    PDF_PARALLEL_PAGE_THRESHOLD,
+    PDF_TEXT_CACHE_SIZE,
+)
+
+
+class PDFExtractionError(ValueError):
+    """The PDF was rejected (too large, unreadable) before/while extracting."""
+
+
+# ---------------------------------------------------------------------- #
+# extractors (run inside pool workers)
+# ---------------------------------------------------------------------- #
+def _page_count(contents: bytes) -> int:
+    try:
+        import pypdfium2 as pdfium
+
+        pdf = pdfium.PdfDocument(contents)
+        try:
+            return len(pdf)
+        finally:
+            pdf.close()
+    except ImportError:
+        with pdfplumber.open(BytesIO(contents)) as pdf:
+            return len(pdf.pages)
+
+
+def _extract_range_fast(contents: bytes, start: int, end: int) -> str:
+    import pypdfium2 as pdfium
+
+    pdf = pdfium.PdfDocument(contents)
+    try:
+        parts = []
+        for index in range(start, min(end, len(pdf))):
+            page = pdf[index]
+            textpage = page.get_textpage()
+            parts.append(textpage.get_text_range() or "")
+            textpage.close()
+            page.close()
+        return "\n".join(parts)
+    finally:
+        pdf.close()
+
+
+def _extract_range_pdfplumber(contents: bytes, start: int, end: int) -> str:
+    with pdfplumber.open(BytesIO(contents)) as pdf:
+        return "\n".join([page.extract_text() or "" for page in pdf.pages[start:end]])
+
+
+def _extract_range(contents: bytes, start: int, end: int) -> str:
+    """Text of pages [start, end): pdfium first, pdfplumber if that fails or finds nothing."""
+    try:
+        text = _extract_range_fast(contents, start, end)
+        if text.strip():
+            return text
+    except Exception:
+        pass
+    return _extract_range_pdfplumber(contents, start, end)
+
+
+# ---------------------------------------------------------------------- #
+# cache
+# ---------------------------------------------------------------------- #
+_cache_lock = threading.Lock()
+_text_cache: "OrderedDict[str, str]" = OrderedDict()
+_stats = {"cache_hits": 0, "cache_misses": 0, "parallel_documents": 0, "rejected": 0, "timeouts": 0}
+
+
+def _bump(counter: str):
+    with _cache_lock:
+        _stats[counter] += 1
+
+
+def _cache_get(digest: str) -> Optional[str]:
+    with _cache_lock:
+        text = _text_cache.get(digest)
+        if text is not None:
+            _text_cache.move_to_end(digest)
+            _stats["cache_hits"] += 1
+        else:
+            _stats["cache_misses"] += 1
+        return text
+
+
+def _cache_put(digest: str, text: str):
+    if PDF_TEXT_CACHE_SIZE <= 0:
+        return
+    with _cache_lock:
+        _text_cache[digest] = text
+        _text_cache.move_to_end(digest)
+        while len(_text_cache) > PDF_TEXT_CACHE_SIZE:
+            _text_cache.popitem(last=False)
+
+
+def _check_size(contents: bytes):
+    if len(contents) > PDF_MAX_BYTES:
+        _bump("rejected")
+        raise PDFExtractionError(
+            f"PDF is {len(contents) // 1024} KB; the limit is {PDF_MAX_BYTES // 1024} KB"
+        )
+
+
+# ---------------------------------------------------------------------- #
+# process pool
+# ---------------------------------------------------------------------- #
+_executor: Optional[ProcessPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def get_extraction_executor() -> ProcessPoolExecutor:
+    """
+    Process pool for CPU-bound extraction. Uses the "spawn" start method:
+    forking a threaded web worker can deadlock the child.
+    """
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(
+                max_workers=PDF_EXTRACT_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return _executor
+
+
+def reset_extraction_executor(terminate: bool = False):
+    """
+    Drop a broken pool (e.g. a worker was OOM-killed) so the next call rebuilds it.
+    terminate=True also kills its worker processes, for a worker stuck on a PDF
+    (shutdown() alone would leave it running).
+    """
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            processes = list((getattr(_executor, "_processes", None) or {}).values())
+            _executor.shutdown(wait=False, cancel_futures=True)
+            if terminate:
+                for process in processes:
+                    process.terminate()
+        _executor = None
+
+
+def _page_ranges(page_count: int) -> List[Tuple[int, int]]:
+    if page_count < PDF_PARALLEL_PAGE_THRESHOLD:
+        return [(0, page_count)]
+    chunk = -(-page_count // PDF_EXTRACT_WORKERS)  # ceil division
+    return [(start, min(start + chunk, page_count)) for start in range(0, page_count, chunk)]
+
+
+# ---------------------------------------------------------------------- #
+# public API
+# ---------------------------------------------------------------------- #
+def extract_pdf_text(contents: bytes) -> str:
+    """Extract text in the calling thread (limits and cache still apply)."""
+    _check_size(contents)
+    digest = hashlib.sha256(contents).hexdigest()
+    text = _cache_get(digest)
+    if text is not None:
+        return text
+
+    try:
+        pages = min(_page_count(contents), PDF_MAX_PAGES)
+        text = _extract_range(contents, 0, pages)
+    except Exception as e:
+        raise PDFExtractionError(f"Could not read PDF: {e}") from e
+    _cache_put(digest, text)
+    return text
+
+
+def extract_pdf_text_pooled(contents: bytes) -> str:
+    """
+    Extract text on the process pool, splitting long documents into page
+    ranges extracted in parallel. Blocks the calling thread only.
+    """
+    _check_size(contents)
+    digest = hashlib.sha256(contents).hexdigest()
+    text = _cache_get(digest)
+    if text is not None:
+        return text
+
+    try:
+        pages = min(_page_count(contents), PDF_MAX_PAGES)
+    except Exception as e:
+        raise PDFExtractionError(f"Could not read PDF: {e}") from e
+
+    ranges = _page_ranges(pages)
+    if len(ranges) > 1:
+        _bump("parallel_documents")
+    try:
+        try:
+            executor = get_extraction_executor()
+            futures = [executor.submit(_extract_range, contents, start, end) for start, end in ranges]
+            deadline = time.monotonic() + PDF_EXTRACT_TIMEOUT_SECONDS
+            text = "\n".join(f.result(timeout=max(0.0, deadline - time.monotonic())) for f in futures)
+        except FutureTimeoutError:
+            # Other documents on the pool fail over to in-thread extraction
+            # (BrokenProcessPool below); this one is not retried.
+            _bump("timeouts")
+            reset_extraction_executor(terminate=True)
+            raise PDFExtractionError(f"PDF extraction timed out after {PDF_EXTRACT_TIMEOUT_SECONDS:g}s")
+        except (BrokenProcessPool, OSError, NotImplementedError):
+            # A worker died or processes can't be spawned here: extract in this thread.
+            reset_extraction_executor()
+            text = _extract_range(contents, 0, pages)
+    except PDFExtractionError:
+        raise
+    except Exception as e:
+        raise PDFExtractionError(f"Could not read PDF: {e}") from e
+
+    _cache_put(digest, text)
+    return text
+
+
+async def extract_pdf_text_async(contents: bytes) -> str:
+    """Awaitable wrapper for async handlers; the event loop is never blocked."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(None, extract_pdf_text_pooled, contents)
+
+
+def get_pdf_extraction_stats() -> Dict[str, Any]:
+    with _cache_lock:
+        stats = dict(_stats)
+        stats["cache_entries"] = len(_text_cache)
+    return stats
@@ -1,86 +1,599 @@
 # ranking.py
-from typing import List, Dict, Any
+import json
+import re
+import threading
+import time
+import uuid
+from datetime import datetime
+from typing import List, Dict, Any, Optional, Tuple
 
+from config import (
+    HNSW_EF_SEARCH,
+    IVFFLAT_PROBES,
+    MATCH_SCORING,
+    VECTOR_SEARCH_BACKEND,
+    HYBRID_FUSION,
+    HYBRID_RRF_K,
+    HYBRID_LEXICAL_WEIGHT,
+    HYBRID_CANDIDATES,
+    VECTOR_PREFILTER,
+    BINARY_PREFILTER_CANDIDATES,
+    MATCH_EXPLAIN,
+    COVERAGE_PRIMARY_WEIGHT,
+    COVERAGE_SECONDARY_WEIGHT,
+    COVERAGE_EXPERIENCE_WEIGHT,
+    RERANK_MODE,
+    RERANK_CANDIDATES,
+)
 from db import get_connection
+from match_cache import cached_match
+from reranker import normalize_rerank_mode, rerank_matches
+from skills_taxonomy import skill_key
+
+# Recall-vs-latency presets for the ANN indexes created in migrations.py.
+# hnsw.ef_search = candidate list size per query, ivfflat.probes = lists scanned.
+RECALL_PROFILES: Dict[str, Dict[str, int]] = {
+    "fast": {"ef_search": 40, "probes": 1},
+    "balanced": {"ef_search": HNSW_EF_SEARCH, "probes": IVFFLAT_PROBES},
+    "high": {"ef_search": 400, "probes": 50},
+}
+
+
+def resolve_search_params(
+    recall: Optional[str] = None,
+    ef_search: Optional[int] = None,
+    probes: Optional[int] = None,
+) -> Dict[str, int]:
+    """
+    Turn a recall profile name plus optional explicit overrides into
+    concrete ef_search / probes values.
+    """
+    profile_name = (recall or "balanced").lower()
+    if profile_name not in RECALL_PROFILES:
+        raise ValueError(
+            f"Unknown recall profile '{recall}'. Use one of: {', '.join(RECALL_PROFILES)}"
+        )
+    params = dict(RECALL_PROFILES[profile_name])
+    if ef_search is not None:
+        params["ef_search"] = int(ef_search)
+    if probes is not None:
+        params["probes"] = int(probes)
+    return params
+
+
+def _apply_vector_search_params(cur, top_k: int, ef_search: int, probes: int):
+    """
+    Set per-transaction ANN search knobs. HNSW never returns more than
+    ef_search rows, so it is raised to top_k when needed (1000 is pgvector's cap).
+    """
+    ef_search = min(max(ef_search, top_k), 1000)
+    cur.execute(
+        "SELECT set_config('hnsw.ef_search', %s, true), set_config('ivfflat.probes', %s, true)",
+        [str(ef_search), str(max(probes, 1))],
+    )
+
+
+# Filterable resume fields. The SQL expressions must match the expression
+# indexes created in migrations.ensure_resume_filter_indexes exactly, or the
+# planner will not use them.
+RESUME_EXPERIENCE_SQL = (
+    "(CASE WHEN jsonb_typeof(r.metadata->'total_experience_yrs') = 'number' "
+    "THEN (r.metadata->>'total_experience_yrs')::numeric END)"
+)
+RESUME_LOCATION_SQL = "lower(r.metadata->>'location')"
+# Must match the expression index in migrations.ensure_binary_prefilter_index.
+RESUME_BINARY_QUANTIZE_SQL = "(binary_quantize(r.embedding)::bit(768))"
+RESUME_FILTER_KEYS = (
+    "skills",
+    "min_experience",
+    "max_experience",
+    "location",
+    "created_after",
+    "created_before",
+)
+
+
+def _parse_timestamp(value: Any, field: str) -> datetime:
+    if isinstance(value, datetime):
+        return value
+    try:
+        return datetime.fromisoformat(str(value))
+    except ValueError:
+        raise ValueError(f"{field} must be an ISO-8601 date/time, got '{value}'")
+
+
+def _like_prefix(value: str) -> str:
+    """LIKE pattern matching strings that start with `value` literally."""
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+
+
+def normalize_resume_filters(filters: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Validate a filters dict (or its JSON string form from a form field):
+      - skills: list of skills the resume must all have (case-insensitive,
+        synonyms resolved through skills_taxonomy)
+      - min_experience / max_experience: total experience range in years
+      - location: case-insensitive prefix of the resume location
+      - created_after / created_before: ISO-8601 upload window
+    """
+    if not filters:
+        return {}
+    if isinstance(filters, str):
+        try:
+            filters = json.loads(filters)
+        except ValueError:
+            raise ValueError("filters must be a JSON object")
+    if not isinstance(filters, dict):
+        raise ValueError("filters must be a JSON object")
+
+    unknown = set(filters) - set(RESUME_FILTER_KEYS)
+    if unknown:
+        raise ValueError(
+            f"Unknown filter(s): {', '.join(sorted(unknown))}. Use: {', '.join(RESUME_FILTER_KEYS)}"
+        )
+
+    normalized: Dict[str, Any] = {}
+    skills = filters.get("skills")
+    if skills:
+        if isinstance(skills, str):
+            skills = skills.split(",")
+        keys = {skill_key(s) for s in skills}
+        keys.discard(None)
+        if keys:
+            normalized["skills"] = sorted(keys)
+    for key in ("min_experience", "max_experience"):
+        if filters.get(key) not in (None, ""):
+            try:
+                normalized[key] = float(filters[key])
+            except (TypeError, ValueError):
+                raise ValueError(f"{key} must be a number")
+    if filters.get("location"):
+        normalized["location"] = str(filters["location"]).strip().lower()
+    for key in ("created_after", "created_before"):
+        if filters.get(key):
+            normalized[key] = _parse_timestamp(filters[key], key)
+    return normalized
+
+
+def build_resume_filter_sql(filters: Dict[str, Any]) -> Tuple[str, List[Any]]:
+    """
+    Turn normalized filters into extra WHERE clauses (each starting with AND)
+    on the `resumes r` alias, plus their parameters.
+    """
+    clauses: List[str] = []
+    params: List[Any] = []
+    if filters.get("skills"):
+        # Skill keys -> ids once (InitPlans), then GIN (skill_ids) serves @>.
+        # A skill nobody has (no id yet) must match nothing, not be dropped.
+        clauses.append(
+            "r.skill_ids @> ARRAY(SELECT id FROM skills WHERE key = ANY(%s))"
+            " AND (SELECT count(*) FROM skills WHERE key = ANY(%s)) = %s"
+        )
+        params.extend([filters["skills"], filters["skills"], len(filters["skills"])])
+    if "min_experience" in filters:
+        clauses.append(f"{RESUME_EXPERIENCE_SQL} >= %s")
+        params.append(filters["min_experience"])
+    if "max_experience" in filters:
+        clauses.append(f"{RESUME_EXPERIENCE_SQL} <= %s")
+        params.append(filters["max_experience"])
+    if filters.get("location"):
+        # text_pattern_ops btree serves the prefix LIKE.
+        clauses.append(f"{RESUME_LOCATION_SQL} LIKE %s")
+        params.append(_like_prefix(filters["location"]))
+    if "created_after" in filters:
+        clauses.append("r.created_at >= %s")
+        params.append(filters["created_after"])
+    if "created_before" in filters:
+        clauses.append("r.created_at < %s")
+        params.append(filters["created_before"])
+    return "".join(f"\n              AND {clause}" for clause in clauses), params
+
+
+# JD-side filter expressions (alias m on memories); indexed by
+# migrations.ensure_jd_filter_indexes with the same expressions.
+JD_EMPLOYMENT_TYPE_SQL = "lower(m.metadata->>'employment_type')"
+JD_LOCATION_SQL = "lower(m.metadata->>'location')"
+JD_EXPERIENCE_MIN_SQL = (
+    "(CASE WHEN jsonb_typeof(m.metadata->'experience_min') = 'number' "
+    "THEN (m.metadata->>'experience_min')::numeric END)"
+)
+JD_EXPERIENCE_MAX_SQL = (
+    "(CASE WHEN jsonb_typeof(m.metadata->'experience_max') = 'number' "
+    "THEN (m.metadata->>'experience_max')::numeric END)"
+)
+JD_FILTER_KEYS = ("employment_type", "location", "experience", "created_after", "created_before")
+
+
+def normalize_jd_filters(filters: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Validate JD filters for reverse matching (dict or JSON string):
+      - employment_type: exact, case-insensitive (e.g. "full-time")
+      - location: case-insensitive prefix of the JD location
+      - experience: years of experience the JD's min/max range must accept
+        (JDs without a bound on a side are not excluded by it)
+      - created_after / created_before: ISO-8601 JD creation window
+    """
+    if not filters:
+        return {}
+    if isinstance(filters, str):
+        try:
+            filters = json.loads(filters)
+        except ValueError:
+            raise ValueError("filters must be a JSON object")
+    if not isinstance(filters, dict):
+        raise ValueError("filters must be a JSON object")
+
+    unknown = set(filters) - set(JD_FILTER_KEYS)
+    if unknown:
+        raise ValueError(
+            f"Unknown filter(s): {', '.join(sorted(unknown))}. Use: {', '.join(JD_FILTER_KEYS)}"
+        )
+
+    normalized: Dict[str, Any] = {}
+    for key in ("employment_type", "location"):
+        if filters.get(key):
+            normalized[key] = str(filters[key]).strip().lower()
+    if filters.get("experience") not in (None, ""):
+        try:
+            normalized["experience"] = float(filters["experience"])
+        except (TypeError, ValueError):
+            raise ValueError("experience must be a number")
+    for key in ("created_after", "created_before"):
+        if filters.get(key):
+            normalized[key] = _parse_timestamp(filters[key], key)
+    return normalized
+
+
+def build_jd_filter_sql(filters: Dict[str, Any]) -> Tuple[str, List[Any]]:
+    """Like build_resume_filter_sql, for the `memories m` alias."""
+    clauses: List[str] = []
+    params: List[Any] = []
+    if filters.get("employment_type"):
+        clauses.append(f"{JD_EMPLOYMENT_TYPE_SQL} = %s")
+        params.append(filters["employment_type"])
+    if filters.get("location"):
+        clauses.append(f"{JD_LOCATION_SQL} LIKE %s")
+        params.append(_like_prefix(filters["location"]))
+    if "experience" in filters:
+        clauses.append(f"({JD_EXPERIENCE_MIN_SQL} IS NULL OR {JD_EXPERIENCE_MIN_SQL} <= %s)")
+        clauses.append(f"({JD_EXPERIENCE_MAX_SQL} IS NULL OR {JD_EXPERIENCE_MAX_SQL} >= %s)")
+        params.extend([filters["experience"], filters["experience"]])
+    if "created_after" in filters:
+        clauses.append("m.created_at >= %s")
+        params.append(filters["created_after"])
+    if "created_before" in filters:
+        clauses.append("m.created_at < %s")
+        params.append(filters["created_before"])
+    return "".join(f"\n              AND {clause}" for clause in clauses), params
+
+
+_iterative_scan_supported: Optional[bool] = None
+
+
+def _enable_iterative_scan(cur):
+    """
+    pgvector >= 0.8 can keep walking the ANN index until enough rows pass the
+    WHERE clause; older versions stop after ef_search / probes candidates and
+    filtered queries come back short.
+    """
+    global _iterative_scan_supported
+    if _iterative_scan_supported is None:
+        cur.execute("SELECT extversion FROM pg_extension WHERE extname = 'vector'")
+        row = cur.fetchone()
+        try:
+            version = tuple(int(part) for part in row[0].split(".")[:2]) if row else (0, 0)
+        except ValueError:
+            version = (0, 0)
+        _iterative_scan_supported = version >= (0, 8)
+    if _iterative_scan_supported:
+        cur.execute(
+            "SELECT set_config('hnsw.iterative_scan', 'relaxed_order', true), "
+            "set_config('ivfflat.iterative_scan', 'relaxed_order', true)"
+        )
+
+
+def get_vector_search_stats() -> Dict[str, Any]:
+    stats: Dict[str, Any] = {
+        "backend": VECTOR_SEARCH_BACKEND,
+        "scoring": MATCH_SCORING,
+        "prefilter": VECTOR_PREFILTER,
+    }
+    if VECTOR_SEARCH_BACKEND == "local":
+        from local_vector_index import get_local_index_stats
+
+        stats["local_index"] = get_local_index_stats()
+    with _explain_lock:
+        explain_stats = dict(_explain_stats)
+    explain_stats["enabled"] = MATCH_EXPLAIN
+    explain_stats["avg_ms"] = round(explain_stats["total_ms"] / explain_stats["calls"], 2) if explain_stats["calls"] else 0.0
+    explain_stats["total_ms"] = round(explain_stats["total_ms"], 1)
+    stats["explain"] = explain_stats
+    return stats
 
 
 def get_jd_memory_id_by_role(role_name: str) -> str:
     """
-    Find the most recent JD memory that matches a given role name.
-    Tries canonical_json->>'role' and title.
+    Find the JD memory that best matches a given role name, against
+    canonical_json->>'role' and title: the most recent exact match, else
+    the closest "contains" match by trigram score (newest on ties); fuzzy
+    matches never count here. Cached until the next JD write.
+    """
+    return cached_match(
+        "jd_for_role",
+        {"role": role_name.strip().lower()},
+        lambda: _get_jd_memory_id_by_role_uncached(role_name),
+    )
+
+
+def _get_jd_memory_id_by_role_uncached(role_name: str) -> str:
+    # Matching runs against this JD, so a near miss ("Java Developer" for
+    # "JavaScript Developer") must not stand in for it; fuzzy hits are only
+    # offered as suggestions by /jd/roles.
+    matches = find_jds_by_role(role_name, limit=1, fuzzy=False)
+    if not matches:
+        raise ValueError(f"No JD found for role name='{role_name}'")
+    return matches[0]["jd_id"]
+
+
+_ROLE_NORMALIZE_RE = re.compile(r"[^a-z0-9+#]+")
+
+
+def normalize_role(role: str) -> str:
+    """
+    Python twin of the memories.role_normalized expression in migrations.py:
+    lowercase, runs of anything but [a-z0-9+#] become one space.
+    """
+    return _ROLE_NORMALIZE_RE.sub(" ", (role or "").lower()).strip()
+
+
+def find_jds_by_role(role_name: str, limit: int = 5, *, fuzzy: bool = True) -> List[Dict[str, Any]]:
+    """
+    Ranked role lookup over memories.role_normalized and title_normalized
+    (pg_trgm GIN indexes): a JD matches through its parsed role or its title.
+
+    Exact matches come first, then roles containing the query, then (with
+    `fuzzy`) trigram word-similarity matches; ties go to the newest JD. Each
+    match carries its similarity score and match kind.
     """
+    query = normalize_role(role_name)
+    if not query:
+        raise ValueError("role_name is required")
+    fuzzy_sql = "OR %(q)s <%% role_normalized OR %(q)s <%% title_normalized" if fuzzy else ""
+
     conn = get_connection()
     try:
         cur = conn.cursor()
         cur.execute(
-            """
-            SELECT id
+            f"""
+            SELECT
+                id,
+                title,
+                role_normalized,
+                created_at,
+                (role_normalized = %(q)s OR title_normalized = %(q)s) AS exact,
+                (role_normalized LIKE %(pattern)s OR title_normalized LIKE %(pattern)s) AS contains,
+                GREATEST(
+                    similarity(role_normalized, %(q)s), word_similarity(%(q)s, role_normalized),
+                    similarity(title_normalized, %(q)s), word_similarity(%(q)s, title_normalized)
+                ) AS score
             FROM memories
             WHERE type = 'job'
-              AND (
-                    LOWER(canonical_json->>'role') LIKE LOWER('%%' || %s || '%%')
-                 OR LOWER(title) LIKE LOWER('%%' || %s || '%%')
-              )
-            ORDER BY created_at DESC
-            LIMIT 1;
+              AND (role_normalized LIKE %(pattern)s OR title_normalized LIKE %(pattern)s {fuzzy_sql})
+            ORDER BY exact DESC, contains DESC, score DESC, created_at DESC
+            LIMIT %(limit)s;
             """,
-            [role_name, role_name],
+            {"q": query, "pattern": "%" + _like_prefix(query), "limit": limit},
         )
-        row = cur.fetchone()
+        rows = cur.fetchall()
         cur.close()
     finally:
         conn.close()
 
-    if not row:
-        raise ValueError(f"No JD found for role name='{role_name}'")
-    return row[0]  # jd_memory_id
+    return [
+        {
+            "jd_id": str(jd_id),
+            "role": title,
+            "role_normalized": normalized,
+            "created_at": str(created_at) if created_at else None,
+            "match": "exact" if exact else ("contains" if contains else "fuzzy"),
+            "score": round(float(score), 4),
+        }
+        for jd_id, title, normalized, created_at, exact, contains, score in rows
+    ]
+
+
+def get_top_k_resumes_for_jd_memory(
+    jd_memory_id: str,
+    top_k: int = 3,
+    *,
+    recall: Optional[str] = None,
+    ef_search: Optional[int] = None,
+    probes: Optional[int] = None,
+    filters: Optional[Dict[str, Any]] = None,
+    scoring: Optional[str] = None,
+    explain: Optional[bool] = None,
+    rerank: Optional[str] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Core matching: given JD memory id, return top-K resumes with ATS & file_name.
+
+    `recall` picks a preset from RECALL_PROFILES; `ef_search` / `probes`
+    override the HNSW / IVFFlat search width for this query only.
+    `filters` (see normalize_resume_filters) is applied in SQL, so the top-K
+    are the best matches among resumes that pass it.
+    `scoring` is "vector" or "hybrid" (defaults to MATCH_SCORING).
+    `explain` (defaults to MATCH_EXPLAIN) adds skill coverage, experience fit
+    and coverage_score to each match, see explain_matches.
+    `rerank` is "off", "local" or "llm" (defaults to RERANK_MODE): the top
+    RERANK_CANDIDATES are re-scored by reranker.rerank_matches.
+
+    Results are served from match_cache until a resume/JD write or the TTL;
+    the re-rank runs after the cache, against its own per-pair score cache,
+    so judgements that missed the latency budget are picked up next time.
+    """
+    search_params = resolve_search_params(recall, ef_search=ef_search, probes=probes)
+    filters = normalize_resume_filters(filters)
+    scoring = (scoring or MATCH_SCORING).lower()
+    explain = MATCH_EXPLAIN if explain is None else explain
+    rerank = normalize_rerank_mode(rerank, RERANK_MODE)
+    # The re-ranker can only promote what the first stage returns.
+    fetch_k = top_k if rerank == "off" else max(top_k, RERANK_CANDIDATES)
+
+    def _match():
+        matches = _get_top_k_resumes_for_jd_memory_uncached(jd_memory_id, fetch_k, search_params, filters, scoring)
+        if explain and matches:
+            explain_matches({jd_memory_id: matches})
+        return matches
+
+    matches = cached_match(
+        "resumes_for_jd",
+        {
+            "jd": str(jd_memory_id),
+            "top_k": fetch_k,
+            "search": search_params,
+            "filters": filters,
+            "scoring": scoring,
+            "explain": explain,
+            "backend": VECTOR_SEARCH_BACKEND,
+        },
+        _match,
+    )
+    if rerank == "off":
+        return matches
+    return rerank_matches(jd_memory_id, matches, rerank)[:top_k]
+
 
+def _get_top_k_resumes_for_jd_memory_uncached(
+    jd_memory_id: str,
+    top_k: int,
+    search_params: Dict[str, int],
+    filters: Dict[str, Any],
+    scoring: str,
+) -> List[Dict[str, Any]]:
+    filter_sql, filter_params = build_resume_filter_sql(filters)
+
+    if scoring == "hybrid":
+        return _get_top_k_resumes_hybrid(jd_memory_id, top_k, search_params, filter_sql, filter_params)
+    if scoring != "vector":
+        raise ValueError(f"Unknown scoring '{scoring}'. Use 'vector' or 'hybrid'")
+
+    if VECTOR_SEARCH_BACKEND == "local" and not filter_sql:
+        from local_vector_index import search_local_index
+
+        return search_local_index(jd_memory_id, top_k)
+    if VECTOR_PREFILTER == "binary":
+        return _get_top_k_resumes_binary_prefilter(jd_memory_id, top_k, search_params, filter_sql, filter_params)
 
-def get_memory_embedding_literal(memory_id: str) -> str:
     conn = get_connection()
     try:
         cur = conn.cursor()
-        cur.execute("SELECT embedding FROM memories WHERE id = %s", [memory_id])
-        row = cur.fetchone()
+        _apply_vector_search_params(cur, top_k, **search_params)
+        if filter_sql:
+            _enable_iterative_scan(cur)
+        # The JD vector is read in the same statement: one round trip, and it
+        # never travels to the client and back as a text literal.
+        cur.execute(
+            f"""
+            WITH jd AS (SELECT embedding AS v FROM memories WHERE id = %s)
+            SELECT
+                r.id AS resume_id,
+                r.candidate_name,
+                r.title,
+                r.metadata->>'file_name' AS file_name,
+                1 - (r.embedding <=> (SELECT v FROM jd)) AS similarity
+            FROM resumes r
+            WHERE r.type = 'resume'
+              AND EXISTS (SELECT 1 FROM jd WHERE v IS NOT NULL){filter_sql}
+            ORDER BY r.embedding <=> (SELECT v FROM jd)
+            LIMIT %s;
+            """,
+            [jd_memory_id, *filter_params, top_k],
+        )
+        rows = cur.fetchall()
+        if not rows:
+            _ensure_memory_exists(cur, jd_memory_id)
         cur.close()
     finally:
         conn.close()
 
+    return _rows_to_matches(rows)
+
+
+def _ensure_memory_exists(cur, jd_memory_id: str):
+    # An empty result is "no resumes", a bad JD id or a JD without an
+    # embedding; only the last two are errors (the same ones as the local index).
+    cur.execute("SELECT embedding IS NOT NULL FROM memories WHERE id = %s", [jd_memory_id])
+    row = cur.fetchone()
     if not row:
-        raise ValueError(f"No memory found with id={memory_id}")
-    return row[0]  # e.g. "[0.1,0.2,...]"
+        raise ValueError(f"No memory found with id={jd_memory_id}")
+    if not row[0]:
+        raise ValueError(f"Memory id={jd_memory_id} has no embedding")
+
 
+def _ensure_resume_exists(cur, resume_id: str):
+    cur.execute("SELECT embedding IS NOT NULL FROM resumes WHERE id = %s", [resume_id])
+    row = cur.fetchone()
+    if not row:
+        raise ValueError(f"No resume found with id={resume_id}")
+    if not row[0]:
+        raise ValueError(f"Resume id={resume_id} has no embedding")
 
-def get_top_k_resumes_for_jd_memory(jd_memory_id: str, top_k: int = 3) -> List[Dict[str, Any]]:
+
+def _get_top_k_resumes_binary_prefilter(
+    jd_memory_id: str,
+    top_k: int,
+    search_params: Dict[str, int],
+    filter_sql: str,
+    filter_params: List[Any],
+) -> List[Dict[str, Any]]:
     """
-    Core matching: given JD memory id, return top-K resumes with ATS & file_name.
+    VECTOR_PREFILTER=binary: take the BINARY_PREFILTER_CANDIDATES nearest
+    resumes by Hamming distance on the sign bits (bit index, 96 bytes a row),
+    then re-rank just those by exact cosine on the stored vectors.
     """
-    jd_embedding_literal = get_memory_embedding_literal(jd_memory_id)
-
+    candidates = max(top_k, BINARY_PREFILTER_CANDIDATES)
     conn = get_connection()
     try:
         cur = conn.cursor()
+        _apply_vector_search_params(cur, candidates, **search_params)
+        if filter_sql:
+            _enable_iterative_scan(cur)
         cur.execute(
-            """
-            WITH jd AS (SELECT %s::vector AS v)
+            f"""
+            WITH jd AS (SELECT embedding AS v FROM memories WHERE id = %s),
+            candidates AS (
+                SELECT r.id
+                FROM resumes r
+                WHERE r.type = 'resume'
+                  AND EXISTS (SELECT 1 FROM jd WHERE v IS NOT NULL){filter_sql}
+                ORDER BY {RESUME_BINARY_QUANTIZE_SQL} <~> binary_quantize((SELECT v FROM jd))
+                LIMIT %s
+            )
             SELECT
                 r.id AS resume_id,
                 r.candidate_name,
                 r.title,
                 r.metadata->>'file_name' AS file_name,
                 1 - (r.embedding <=> (SELECT v FROM jd)) AS similarity
-            FROM resumes r
-            WHERE r.type = 'resume'
+            FROM candidates c
+            JOIN resumes r ON r.id = c.id
             ORDER BY r.embedding <=> (SELECT v FROM jd)
             LIMIT %s;
             """,
-            [jd_embedding_literal, top_k],
+            [jd_memory_id, *filter_params, candidates, top_k],
         )
         rows = cur.fetchall()
+        if not rows:
+            _ensure_memory_exists(cur, jd_memory_id)
         cur.close()
     finally:
         conn.close()
 
+    return _rows_to_matches(rows)
+
+
+def _rows_to_matches(rows: List[Tuple]) -> List[Dict[str, Any]]:
+    """(resume_id, name, title, file_name, similarity) rows, best first -> match dicts."""
     results: List[Dict[str, Any]] = []
     for rank, (resume_id, name, title, file_name, similarity) in enumerate(rows, start=1):
         ats_score = int(max(0.0, min(1.0, similarity)) * 100)
@@ -98,12 +611,539 @@ def get_top_k_resumes_for_jd_memory(jd_memory_id: str, top_k: int = 3) -> List[D
     return results
 
 
-def get_top_k_resumes_for_role(role_name: str, top_k: int = 3) -> List[Dict[str, Any]]:
+# JD side of explain_matches: skill ids/names in the same order, and the
+# experience range. Expressions follow build_jd_filter_sql.
+_JD_EXPLAIN_SQL = """
+    SELECT
+        m.id,
+        ARRAY(SELECT jsonb_array_elements_text(COALESCE(m.metadata->'primary_skill_ids', '[]'))::int) AS primary_ids,
+        ARRAY(SELECT jsonb_array_elements_text(COALESCE(m.metadata->'primary_skills', '[]'))) AS primary_names,
+        ARRAY(SELECT jsonb_array_elements_text(COALESCE(m.metadata->'secondary_skill_ids', '[]'))::int) AS secondary_ids,
+        ARRAY(SELECT jsonb_array_elements_text(COALESCE(m.metadata->'secondary_skills', '[]'))) AS secondary_names,
+        CASE WHEN jsonb_typeof(m.metadata->'experience_min') = 'number'
+             THEN (m.metadata->>'experience_min')::float8 END AS exp_min,
+        CASE WHEN jsonb_typeof(m.metadata->'experience_max') = 'number'
+             THEN (m.metadata->>'experience_max')::float8 END AS exp_max
+    FROM memories m
+    WHERE m.id = ANY(%s::uuid[])
+"""
+
+_explain_lock = threading.Lock()
+_explain_stats = {"calls": 0, "rows": 0, "total_ms": 0.0}
+
+
+def _skills_split_sql(kind: str) -> str:
+    """JD {kind} skill names the resume has / lacks, in JD order."""
+    has = "s.id = ANY(r.skill_ids)"
+    return f"""
+                    ARRAY(SELECT s.name FROM unnest(jd.{kind}_ids, jd.{kind}_names) AS s(id, name)
+                          WHERE {has}) AS {kind}_matched,
+                    ARRAY(SELECT s.name FROM unnest(jd.{kind}_ids, jd.{kind}_names) AS s(id, name)
+                          WHERE NOT COALESCE({has}, false)) AS {kind}_missing"""
+
+
+def _coverage_sql(kind: str) -> str:
+    total = f"(cardinality({kind}_matched) + cardinality({kind}_missing))"
+    return f"CASE WHEN {total} > 0 THEN cardinality({kind}_matched)::float8 / {total} END"
+
+
+def explain_matches(matches_by_jd: Dict[str, List[Dict[str, Any]]]) -> None:
+    """
+    Add "explanation" and "coverage_score" to each match (in place): which JD
+    primary/secondary skills the resume covers (skills_taxonomy ids), how its
+    experience fits the JD range, and the weighted coverage score 0-100.
+
+    Everything is computed in one statement over all (JD, resume) pairs, so
+    the cost barely depends on top_k. JDs without skill ids or experience
+    range simply leave those parts out of the score.
+    """
+    pairs = [
+        (_uuid_text(jd_id), _uuid_text(match["resume_id"]))
+        for jd_id, matches in matches_by_jd.items()
+        for match in matches
+    ]
+    if not pairs:
+        return
+
+    weights = (
+        (COVERAGE_PRIMARY_WEIGHT, "primary_coverage"),
+        (COVERAGE_SECONDARY_WEIGHT, "secondary_coverage"),
+        (COVERAGE_EXPERIENCE_WEIGHT, "experience_score"),
+    )
+    weighted_sum = " + ".join(f"COALESCE({float(w)} * {col}, 0)" for w, col in weights)
+    weight_total = " + ".join(f"CASE WHEN {col} IS NOT NULL THEN {float(w)} ELSE 0 END" for w, col in weights)
+
+    start = time.perf_counter()
+    conn = get_connection()
+    try:
+        cur = conn.cursor()
+        cur.execute(
+            f"""
+            WITH jd AS ({_JD_EXPLAIN_SQL}),
+            split AS (
+                SELECT
+                    p.jd_id,
+                    p.resume_id,{_skills_split_sql("primary")},{_skills_split_sql("secondary")},
+                    {RESUME_EXPERIENCE_SQL}::float8 AS years,
+                    jd.exp_min,
+                    jd.exp_max
+                FROM unnest(%s::uuid[], %s::uuid[]) AS p(jd_id, resume_id)
+                JOIN jd ON jd.id = p.jd_id
+                JOIN resumes r ON r.id = p.resume_id
+            ),
+            fit AS (
+                SELECT
+                    *,
+                    {_coverage_sql("primary")} AS primary_coverage,
+                    {_coverage_sql("secondary")} AS secondary_coverage,
+                    CASE
+                        WHEN exp_min IS NULL AND exp_max IS NULL THEN NULL
+                        WHEN years IS NULL THEN 'unknown'
+                        WHEN years < exp_min THEN 'below'
+                        WHEN years > exp_max THEN 'above'
+                        ELSE 'within'
+                    END AS experience_fit,
+                    -- Linear penalty for the gap below the minimum; being
+                    -- over the maximum costs half as much.
+                    CASE
+                        WHEN years IS NULL OR (exp_min IS NULL AND exp_max IS NULL) THEN NULL
+                        WHEN years < exp_min THEN GREATEST(0, 1 - (exp_min - years) / GREATEST(exp_min, 1))
+                        WHEN years > exp_max THEN GREATEST(0, 1 - 0.5 * (years - exp_max) / GREATEST(exp_max, 1))
+                        ELSE 1
+                    END AS experience_score
+                FROM split
+            )
+            SELECT
+                jd_id,
+                resume_id,
+                primary_matched,
+                primary_missing,
+                primary_coverage,
+                secondary_matched,
+                secondary_missing,
+                secondary_coverage,
+                years,
+                exp_min,
+                exp_max,
+                experience_fit,
+                experience_score,
+                ({weighted_sum}) / NULLIF({weight_total}, 0) AS coverage_score
+            FROM fit;
+            """,
+            [list({jd_id for jd_id, _ in pairs}), [jd for jd, _ in pairs], [rid for _, rid in pairs]],
+        )
+        rows = cur.fetchall()
+        cur.close()
+    finally:
+        conn.close()
+
+    explained = {}
+    for (
+        jd_id, resume_id,
+        primary_matched, primary_missing, primary_coverage,
+        secondary_matched, secondary_missing, secondary_coverage,
+        years, exp_min, exp_max, experience_fit, experience_score,
+        coverage_score,
+    ) in rows:
+        explained[(_uuid_text(jd_id), _uuid_text(resume_id))] = (
+            {
+                "primary_skills": {
+                    "matched": primary_matched,
+                    "missing": primary_missing,
+                    "coverage": _round(primary_coverage),
+                },
+                "secondary_skills": {
+                    "matched": secondary_matched,
+                    "missing": secondary_missing,
+                    "coverage": _round(secondary_coverage),
+                },
+                "experience": {
+                    "years": years,
+                    "min": exp_min,
+                    "max": exp_max,
+                    "fit": experience_fit,
+                    "score": _round(experience_score),
+                },
+            },
+            None if coverage_score is None else int(max(0.0, min(1.0, coverage_score)) * 100),
+        )
+
+    for jd_id, matches in matches_by_jd.items():
+        for match in matches:
+            found = explained.get((_uuid_text(jd_id), _uuid_text(match["resume_id"])))
+            if found:
+                match["explanation"], match["coverage_score"] = found
+
+    with _explain_lock:
+        _explain_stats["calls"] += 1
+        _explain_stats["rows"] += len(rows)
+        _explain_stats["total_ms"] += (time.perf_counter() - start) * 1000
+
+
+def _uuid_text(value: Any) -> str:
+    return str(uuid.UUID(str(value)))
+
+
+def _round(value: Optional[float]) -> Optional[float]:
+    return None if value is None else round(value, 3)
+
+
+MAX_BATCH_JDS = 200
+
+
+def get_top_k_resumes_for_jd_memories(
+    jd_memory_ids: List[str],
+    top_k: int = 3,
+    *,
+    recall: Optional[str] = None,
+    filters: Optional[Dict[str, Any]] = None,
+    explain: Optional[bool] = None,
+) -> Dict[str, List[Dict[str, Any]]]:
+    """
+    Batch matching: top-K resumes for each JD memory id, in one round trip
+    (a LATERAL join running one ANN scan per JD inside the same statement).
+    With `explain`, one more statement explains the matches of every JD.
+
+    Returns {jd_id: matches} for the JDs that exist and have an embedding;
+    other ids are omitted (both backends), and /match/batch lists them as missing.
+    """
+    # Canonical UUID text -> the id as the caller spelled it (results use the latter).
+    requested: Dict[str, str] = {}
+    for jd_id in jd_memory_ids:
+        try:
+            requested.setdefault(str(uuid.UUID(str(jd_id))), str(jd_id))
+        except ValueError:
+            raise ValueError(f"Invalid JD id: '{jd_id}'")
+    jd_ids = list(requested)
+    if not jd_ids:
+        return {}
+    if len(jd_ids) > MAX_BATCH_JDS:
+        raise ValueError(f"At most {MAX_BATCH_JDS} JD ids per batch")
+
+    search_params = resolve_search_params(recall)
+    filters = normalize_resume_filters(filters)
+    explain = MATCH_EXPLAIN if explain is None else explain
+
+    def _match():
+        matches_by_jd = _get_top_k_resumes_for_jd_memories_uncached(jd_ids, top_k, search_params, filters)
+        if explain:
+            explain_matches(matches_by_jd)
+        return matches_by_jd
+
+    by_jd = cached_match(
+        "resumes_for_jds",
+        {
+            "jds": jd_ids,
+            "top_k": top_k,
+            "search": search_params,
+            "filters": filters,
+            "explain": explain,
+            "backend": VECTOR_SEARCH_BACKEND,
+        },
+        _match,
+    )
+    return {requested[jd_id]: matches for jd_id, matches in by_jd.items()}
+
+
+def _get_top_k_resumes_for_jd_memories_uncached(
+    jd_ids: List[str],
+    top_k: int,
+    search_params: Dict[str, int],
+    filters: Dict[str, Any],
+) -> Dict[str, List[Dict[str, Any]]]:
+    """Keyed by canonical JD id text."""
+    filter_sql, filter_params = build_resume_filter_sql(filters)
+
+    if VECTOR_SEARCH_BACKEND == "local" and not filter_sql:
+        from local_vector_index import search_local_index_batch
+
+        return search_local_index_batch(jd_ids, top_k)
+
+    conn = get_connection()
+    try:
+        cur = conn.cursor()
+        _apply_vector_search_params(cur, top_k, **search_params)
+        if filter_sql:
+            _enable_iterative_scan(cur)
+        cur.execute(
+            f"""
+            SELECT
+                jd.id AS jd_id,
+                m.resume_id,
+                m.candidate_name,
+                m.title,
+                m.file_name,
+                m.similarity
+            FROM memories jd
+            LEFT JOIN LATERAL (
+                SELECT
+                    r.id AS resume_id,
+                    r.candidate_name,
+                    r.title,
+                    r.metadata->>'file_name' AS file_name,
+                    1 - (r.embedding <=> jd.embedding) AS similarity
+                FROM resumes r
+                WHERE r.type = 'resume'{filter_sql}
+                ORDER BY r.embedding <=> jd.embedding
+                LIMIT %s
+            ) m ON TRUE
+            WHERE jd.id = ANY(%s::uuid[]) AND jd.embedding IS NOT NULL
+            ORDER BY jd.id, m.similarity DESC;
+            """,
+            [*filter_params, top_k, jd_ids],
+        )
+        rows = cur.fetchall()
+        cur.close()
+    finally:
+        conn.close()
+
+    grouped: Dict[str, List[Tuple]] = {}
+    for jd_id, *match in rows:
+        bucket = grouped.setdefault(str(jd_id), [])
+        if match[0] is not None:  # LEFT JOIN row for a JD with no matching resumes
+            bucket.append(tuple(match))
+    return {jd_id: _rows_to_matches(grouped[jd_id]) for jd_id in jd_ids if jd_id in grouped}
+
+
+def _fuse_scores(
+    vector_rank: Optional[int],
+    lexical_rank: Optional[int],
+    similarity: float,
+    lexical_score: float,
+) -> float:
+    """
+    Combine the two rankings. "rrf" = reciprocal-rank fusion (rank-based, so
+    the scales of cosine and ts_rank don't matter); "weighted" = linear blend
+    of the raw scores.
+    """
+    weight = HYBRID_LEXICAL_WEIGHT
+    if HYBRID_FUSION == "weighted":
+        return (1 - weight) * similarity + weight * lexical_score
+    fused = 0.0
+    if vector_rank is not None:
+        fused += (1 - weight) / (HYBRID_RRF_K + vector_rank)
+    if lexical_rank is not None:
+        fused += weight / (HYBRID_RRF_K + lexical_rank)
+    return fused
+
+
+def _get_top_k_resumes_hybrid(
+    jd_memory_id: str,
+    top_k: int,
+    search_params: Dict[str, int],
+    filter_sql: str,
+    filter_params: List[Any],
+) -> List[Dict[str, Any]]:
+    """
+    Hybrid match in one round trip: the ANN top candidates and the full-text
+    top candidates (JD primary_skills + keywords against resumes.search_tsv)
+    are unioned, both scores are computed for every candidate, and the
+    union is fused in Python.
+
+    The lexical score is ts_rank_cd with length normalization and 0..1
+    saturation (flags 1|32), a BM25-like shape without corpus statistics.
+    """
+    candidates = max(top_k, HYBRID_CANDIDATES)
+
+    conn = get_connection()
+    try:
+        cur = conn.cursor()
+        _apply_vector_search_params(cur, candidates, **search_params)
+        if filter_sql:
+            _enable_iterative_scan(cur)
+        cur.execute(
+            f"""
+            WITH jd AS (
+                SELECT
+                    m.embedding AS v,
+                    websearch_to_tsquery('simple', COALESCE((
+                        SELECT string_agg('"' || replace(term, '"', ' ') || '"', ' or ')
+                        FROM jsonb_array_elements_text(
+                            COALESCE(m.canonical_json->'primary_skills', '[]'::jsonb)
+                            || COALESCE(m.canonical_json->'keywords', '[]'::jsonb)
+                        ) AS term
+                    ), '')) AS q
+                FROM memories m
+                WHERE m.id = %s AND m.embedding IS NOT NULL
+            ),
+            sem AS (
+                SELECT id, row_number() OVER (ORDER BY dist) AS rnk
+                FROM (
+                    SELECT r.id, r.embedding <=> (SELECT v FROM jd) AS dist
+                    FROM resumes r
+                    WHERE r.type = 'resume'
+                      AND EXISTS (SELECT 1 FROM jd){filter_sql}
+                    ORDER BY r.embedding <=> (SELECT v FROM jd)
+                    LIMIT %s
+                ) s
+            ),
+            lex AS (
+                SELECT id, row_number() OVER (ORDER BY score DESC) AS rnk
+                FROM (
+                    SELECT r.id, ts_rank_cd(r.search_tsv, (SELECT q FROM jd), 33) AS score
+                    FROM resumes r
+                    WHERE r.type = 'resume'
+                      AND r.search_tsv @@ (SELECT q FROM jd){filter_sql}
+                    ORDER BY score DESC
+                    LIMIT %s
+                ) l
+            )
+            SELECT
+                r.id AS resume_id,
+                r.candidate_name,
+                r.title,
+                r.metadata->>'file_name' AS file_name,
+                1 - (r.embedding <=> (SELECT v FROM jd)) AS similarity,
+                ts_rank_cd(r.search_tsv, (SELECT q FROM jd), 33) AS lexical_score,
+                sem.rnk AS vector_rank,
+                lex.rnk AS lexical_rank
+            FROM (SELECT id FROM sem UNION SELECT id FROM lex) ids
+            JOIN resumes r ON r.id = ids.id
+            LEFT JOIN sem ON sem.id = r.id
+            LEFT JOIN lex ON lex.id = r.id;
+            """,
+            [jd_memory_id, *filter_params, candidates, *filter_params, candidates],
+        )
+        rows = cur.fetchall()
+        if not rows:
+            _ensure_memory_exists(cur, jd_memory_id)
+        cur.close()
+    finally:
+        conn.close()
+
+    scored = []
+    for resume_id, name, title, file_name, similarity, lexical_score, vector_rank, lexical_rank in rows:
+        similarity = float(similarity)
+        lexical_score = float(lexical_score or 0.0)
+        scored.append(
+            {
+                "resume_id": resume_id,
+                "candidate_name": name,
+                "current_title": title,
+                "file_name": file_name,
+                "similarity": similarity,
+                "lexical_score": round(lexical_score, 4),
+                "vector_rank": vector_rank,
+                "lexical_rank": lexical_rank,
+                "fused_score": round(_fuse_scores(vector_rank, lexical_rank, similarity, lexical_score), 6),
+                # Keep ATS on the familiar 0-100 scale regardless of fusion method.
+                "ats_score": int(
+                    max(0.0, min(1.0, (1 - HYBRID_LEXICAL_WEIGHT) * similarity + HYBRID_LEXICAL_WEIGHT * lexical_score))
+                    * 100
+                ),
+            }
+        )
+
+    scored.sort(key=lambda item: item["fused_score"], reverse=True)
+    results = scored[:top_k]
+    for rank, item in enumerate(results, start=1):
+        item["rank"] = rank
+    return results
+
+
+def get_top_k_jds_for_resume(
+    resume_id: str,
+    top_k: int = 3,
+    *,
+    recall: Optional[str] = None,
+    filters: Optional[Dict[str, Any]] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Reverse matching: the JDs (memories, type='job') a resume fits best,
+    ordered through the ANN index on memories.embedding.
+    `filters` is described in normalize_jd_filters.
+    """
+    try:
+        resume_id = str(uuid.UUID(str(resume_id)))
+    except ValueError:
+        raise ValueError(f"Invalid resume id: '{resume_id}'")
+    search_params = resolve_search_params(recall)
+    filters = normalize_jd_filters(filters)
+    return cached_match(
+        "jds_for_resume",
+        {"resume": resume_id, "top_k": top_k, "search": search_params, "filters": filters},
+        lambda: _get_top_k_jds_for_resume_uncached(resume_id, top_k, search_params, filters),
+    )
+
+
+def _get_top_k_jds_for_resume_uncached(
+    resume_id: str,
+    top_k: int,
+    search_params: Dict[str, int],
+    filters: Dict[str, Any],
+) -> List[Dict[str, Any]]:
+    filter_sql, filter_params = build_jd_filter_sql(filters)
+
+    conn = get_connection()
+    try:
+        cur = conn.cursor()
+        _apply_vector_search_params(cur, top_k, **search_params)
+        if filter_sql:
+            _enable_iterative_scan(cur)
+        cur.execute(
+            f"""
+            WITH cv AS (SELECT embedding AS v FROM resumes WHERE id = %s)
+            SELECT
+                m.id AS jd_id,
+                m.title,
+                m.metadata->>'job_id' AS job_id,
+                m.metadata->>'location' AS location,
+                m.metadata->>'employment_type' AS employment_type,
+                m.metadata->'experience_min' AS experience_min,
+                m.metadata->'experience_max' AS experience_max,
+                1 - (m.embedding <=> (SELECT v FROM cv)) AS similarity
+            FROM memories m
+            WHERE m.type = 'job'
+              AND EXISTS (SELECT 1 FROM cv WHERE v IS NOT NULL){filter_sql}
+            ORDER BY m.embedding <=> (SELECT v FROM cv)
+            LIMIT %s;
+            """,
+            [resume_id, *filter_params, top_k],
+        )
+        rows = cur.fetchall()
+        if not rows:
+            _ensure_resume_exists(cur, resume_id)
+        cur.close()
+    finally:
+        conn.close()
+
+    results: List[Dict[str, Any]] = []
+    for rank, (jd_id, title, job_id, location, employment_type, exp_min, exp_max, similarity) in enumerate(
+        rows, start=1
+    ):
+        results.append(
+            {
+                "jd_id": jd_id,
+                "role": title,
+                "job_id": job_id,
+                "location": location,
+                "employment_type": employment_type,
+                "experience_min": exp_min,
+                "experience_max": exp_max,
+                "similarity": float(similarity),
+                "match_score": int(max(0.0, min(1.0, similarity)) * 100),
+                "rank": rank,
+            }
+        )
+    return results
+
+
+def get_top_k_resumes_for_role(
+    role_name: str,
+    top_k: int = 3,
+    *,
+    recall: Optional[str] = None,
+    filters: Optional[Dict[str, Any]] = None,
+    scoring: Optional[str] = None,
+    rerank: Optional[str] = None,
+) -> List[Dict[str, Any]]:
     """
     Public API method:
       - takes role_name (e.g. 'Senior Data Scientist')
       - finds JD memory internally
-      - returns top-K resumes
+      - returns top-K resumes (optionally restricted by `filters`)
     """
     jd_memory_id = get_jd_memory_id_by_role(role_name)
-    return get_top_k_resumes_for_jd_memory(jd_memory_id, top_k=top_k)
+    return get_top_k_resumes_for_jd_memory(
+        jd_memory_id, top_k=top_k, recall=recall, filters=filters, scoring=scoring, rerank=rerank
+    )
@@ -0,0 +1,328 @@
+"""
+Second-stage re-ranking of the top vector hits for a JD (ranking.py).
+
+rerank_matches() re-scores the first RERANK_CANDIDATES matches on the full
+canonical_json of the JD and each resume, then blends that score with the
+first-stage ATS score (RERANK_WEIGHT):
+  - "local": rule score (skill coverage on canonical skills, experience fit,
+    title overlap), microseconds per candidate
+  - "llm": a Gemini judge with a compact prompt per (JD, resume) pair,
+    run on a RERANK_MAX_CONCURRENCY pool behind the shared llm_client limits
+
+Scores are cached per (mode, JD, resume), keyed with both rows' updated_at,
+so a pair is judged once until either side changes. The stage is bounded by
+RERANK_BUDGET_SECONDS: candidates not judged in time keep their first-stage
+score, and their late judgements still land in the cache for the next query.
+"""
+import json
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Dict, List, Optional, Tuple
+
+from config import (
+    RERANK_CANDIDATES,
+    RERANK_WEIGHT,
+    RERANK_BUDGET_SECONDS,
+    RERANK_MAX_CONCURRENCY,
+    RERANK_CACHE_MAX_ENTRIES,
+)
+from db import db_cursor
+from skills_taxonomy import canonical_skills
+from structured_output import generate_json
+
+RERANK_MODES = ("off", "local", "llm")
+# Bump whenever the judge prompt or the local score changes so cached scores are not reused
+RERANK_VERSION = "1"
+
+_JUDGE_PROMPT = """Rate how well the candidate fits the job from 0 (no fit) to 100 (ideal fit).
+Weigh required skills most, then relevant experience and seniority, then nice-to-haves.
+Reply with JSON: {{"score": <0-100>, "reason": "<at most 20 words>"}}.
+
+Job: {job}
+Candidate: {candidate}"""
+_JUDGE_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "score": {"type": "integer"},
+        "reason": {"type": "string"},
+    },
+    "required": ["score"],
+}
+# Per-field caps that keep the judge prompt compact (~300 tokens a pair).
+_MAX_LIST_ITEMS = 12
+_MAX_JOBS = 3
+_MAX_TEXT_CHARS = 300
+_TOKEN_RE = re.compile(r"[a-z0-9+#]+")
+
+_lock = threading.Lock()
+_cache: "OrderedDict[Tuple[str, ...], Tuple[int, Optional[str]]]" = OrderedDict()
+_stats = {
+    "calls": 0,
+    "candidates": 0,
+    "cache_hits": 0,
+    "scored": 0,
+    "errors": 0,
+    "last_error": None,
+    "over_budget": 0,
+    "total_ms": 0.0,
+}
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_pid: Optional[int] = None
+_executor_lock = threading.Lock()
+
+
+def _bump(counter: str, n: float = 1):
+    with _lock:
+        _stats[counter] += n
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor, _executor_pid
+    with _executor_lock:
+        # Executor threads do not survive fork(); rebuild in each worker process.
+        if _executor is None or _executor_pid != os.getpid():
+            _executor = ThreadPoolExecutor(max_workers=RERANK_MAX_CONCURRENCY, thread_name_prefix="rerank")
+            _executor_pid = os.getpid()
+        return _executor
+
+
+def normalize_rerank_mode(mode: Optional[str], default: str) -> str:
+    mode = (mode or default).lower()
+    if mode not in RERANK_MODES:
+        raise ValueError(f"Unknown rerank mode '{mode}'. Use one of: {', '.join(RERANK_MODES)}")
+    return mode
+
+
+def _cache_get(key: Tuple[str, ...]) -> Optional[Tuple[int, Optional[str]]]:
+    with _lock:
+        entry = _cache.get(key)
+        if entry is not None:
+            _cache.move_to_end(key)
+        return entry
+
+
+def _cache_put(key: Tuple[str, ...], value: Tuple[int, Optional[str]]):
+    with _lock:
+        _cache[key] = value
+        _cache.move_to_end(key)
+        while len(_cache) > RERANK_CACHE_MAX_ENTRIES:
+            _cache.popitem(last=False)
+
+
+def _load(jd_id: str, resume_ids: List[str]) -> Tuple[Optional[Tuple[Dict, str]], Dict[str, Tuple[Dict, str]]]:
+    """(canonical_json, updated_at) of the JD and of each resume, in one round trip."""
+    with db_cursor() as cur:
+        cur.execute(
+            """
+            SELECT 'job', id, canonical_json, updated_at FROM memories WHERE id = %s
+            UNION ALL
+            SELECT 'resume', id, canonical_json, updated_at FROM resumes WHERE id = ANY(%s::uuid[])
+            """,
+            [jd_id, resume_ids],
+        )
+        rows = cur.fetchall()
+    jd = None
+    resumes: Dict[str, Tuple[Dict, str]] = {}
+    for kind, row_id, canonical_json, updated_at in rows:
+        entry = (canonical_json or {}, str(updated_at))
+        if kind == "job":
+            jd = entry
+        else:
+            resumes[str(row_id)] = entry
+    return jd, resumes
+
+
+def _experience_fit(years: Any, exp_min: Any, exp_max: Any) -> Optional[float]:
+    """Same shape as the experience score in ranking.explain_matches."""
+    if not isinstance(years, (int, float)) or (exp_min is None and exp_max is None):
+        return None
+    if isinstance(exp_min, (int, float)) and years < exp_min:
+        return max(0.0, 1 - (exp_min - years) / max(exp_min, 1))
+    if isinstance(exp_max, (int, float)) and years > exp_max:
+        return max(0.0, 1 - 0.5 * (years - exp_max) / max(exp_max, 1))
+    return 1.0
+
+
+def _tokens(text: Any) -> set:
+    return set(_TOKEN_RE.findall(str(text or "").lower()))
+
+
+def local_score(jd: Dict[str, Any], resume: Dict[str, Any]) -> Tuple[int, Optional[str]]:
+    """Rule score over canonical_json: required/secondary skills, experience, title overlap."""
+    resume_skills = {s.lower() for s in canonical_skills(resume.get("skills"))}
+    # Skills named in the work history count too (the skills list is often partial).
+    history = _tokens(" ".join(
+        " ".join([str(job.get("title") or "")] + [str(r) for r in job.get("responsibilities") or []])
+        for job in resume.get("work_experience") or []
+        if isinstance(job, dict)
+    ))
+
+    parts: List[Tuple[float, float]] = []
+    missing: List[str] = []
+    for field, weight in (("primary_skills", 0.5), ("secondary_skills", 0.15)):
+        wanted = canonical_skills(jd.get(field))
+        if not wanted:
+            continue
+        found = [s for s in wanted if s.lower() in resume_skills or (_tokens(s) and _tokens(s) <= history)]
+        parts.append((weight, len(found) / len(wanted)))
+        if field == "primary_skills":
+            missing = [s for s in wanted if s not in found]
+
+    exp = jd.get("experience") if isinstance(jd.get("experience"), dict) else {}
+    fit = _experience_fit(resume.get("total_experience_years"), exp.get("min"), exp.get("max"))
+    if fit is not None:
+        parts.append((0.15, fit))
+
+    role = _tokens(jd.get("role"))
+    if role:
+        titles = _tokens(resume.get("current_title")) | {
+            t for job in resume.get("work_experience") or [] if isinstance(job, dict) for t in _tokens(job.get("title"))
+        }
+        parts.append((0.2, len(role & titles) / len(role)))
+
+    if not parts:
+        return 0, None
+    score = sum(w * v for w, v in parts) / sum(w for w, _ in parts)
+    reason = f"missing {', '.join(missing[:5])}" if missing else None
+    return int(round(score * 100)), reason
+
+
+def _compact(value: Any) -> Any:
+    if isinstance(value, str):
+        return value[:_MAX_TEXT_CHARS]
+    if isinstance(value, list):
+        return [_compact(v) for v in value[:_MAX_LIST_ITEMS]]
+    if isinstance(value, dict):
+        return {k: _compact(v) for k, v in value.items() if v not in (None, "", [], {})}
+    return value
+
+
+def _judge_prompt(jd: Dict[str, Any], resume: Dict[str, Any]) -> str:
+    job = {
+        key: jd.get(key)
+        for key in ("role", "experience", "primary_skills", "secondary_skills", "responsibilities", "nice_to_have")
+    }
+    candidate = {
+        key: resume.get(key)
+        for key in ("current_title", "total_experience_years", "skills", "certifications", "summary")
+    }
+    candidate["work_experience"] = [
+        {k: job_entry.get(k) for k in ("title", "duration", "responsibilities")}
+        for job_entry in (resume.get("work_experience") or [])[:_MAX_JOBS]
+        if isinstance(job_entry, dict)
+    ]
+    compact = lambda value: json.dumps(_compact(value), ensure_ascii=False, separators=(",", ":"))
+    return _JUDGE_PROMPT.format(job=compact(job), candidate=compact(candidate))
+
+
+def llm_score(jd: Dict[str, Any], resume: Dict[str, Any]) -> Tuple[int, Optional[str]]:
+    reply = generate_json(_judge_prompt(jd, resume), _JUDGE_SCHEMA, max_recalls=0)
+    score = int(max(0, min(100, float(reply.get("score") or 0))))
+    reason = str(reply.get("reason") or "").strip()
+    return score, reason or None
+
+
+def _judge(key: Tuple[str, ...], mode: str, jd: Dict[str, Any], resume: Dict[str, Any]) -> Tuple[int, Optional[str]]:
+    result = llm_score(jd, resume) if mode == "llm" else local_score(jd, resume)
+    _cache_put(key, result)
+    _bump("scored")
+    return result
+
+
+def rerank_matches(jd_id: str, matches: List[Dict[str, Any]], mode: str) -> List[Dict[str, Any]]:
+    """
+    Re-score the first RERANK_CANDIDATES of `matches` (best first) and return
+    them re-ordered by the blended score, followed by the rest in their
+    first-stage order. Every match gets "rerank_score" (0-100, None when not
+    judged in time or beyond RERANK_CANDIDATES), "rerank_reason",
+    "final_score" and "first_stage_rank"; "rank" is renumbered, and
+    final_score never increases with it (tail scores are capped).
+    """
+    if mode == "off" or not matches:
+        return matches
+    start = time.perf_counter()
+    deadline = time.monotonic() + RERANK_BUDGET_SECONDS
+    head, tail = matches[:RERANK_CANDIDATES], matches[RERANK_CANDIDATES:]
+    _bump("calls")
+    _bump("candidates", len(head))
+
+    jd, resumes = _load(jd_id, [str(m["resume_id"]) for m in head])
+    results: Dict[int, Tuple[int, Optional[str]]] = {}
+    pending = {}
+    if jd is not None:
+        jd_json, jd_version = jd
+        for i, match in enumerate(head):
+            resume = resumes.get(str(match["resume_id"]))
+            if resume is None:
+                continue
+            resume_json, resume_version = resume
+            key = (RERANK_VERSION, mode, str(jd_id), jd_version, str(match["resume_id"]), resume_version)
+            cached = _cache_get(key)
+            if cached is not None:
+                _bump("cache_hits")
+                results[i] = cached
+            elif mode == "local":
+                results[i] = _judge(key, mode, jd_json, resume_json)
+            else:
+                pending[_get_executor().submit(_judge, key, mode, jd_json, resume_json)] = i
+
+    while pending:
+        done, _ = wait(list(pending), timeout=max(0.0, deadline - time.monotonic()), return_when=FIRST_COMPLETED)
+        if not done:
+            # Over budget: the rest keep their first-stage score. Queued judgements
+            # are dropped; running ones finish in the background and fill the cache.
+            _bump("over_budget", len(pending))
+            for future in pending:
+                future.cancel()
+            break
+        for future in done:
+            i = pending.pop(future)
+            try:
+                results[i] = future.result()
+            except Exception as e:
+                with _lock:
+                    _stats["errors"] += 1
+                    _stats["last_error"] = f"resume {head[i]['resume_id']}: {type(e).__name__}: {e}"
+
+    weight = RERANK_WEIGHT
+    for i, match in enumerate(matches):
+        first_stage = match.get("ats_score") or 0
+        score, reason = results.get(i, (None, None))
+        match["first_stage_rank"] = match.get("rank", i + 1)
+        match["rerank_score"] = score
+        match["rerank_reason"] = reason
+        # Judged candidates blend both scores; the rest (and the tail) keep the first stage alone.
+        match["final_score"] = round(first_stage if score is None else (1 - weight) * first_stage + weight * score, 2)
+    head.sort(key=lambda m: m["final_score"], reverse=True)
+    # The tail was never judged, so it stays below the head; capping its
+    # scores at the last head score keeps final_score non-increasing by rank.
+    floor = head[-1]["final_score"]
+    for match in tail:
+        floor = min(floor, match["final_score"])
+        match["final_score"] = floor
+
+    reranked = head + tail
+    for rank, match in enumerate(reranked, start=1):
+        match["rank"] = rank
+    _bump("total_ms", (time.perf_counter() - start) * 1000)
+    return reranked
+
+
+def get_rerank_stats() -> Dict[str, Any]:
+    with _lock:
+        stats = dict(_stats)
+        stats["cache_entries"] = len(_cache)
+    calls = stats["calls"]
+    judged = stats["cache_hits"] + stats["scored"]
+    stats["avg_ms"] = round(stats["total_ms"] / calls, 1) if calls else 0.0
+    stats["total_ms"] = round(stats["total_ms"], 1)
+    stats["cache_hit_rate"] = round(stats["cache_hits"] / judged, 3) if judged else 0.0
+    stats["candidates_per_call"] = RERANK_CANDIDATES
+    stats["budget_seconds"] = RERANK_BUDGET_SECONDS
+    stats["max_concurrency"] = RERANK_MAX_CONCURRENCY
+    return stats
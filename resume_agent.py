@@ -3,8 +3,9 @@ Co-ordinates resume parsing + persistence for uploaded documents.
 """
 from typing import Dict, Any, Optional
 
+from resume_dedup import find_by_content_hash, record_reuploads, resume_content_hash
 from resume_parser import parse_resume_text
-from resume_memory import save_parsed_resume_and_memory
+from resume_memory import upsert_parsed_resumes
 
 
 def process_resume_text(
@@ -16,17 +17,32 @@ def process_resume_text(
     if not raw_text.strip():
         raise ValueError("Resume text is empty")
 
+    # Identical text already ingested: no parse, no embedding, no new row.
+    content_hash = resume_content_hash(raw_text)
+    existing = find_by_content_hash([content_hash]).get(content_hash)
+    if existing:
+        resume_id, parsed = existing
+        record_reuploads([(resume_id, source_url or file_name, file_name)])
+        return {
+            "resume_id": resume_id,
+            "parsed": parsed,
+            "dedup": "exact",
+        }
+
     parsed = parse_resume_text(raw_text)
-    resume_id = save_parsed_resume_and_memory(
-        parsed_resume=parsed,
-        raw_text=raw_text,
-        source_url=source_url or file_name,
-        file_name=file_name,
+    [(resume_id, action)] = upsert_parsed_resumes(
+        [
+            {
+                "parsed_resume": parsed,
+                "raw_text": raw_text,
+                "source_url": source_url or file_name,
+                "file_name": file_name,
+            }
+        ]
     )
 
     return {
         "resume_id": resume_id,
         "parsed": parsed,
+        "dedup": action,
     }
-
-
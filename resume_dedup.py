@@ -0,0 +1,233 @@
+"""
+Ingest-time resume deduplication.
+
+Checks, cheapest first:
+  1. content hash: sha256 of the case/whitespace-normalized extracted text,
+     checked before the LLM parse. Re-uploading the same PDF costs no parse or
+     embedding call; the existing row only records the re-upload. Rows saved
+     from the offline fallback parse ("parse_mode": "offline") don't count:
+     the re-upload is parsed again and replaces that row in place.
+  2. email: a parsed resume whose email matches an existing row replaces that
+     row's content in place (same resume_id).
+  3. near-duplicate: otherwise a nearby existing resume (cosine distance
+     within RESUME_DEDUP_NEAR_DISTANCE) is updated in place, but only when it
+     is the same person: same normalized name or phone, and no conflicting
+     email. The embedding text is only title/location/skills/years, so the
+     vector alone cannot tell two candidates with the same profile apart.
+
+Lookup failures never block ingestion: the upload is treated as new.
+"""
+import hashlib
+import re
+import threading
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from config import RESUME_DEDUP_ENABLED, RESUME_DEDUP_NEAR_DISTANCE
+from db import db_cursor
+from parse_cache import normalize_text
+from vector_codec import vector_param
+
+# Neighbours within the distance checked for a same-person match.
+_NEAR_CANDIDATES = 5
+_NON_NAME_RE = re.compile(r"[^a-z]+")
+
+_lock = threading.Lock()
+_stats = {"checked": 0, "exact": 0, "reparsed": 0, "email": 0, "near_duplicate": 0, "in_batch": 0, "errors": 0}
+
+
+def _bump(counter: str, n: int = 1):
+    with _lock:
+        _stats[counter] += n
+
+
+def resume_content_hash(raw_text: str) -> str:
+    return hashlib.sha256(normalize_text(raw_text).lower().encode("utf-8")).hexdigest()
+
+
+def normalize_email(email: Any) -> Optional[str]:
+    email = str(email or "").strip().lower()
+    return email or None
+
+
+def normalize_name(name: Any) -> Optional[str]:
+    name = _NON_NAME_RE.sub(" ", str(name or "").lower()).strip()
+    return name if name and name != "unknown candidate" else None
+
+
+def normalize_phone(phone: Any) -> Optional[str]:
+    digits = re.sub(r"\D", "", str(phone or ""))
+    # Last 10 digits: "+1 415 555 0199" and "(415) 555-0199" are the same number.
+    return digits[-10:] if len(digits) >= 7 else None
+
+
+def _same_person(candidate: Tuple[Optional[str], Optional[str], Optional[str]], row: Tuple[Any, ...]) -> bool:
+    email, name, phone = candidate
+    row_email, row_name, row_phone = normalize_email(row[1]), normalize_name(row[2]), normalize_phone(row[3])
+    if email and row_email and email != row_email:
+        return False
+    return bool((name and name == row_name) or (phone and phone == row_phone))
+
+
+def find_by_content_hash(hashes: Sequence[str]) -> Dict[str, Tuple[str, Dict[str, Any]]]:
+    """
+    content_hash -> (resume_id, parsed resume) for hashes already ingested
+    with a full parse; offline-parsed rows are left to be re-parsed.
+    """
+    if not RESUME_DEDUP_ENABLED or not hashes:
+        return {}
+    _bump("checked", len(hashes))
+    try:
+        with db_cursor() as cur:
+            cur.execute(
+                """
+                SELECT DISTINCT ON (content_hash) content_hash, id, canonical_json
+                FROM resumes
+                WHERE type = 'resume' AND content_hash = ANY(%s)
+                  AND canonical_json->>'parse_mode' IS DISTINCT FROM 'offline'
+                ORDER BY content_hash, updated_at DESC
+                """,
+                [list(set(hashes))],
+            )
+            rows = cur.fetchall()
+    except Exception as e:
+        print(f"Resume dedup hash lookup failed: {e}")
+        _bump("errors")
+        return {}
+    return {content_hash: (str(resume_id), parsed or {}) for content_hash, resume_id, parsed in rows}
+
+
+def record_reuploads(uploads: Sequence[Tuple[str, Optional[str], Optional[str]]]):
+    """
+    Note identical re-uploads on the existing rows: (resume_id, source_url, file_name).
+    Only metadata bookkeeping changes, so updated_at and the match cache are left alone.
+    """
+    if not uploads:
+        return
+    _bump("exact", len(uploads))
+    try:
+        with db_cursor() as cur:
+            for resume_id, source_url, file_name in uploads:
+                cur.execute(
+                    """
+                    UPDATE resumes
+                    SET metadata = COALESCE(metadata, '{}'::jsonb) || jsonb_build_object(
+                        'upload_count', COALESCE((metadata->>'upload_count')::int, 1) + 1,
+                        'last_uploaded_at', NOW(),
+                        'last_source_url', %s::text,
+                        'last_file_name', %s::text
+                    )
+                    WHERE id = %s
+                    """,
+                    [source_url, file_name, resume_id],
+                )
+    except Exception as e:
+        print(f"Resume dedup re-upload bookkeeping failed: {e}")
+        _bump("errors")
+
+
+def find_existing_resumes(
+    candidates: Sequence[Tuple[Dict[str, Any], Any, Optional[str]]],
+) -> List[Optional[Tuple[str, str]]]:
+    """
+    For each (parsed resume, embedding, content hash) return (resume_id,
+    "reparsed" | "email" | "near_duplicate") of the row it should update, or
+    None for a new resume. "reparsed" is an offline-parsed row of the same text.
+    """
+    found: List[Optional[Tuple[str, str]]] = [None] * len(candidates)
+    if not RESUME_DEDUP_ENABLED or not candidates:
+        return found
+
+    emails = [normalize_email(parsed.get("email")) for parsed, _, _ in candidates]
+    try:
+        with db_cursor() as cur:
+            hashes = sorted({content_hash for _, _, content_hash in candidates if content_hash})
+            offline: Dict[str, str] = {}
+            if hashes:
+                cur.execute(
+                    """
+                    SELECT DISTINCT ON (content_hash) content_hash, id
+                    FROM resumes
+                    WHERE type = 'resume' AND content_hash = ANY(%s)
+                      AND canonical_json->>'parse_mode' = 'offline'
+                    ORDER BY content_hash, updated_at DESC
+                    """,
+                    [hashes],
+                )
+                offline = {content_hash: str(resume_id) for content_hash, resume_id in cur.fetchall()}
+
+            wanted = sorted({email for email in emails if email})
+            by_email: Dict[str, str] = {}
+            if wanted:
+                cur.execute(
+                    """
+                    SELECT DISTINCT ON (lower(email)) lower(email), id
+                    FROM resumes
+                    WHERE type = 'resume' AND lower(email) = ANY(%s)
+                    ORDER BY lower(email), updated_at DESC
+                    """,
+                    [wanted],
+                )
+                by_email = {email: str(resume_id) for email, resume_id in cur.fetchall()}
+
+            for i, (email, (parsed, embedding, content_hash)) in enumerate(zip(emails, candidates)):
+                if content_hash in offline:
+                    found[i] = (offline[content_hash], "reparsed")
+                    continue
+                if email in by_email:
+                    found[i] = (by_email[email], "email")
+                    continue
+                if RESUME_DEDUP_NEAR_DISTANCE <= 0 or embedding is None:
+                    continue
+                identity = (email, normalize_name(parsed.get("candidate_name")), normalize_phone(parsed.get("phone")))
+                if not identity[1] and not identity[2]:
+                    continue  # nothing to confirm the same person with
+                vec = vector_param(embedding)
+                cur.execute(
+                    """
+                    SELECT id, email, candidate_name, phone, embedding <=> %s AS distance
+                    FROM resumes
+                    WHERE type = 'resume' AND embedding IS NOT NULL
+                    ORDER BY embedding <=> %s
+                    LIMIT %s
+                    """,
+                    [vec, vec, _NEAR_CANDIDATES],
+                )
+                for row in cur.fetchall():
+                    if row[4] is None or row[4] > RESUME_DEDUP_NEAR_DISTANCE:
+                        break
+                    if _same_person(identity, row):
+                        found[i] = (str(row[0]), "near_duplicate")
+                        break
+    except Exception as e:
+        print(f"Resume dedup lookup failed: {e}")
+        _bump("errors")
+        return [None] * len(candidates)
+
+    for match in found:
+        if match:
+            _bump(match[1])
+    return found
+
+
+def count_in_batch_duplicates(n: int):
+    _bump("in_batch", n)
+
+
+def summarize_dedup(items: Sequence[Optional[Dict[str, Any]]]) -> Dict[str, int]:
+    """Per-upload report: how many items were short-circuited or merged, by check."""
+    summary = {"exact": 0, "in_batch": 0, "reparsed": 0, "email": 0, "near_duplicate": 0}
+    for item in items:
+        action = (item or {}).get("dedup")
+        if action in summary:
+            summary[action] += 1
+    summary["short_circuited"] = summary["exact"] + summary["in_batch"]
+    return summary
+
+
+def get_resume_dedup_stats() -> Dict[str, Any]:
+    with _lock:
+        stats = dict(_stats)
+    stats["enabled"] = RESUME_DEDUP_ENABLED
+    stats["near_distance"] = RESUME_DEDUP_NEAR_DISTANCE
+    stats["short_circuited"] = stats["exact"] + stats["in_batch"]
+    return stats
@@ -1,20 +1,34 @@
 # resume_memory.py
 import uuid
 from datetime import datetime, timezone
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Tuple
 
-import google.generativeai as genai
-from psycopg2.extras import Json
+from psycopg2.extras import Json, execute_values
 
 from config import EMBEDDING_MODEL, GEMINI_API_KEY
 from db import get_connection
-
-# Configure Gemini API
-genai.configure(api_key=GEMINI_API_KEY)
+from embedding_service import embed_text, embed_texts
+from match_cache import bump_index_version
+from resume_dedup import (
+    count_in_batch_duplicates,
+    find_existing_resumes,
+    normalize_email,
+    resume_content_hash,
+)
+from skills_taxonomy import canonical_skills, resolve_skill_ids
+from vector_codec import format_vector, vector_param
 
 
 def embedding_to_literal(vec: List[float]) -> str:
-    return "[" + ",".join(str(x) for x in vec) + "]"
+    return format_vector(vec)
+
+
+def get_experience_years(parsed: Dict[str, Any]):
+    # The parser schema emits total_experience_years; older callers used _yrs.
+    value = parsed.get("total_experience_years")
+    if value is None:
+        value = parsed.get("total_experience_yrs")
+    return value
 
 
 def build_resume_embedding_text(parsed: Dict[str, Any]) -> str:
@@ -25,49 +39,93 @@ def build_resume_embedding_text(parsed: Dict[str, Any]) -> str:
     location = parsed.get("location") or ""
     skills = parsed.get("skills") or []
     skills_csv = ", ".join(skills)
-    exp_years = parsed.get("total_experience_yrs") or 0
+    exp_years = get_experience_years(parsed) or 0
 
     summary = f"{title} with {exp_years} years experience in {skills_csv}".strip()
     return f"{title} | {location} | skills: {skills_csv} | experience: {exp_years} | summary: {summary}"
 
 
 def get_embedding(text: str) -> List[float]:
-    """Generate embedding using Gemini's embedding API."""
+    """Generate embedding using Gemini's embedding API (cached + batched)."""
     if not GEMINI_API_KEY:
         raise RuntimeError("GEMINI_API_KEY is not set")
 
-    # Use Gemini's embedding model
-    result = genai.embed_content(
-        model=f"models/{EMBEDDING_MODEL}",
-        content=text,
-        task_type="retrieval_document"
-    )
-    
-    return result["embedding"]
+    return embed_text(text, task_type="retrieval_document")
 
 
-def save_parsed_resume_and_memory(
+def get_embeddings(texts: List[str]) -> List[List[float]]:
+    """Embed many resume texts; duplicates and cached texts cost no API call."""
+    if not GEMINI_API_KEY:
+        raise RuntimeError("GEMINI_API_KEY is not set")
+
+    return embed_texts(texts, task_type="retrieval_document")
+
+
+_RESUME_INSERT_COLUMNS = """
+    id,
+    candidate_name,
+    email,
+    phone,
+    type,
+    title,
+    text,
+    embedding,
+    metadata,
+    canonical_json,
+    content_hash,
+    skill_ids,
+    created_at,
+    updated_at
+"""
+_RESUME_VALUES_TEMPLATE = "(%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s::integer[],NOW(),NOW())"
+# Dedup hits reuse the existing resume_id, so the same statement updates them
+# in place: content is replaced, created_at and the upload history are kept.
+_RESUME_ON_CONFLICT = """
+ON CONFLICT (id) DO UPDATE SET
+    candidate_name = EXCLUDED.candidate_name,
+    email = COALESCE(EXCLUDED.email, resumes.email),
+    phone = COALESCE(EXCLUDED.phone, resumes.phone),
+    title = EXCLUDED.title,
+    text = EXCLUDED.text,
+    embedding = EXCLUDED.embedding,
+    metadata = EXCLUDED.metadata || jsonb_strip_nulls(jsonb_build_object(
+        -- re-upload bookkeeping written by resume_dedup.record_reuploads
+        'last_uploaded_at', resumes.metadata->'last_uploaded_at',
+        'last_source_url', resumes.metadata->'last_source_url',
+        'last_file_name', resumes.metadata->'last_file_name'
+    )) || jsonb_build_object(
+        'upload_count', COALESCE((resumes.metadata->>'upload_count')::int, 1) + 1
+    ),
+    canonical_json = EXCLUDED.canonical_json,
+    content_hash = EXCLUDED.content_hash,
+    skill_ids = EXCLUDED.skill_ids,
+    updated_at = NOW()
+"""
+
+
+def _build_resume_row(
     parsed_resume: Dict[str, Any],
     raw_text: str,
+    embed_text: str,
+    embedding: List[float],
     source_url: str | None = None,
     file_name: str | None = None,
-) -> str:
+) -> List[Any]:
     """
-    Persist a parsed resume into the resumes table (including its embedding and metadata).
-    Returns the resume_id.
+    Column values for one resumes row, in _RESUME_INSERT_COLUMNS order.
+    skill_ids is left None; upsert_parsed_resumes resolves it in the INSERT's
+    transaction.
     """
     resume_id = str(uuid.uuid4())
     now_iso = datetime.now(timezone.utc).isoformat()
-
-    embed_text = build_resume_embedding_text(parsed_resume)
-    embedding = get_embedding(embed_text)
-    embedding_literal = embedding_to_literal(embedding)
+    # Canonical names (skills_taxonomy); canonical_json keeps the parser's own.
+    skills = canonical_skills(parsed_resume.get("skills"))
 
     resume_metadata = {
         "current_company": parsed_resume.get("current_company"),
         "location": parsed_resume.get("location"),
-        "total_experience_yrs": parsed_resume.get("total_experience_yrs"),
-        "skills": parsed_resume.get("skills") or [],
+        "total_experience_yrs": get_experience_years(parsed_resume),
+        "skills": skills,
         "domain": parsed_resume.get("domain"),
         "education": parsed_resume.get("education"),
         "certifications": parsed_resume.get("certifications"),
@@ -79,44 +137,131 @@ def save_parsed_resume_and_memory(
         "created_at": now_iso,
     }
 
-    # --- Insert RESUME row ---
+    return [
+        resume_id,
+        parsed_resume.get("candidate_name"),
+        parsed_resume.get("email"),
+        parsed_resume.get("phone"),
+        "resume",
+        parsed_resume.get("current_title"),
+        embed_text,
+        vector_param(embedding),
+        Json(resume_metadata),
+        Json(parsed_resume),
+        resume_content_hash(raw_text),
+        None,
+    ]
+
+
+def save_parsed_resume_and_memory(
+    parsed_resume: Dict[str, Any],
+    raw_text: str,
+    source_url: str | None = None,
+    file_name: str | None = None,
+) -> str:
+    """
+    Persist a parsed resume into the resumes table (including its embedding and metadata).
+    Returns the resume_id (an existing one when the resume is a duplicate, see resume_dedup).
+    """
+    item = {
+        "parsed_resume": parsed_resume,
+        "raw_text": raw_text,
+        "source_url": source_url,
+        "file_name": file_name,
+    }
+    return upsert_parsed_resumes([item])[0][0]
+
+
+def save_parsed_resumes(items: List[Dict[str, Any]]) -> List[str]:
+    """
+    Persist many parsed resumes in one multi-row INSERT.
+
+    Each item has: parsed_resume, raw_text, and optionally source_url, file_name,
+    embedding (skips the embedding call when already computed).
+    Returns resume_ids in input order.
+    """
+    return [resume_id for resume_id, _ in upsert_parsed_resumes(items)]
+
+
+def upsert_parsed_resumes(items: List[Dict[str, Any]]) -> List[Tuple[str, str]]:
+    """
+    save_parsed_resumes() with the dedup outcome: (resume_id, action) per item,
+    action being "new", "reparsed", "email" or "near_duplicate" (resume_dedup), or
+    "in_batch" when a later item of the same call replaced it.
+    """
+    if not items:
+        return []
+
+    embed_texts_ = [build_resume_embedding_text(item["parsed_resume"]) for item in items]
+    missing = [i for i, item in enumerate(items) if item.get("embedding") is None]
+    fresh = get_embeddings([embed_texts_[i] for i in missing]) if missing else []
+    embeddings = [item.get("embedding") for item in items]
+    for i, vec in zip(missing, fresh):
+        embeddings[i] = vec
+
+    rows = [
+        _build_resume_row(
+            item["parsed_resume"],
+            item["raw_text"],
+            embed_texts_[i],
+            embeddings[i],
+            item.get("source_url"),
+            item.get("file_name"),
+        )
+        for i, item in enumerate(items)
+    ]
+
+    existing = find_existing_resumes(
+        [(item["parsed_resume"], embeddings[i], resume_content_hash(item["raw_text"])) for i, item in enumerate(items)]
+    )
+    actions = ["new"] * len(rows)
+    for i, match in enumerate(existing):
+        if match:
+            rows[i][0], actions[i] = match
+
+    # One statement cannot touch the same row twice: items that resolve to the
+    # same existing row, or share an email within this call, collapse into
+    # the last one, and the earlier ones report its id.
+    groups: Dict[str, List[int]] = {}
+    for i, item in enumerate(items):
+        email = normalize_email(item["parsed_resume"].get("email"))
+        if existing[i]:
+            key = f"id:{rows[i][0]}"
+        else:
+            key = f"email:{email}" if email else f"row:{i}"
+        groups.setdefault(key, []).append(i)
+    keep: List[int] = []
+    for members in groups.values():
+        winner = members[-1]
+        keep.append(winner)
+        for i in members[:-1]:
+            rows[i][0] = rows[winner][0]
+            actions[i] = "in_batch"
+    keep.sort()
+    count_in_batch_duplicates(len(rows) - len(keep))
+
     conn = get_connection()
     try:
         cur = conn.cursor()
-        cur.execute(
-            """
-            INSERT INTO resumes (
-              id,
-              candidate_name,
-              email,
-              phone,
-              type,
-              title,
-              text,
-              embedding,
-              metadata,
-              canonical_json,
-              created_at,
-              updated_at
-            )
-            VALUES (%s,%s,%s,%s,%s,%s,%s,%s::vector,%s,%s,NOW(),NOW())
-            """,
-            [
-                resume_id,
-                parsed_resume.get("candidate_name"),
-                parsed_resume.get("email"),
-                parsed_resume.get("phone"),
-                "resume",
-                parsed_resume.get("current_title"),
-                embed_text,
-                embedding_literal,
-                Json(resume_metadata),
-                Json(parsed_resume),
-            ],
+        skill_ids = resolve_skill_ids(
+            cur, [canonical_skills(items[i]["parsed_resume"].get("skills")) for i in keep]
+        )
+        for i, ids in zip(keep, skill_ids):
+            rows[i][-1] = ids
+        execute_values(
+            cur,
+            f"INSERT INTO resumes ({_RESUME_INSERT_COLUMNS}) VALUES %s {_RESUME_ON_CONFLICT}",
+            [rows[i] for i in keep],
+            template=_RESUME_VALUES_TEMPLATE,
+            page_size=100,
         )
         conn.commit()
         cur.close()
+    except Exception:
+        conn.rollback()
+        raise
     finally:
         conn.close()
 
-    return resume_id
+    bump_index_version()
+    return [(row[0], action) for row, action in zip(rows, actions)]
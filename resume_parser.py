@@ -1,15 +1,30 @@
 """
 Resume Parser using Google Gemini API.
 
-This module parses resumes using Gemini's structured output capabilities.
+This module parses resumes using Gemini's structured output capabilities
+(JSON mode with RESUME_SCHEMA as the response schema; see structured_output).
+parse_resume_texts packs several short resumes into one prompt for bulk uploads.
+Email and phone found by resume_prefill's regexes are left out of the prompt;
+its heuristic fields (name, headline, years) only fill gaps in the LLM's reply.
+parse_resume_offline stands in when Gemini is unavailable.
 """
-import json
-from typing import Dict, Any
-import google.generativeai as genai
-from config import GEMINI_API_KEY, CHAT_MODEL
+import threading
+from typing import Dict, Any, List, Optional, Sequence, Union
+from config import (
+    CHAT_MODEL,
+    RESUME_BATCH_PARSE_ENABLED,
+    RESUME_BATCH_MAX_DOCS,
+    RESUME_BATCH_MAX_CHARS,
+    RESUME_PARSE_MODE,
+    RESUME_PREFILL_ENABLED,
+    RESUME_OFFLINE_FALLBACK,
+)
+from structured_output import StructuredOutputError, generate_json
+from parse_cache import cached_parse, get_cached_parse, store_parse
+from resume_prefill import RELIABLE_PREFILL_FIELDS, parse_resume_offline, prefill_resume
 
-# Configure Gemini API
-genai.configure(api_key=GEMINI_API_KEY)
+# Bump whenever the prompt or RESUME_SCHEMA changes so cached parses are not reused
+RESUME_PROMPT_VERSION = "4"
 
 # Define the schema for resume parsing
 RESUME_SCHEMA = {
@@ -85,11 +100,39 @@ RESUME_SCHEMA = {
     "required": ["candidate_name"]
 }
 
+RESUME_FIELDS = """- candidate_name: Full name of the candidate
+- email: Email address
+- phone: Phone number
+- current_title: Current or most recent job title
+- location: Current location
+- total_experience_years: Total years of professional experience (as a number)
+- skills: List of technical skills
+- education: Educational background (degree, institution, year)
+- work_experience: Work history (title, company, duration, responsibilities)
+- certifications: Professional certifications
+- summary: Professional summary or objective"""
+
+
+_parse_lock = threading.Lock()
+# Shrinks after a batch reply fails or comes back short (usually truncation), grows back on success.
+_batch_char_budget = float(RESUME_BATCH_MAX_CHARS)
+_parse_stats = {
+    "batches": 0,
+    "batched_docs": 0,
+    "batch_failures": 0,
+    "fallback_docs": 0,
+    "single_docs": 0,
+    "prefilled_fields": 0,
+    "offline": 0,
+}
+
 
 def parse_resume_text(resume_text: str) -> Dict[str, Any]:
     """
     Parse a resume using Gemini's structured output.
     
+    Repeat uploads of the same text are served from the parse cache.
+    
     Args:
         resume_text: Raw resume text
         
@@ -99,68 +142,282 @@ def parse_resume_text(resume_text: str) -> Dict[str, Any]:
     if not resume_text or not resume_text.strip():
         raise ValueError("Resume text cannot be empty")
     
+    if RESUME_PARSE_MODE == "offline":
+        return _parse_offline(resume_text)
+    
+    return cached_parse("resume", resume_text, CHAT_MODEL, RESUME_PROMPT_VERSION, _parse_resume_text_uncached)
+
+
+def _parse_resume_text_uncached(resume_text: str, prefill: bool = True) -> Dict[str, Any]:
+    prefilled = _prefill(resume_text) if prefill else {}
+    fields = [field for field in RESUME_SCHEMA["properties"] if not _is_prefilled(field, prefilled)]
     try:
-        # Create the model
-        model = genai.GenerativeModel(CHAT_MODEL)
-        
-        # Create the prompt
+        # The structure itself is enforced through response_schema, not the prompt
         prompt = f"""You are an expert at parsing resumes. Extract structured information from the following resume.
 
 Resume:
 {resume_text}
 
 Extract the following information:
-- candidate_name: Full name of the candidate
-- email: Email address
-- phone: Phone number
-- current_title: Current or most recent job title
-- location: Current location
-- total_experience_years: Total years of professional experience (as a number)
-- skills: List of technical skills
-- education: Educational background (degree, institution, year)
-- work_experience: Work history (title, company, duration, responsibilities)
-- certifications: Professional certifications
-- summary: Professional summary or objective
+{_field_guide(fields)}
 
-Return the information as a JSON object matching this structure:
-{json.dumps(RESUME_SCHEMA, indent=2)}
+Return the information as a JSON object.
 
 If any field is not mentioned in the resume, omit it or use null/empty array as appropriate."""
 
-        # Generate content
-        response = model.generate_content(prompt)
-        
-        # Extract the response text
-        response_text = response.text.strip()
-        
-        # Try to parse JSON from the response
-        # Gemini might wrap it in markdown code blocks
-        if response_text.startswith("```json"):
-            response_text = response_text[7:]  # Remove ```json
-        if response_text.startswith("```"):
-            response_text = response_text[3:]  # Remove ```
-        if response_text.endswith("```"):
-            response_text = response_text[:-3]  # Remove trailing ```
-        
-        response_text = response_text.strip()
-        
-        # Parse the JSON
-        parsed_resume = json.loads(response_text)
+        parsed_resume = generate_json(prompt, _object_schema(fields))
         
-        # Ensure required fields exist
-        if "candidate_name" not in parsed_resume or not parsed_resume["candidate_name"]:
-            parsed_resume["candidate_name"] = "Unknown Candidate"
-            
-        return parsed_resume
+        return _ensure_required_fields(_merge_prefill(parsed_resume, prefilled))
         
-    except json.JSONDecodeError as e:
-        # If JSON parsing fails, return a minimal structure
+    except StructuredOutputError as e:
+        # If no usable JSON came back even after repair, fall back to the rules
         print(f"JSON parsing error: {e}")
-        print(f"Response text: {response_text}")
+        if RESUME_OFFLINE_FALLBACK:
+            return _parse_offline(resume_text)
         return {
             "candidate_name": "Unknown Candidate",
             "error": f"Failed to parse resume: {str(e)}"
         }
     except Exception as e:
         print(f"Error parsing resume: {e}")
+        if RESUME_OFFLINE_FALLBACK:
+            return _parse_offline(resume_text)
         raise RuntimeError(f"Failed to parse resume: {str(e)}")
+
+
+def _prefill(resume_text: str) -> Dict[str, Any]:
+    if not RESUME_PREFILL_ENABLED:
+        return {}
+    prefilled = prefill_resume(resume_text)
+    _bump_parse("prefilled_fields", len(prefilled))
+    return prefilled
+
+
+def _is_prefilled(field: str, prefilled: Dict[str, Any]) -> bool:
+    """Whether the LLM can be spared `field`: only for the regex-reliable ones."""
+    return field in RELIABLE_PREFILL_FIELDS and field in prefilled
+
+
+def _merge_prefill(parsed: Dict[str, Any], prefilled: Dict[str, Any]) -> Dict[str, Any]:
+    """The LLM's values win; prefilled values fill the fields it left empty."""
+    merged = dict(parsed)
+    for field, value in prefilled.items():
+        if merged.get(field) in (None, "", []):
+            merged[field] = value
+    return merged
+
+
+def _parse_offline(resume_text: str) -> Dict[str, Any]:
+    # Degraded parse; parse_cache never stores these and resume_dedup skips them in
+    # its content-hash check, so a later upload re-parses and replaces the row.
+    _bump_parse("offline")
+    return parse_resume_offline(resume_text)
+
+
+def _field_guide(fields: Sequence[str]) -> str:
+    """The RESUME_FIELDS lines for `fields`."""
+    wanted = set(fields)
+    return "\n".join(line for line in RESUME_FIELDS.splitlines() if line[2:].split(":")[0] in wanted)
+
+
+def _object_schema(fields: Sequence[str]) -> Dict[str, Any]:
+    """RESUME_SCHEMA narrowed to `fields`."""
+    return {
+        "type": "object",
+        "properties": {field: RESUME_SCHEMA["properties"][field] for field in fields},
+        "required": [field for field in RESUME_SCHEMA["required"] if field in fields],
+    }
+
+
+def _batch_schema(fields: Sequence[str]) -> Dict[str, Any]:
+    # One array item per delimited resume, tagged with its number.
+    item = _object_schema(fields)
+    item["properties"] = {
+        "document": {"type": "integer", "description": "Number of the resume this object describes"},
+        **item["properties"],
+    }
+    item["required"] = ["document", *item["required"]]
+    return {"type": "array", "items": item}
+
+
+def _ensure_required_fields(parsed_resume: Dict[str, Any]) -> Dict[str, Any]:
+    if "candidate_name" not in parsed_resume or not parsed_resume["candidate_name"]:
+        parsed_resume["candidate_name"] = "Unknown Candidate"
+    return parsed_resume
+
+
+def _bump_parse(counter: str, n: int = 1):
+    with _parse_lock:
+        _parse_stats[counter] += n
+
+
+def _adjust_batch_budget(success: bool):
+    global _batch_char_budget
+    with _parse_lock:
+        if success:
+            _batch_char_budget = min(float(RESUME_BATCH_MAX_CHARS), _batch_char_budget * 1.25)
+        else:
+            _batch_char_budget = max(RESUME_BATCH_MAX_CHARS / 8, _batch_char_budget / 2)
+
+
+class ResumeBatchPacker:
+    """
+    Greedy packing of resume texts into batched parse prompts: up to
+    RESUME_BATCH_MAX_DOCS texts and the current character budget per batch.
+    A resume longer than half the budget is parsed on its own.
+    """
+
+    def __init__(self):
+        with _parse_lock:
+            self.max_chars = int(_batch_char_budget)
+        self.max_docs = RESUME_BATCH_MAX_DOCS if RESUME_BATCH_PARSE_ENABLED else 1
+        self._keys: List[Any] = []
+        self._chars = 0
+
+    def add(self, key: Any, text: str) -> List[List[Any]]:
+        """Queue `key`; returns the batches (lists of keys) completed by adding it."""
+        if self.max_docs <= 1 or len(text) > self.max_chars // 2:
+            return [[key]]
+        ready = []
+        if self._keys and (len(self._keys) >= self.max_docs or self._chars + len(text) > self.max_chars):
+            ready.append(self.flush())
+        self._keys.append(key)
+        self._chars += len(text)
+        return ready
+
+    def flush(self) -> List[Any]:
+        keys, self._keys, self._chars = self._keys, [], 0
+        return keys
+
+
+def _build_batch_prompt(resume_texts: Sequence[str], fields: Sequence[str]) -> str:
+    documents = "\n\n".join(
+        f"<<<RESUME {i}>>>\n{text}\n<<<END RESUME {i}>>>" for i, text in enumerate(resume_texts, 1)
+    )
+    return f"""You are an expert at parsing resumes. Below are {len(resume_texts)} separate resumes, each between <<<RESUME n>>> and <<<END RESUME n>>> markers. Parse each one independently and never mix details between resumes.
+
+{documents}
+
+For each resume extract:
+{_field_guide(fields)}
+
+Return a JSON array with exactly {len(resume_texts)} objects, in resume order, each with "document" set to the resume's number n.
+
+If any field is not mentioned in a resume, omit it or use null/empty array as appropriate."""
+
+
+def _belongs_to(parsed: Dict[str, Any], resume_text: str) -> bool:
+    # Guards against the model attributing one resume's details to another.
+    email = str(parsed.get("email") or "").strip().lower()
+    return not email or email in resume_text.lower()
+
+
+def _parse_batch(resume_texts: Sequence[str]) -> List[Optional[Dict[str, Any]]]:
+    """
+    One LLM call for several resumes. Returns a parse per input, or None where
+    the reply had no usable object for that resume.
+    """
+    _bump_parse("batches")
+    _bump_parse("batched_docs", len(resume_texts))
+    prefilled = [_prefill(text) for text in resume_texts]
+    # Ask for every field some resume in the batch still lacks; email always,
+    # since _belongs_to checks it.
+    fields = [
+        field for field in RESUME_SCHEMA["properties"]
+        if field == "email" or any(not _is_prefilled(field, p) for p in prefilled)
+    ]
+    try:
+        # No re-call here: resumes the reply misses fall back to single parses.
+        # A truncated array is repaired down to its complete items.
+        reply = generate_json(_build_batch_prompt(resume_texts, fields), _batch_schema(fields), max_recalls=0)
+    except Exception as e:
+        print(f"Batched resume parse failed for {len(resume_texts)} resumes: {e}")
+        _bump_parse("batch_failures")
+        _adjust_batch_budget(success=False)
+        return [None] * len(resume_texts)
+
+    results: List[Optional[Dict[str, Any]]] = [None] * len(resume_texts)
+    seen = set()
+    for obj in reply:
+        if not isinstance(obj, dict):
+            continue
+        try:
+            pos = int(obj.pop("document")) - 1
+        except (KeyError, TypeError, ValueError):
+            continue
+        if not 0 <= pos < len(resume_texts):
+            continue
+        if pos in seen:
+            results[pos] = None  # claimed twice: parse that resume on its own
+            continue
+        seen.add(pos)
+        if _belongs_to(obj, resume_texts[pos]):
+            results[pos] = _ensure_required_fields(_merge_prefill(obj, prefilled[pos]))
+    # Fewer items than resumes usually means the reply hit the output limit.
+    _adjust_batch_budget(success=len(seen) == len(resume_texts))
+    return results
+
+
+def parse_resume_texts(
+    resume_texts: Sequence[str],
+    *,
+    return_exceptions: bool = False,
+) -> List[Union[Dict[str, Any], Exception]]:
+    """
+    Parse several resumes, packing short ones into shared prompts.
+
+    Cached parses are served first; the rest go through batched calls
+    (ResumeBatchPacker). Any resume a batch reply does not cover cleanly
+    falls back to parse_resume_text. Results keep input order. With
+    return_exceptions=True a failed resume yields its exception instead of
+    raising, so one bad document does not sink the others.
+    """
+    results: List[Any] = [None] * len(resume_texts)
+    packer = ResumeBatchPacker()
+    batches: List[List[int]] = []
+    for i, text in enumerate(resume_texts):
+        if not text or not text.strip():
+            results[i] = ValueError("Resume text cannot be empty")
+            continue
+        if RESUME_PARSE_MODE == "offline":
+            results[i] = _parse_offline(text)
+            continue
+        cached = get_cached_parse("resume", text, CHAT_MODEL, RESUME_PROMPT_VERSION)
+        if cached is not None:
+            results[i] = cached
+            continue
+        batches.extend(packer.add(i, text))
+    batches.append(packer.flush())
+
+    for batch in batches:
+        if len(batch) > 1:
+            for i, parsed in zip(batch, _parse_batch([resume_texts[i] for i in batch])):
+                if parsed is not None:
+                    results[i] = parsed
+                    store_parse("resume", resume_texts[i], CHAT_MODEL, RESUME_PROMPT_VERSION, parsed)
+        for i in batch:
+            if results[i] is not None:
+                continue
+            _bump_parse("single_docs" if len(batch) == 1 else "fallback_docs")
+            try:
+                results[i] = parse_resume_text(resume_texts[i])
+            except Exception as e:
+                results[i] = e
+
+    if not return_exceptions:
+        for result in results:
+            if isinstance(result, Exception):
+                raise result
+    return results
+
+
+def get_resume_parse_stats() -> Dict[str, Any]:
+    with _parse_lock:
+        stats = dict(_parse_stats)
+        stats["char_budget"] = int(_batch_char_budget)
+    stats["mode"] = RESUME_PARSE_MODE
+    stats["enabled"] = RESUME_BATCH_PARSE_ENABLED
+    stats["max_docs"] = RESUME_BATCH_MAX_DOCS
+    # LLM calls avoided versus one call per resume
+    stats["calls_saved"] = max(0, stats["batched_docs"] - stats["batches"] - stats["fallback_docs"])
+    return stats
@@ -0,0 +1,244 @@
+"""
+Staged, concurrent ingestion for bulk resume uploads.
+
+    extract (pdf_extraction process pool) -> parse (bounded thread pool) -> embed (batched) -> insert (multi-row)
+
+Extracted texts are packed into batched parse prompts (several short resumes
+per LLM call, see resume_parser.ResumeBatchPacker); a batch is dispatched as
+soon as it is full, so parsing starts before the whole upload has been extracted. Files whose
+text was already ingested (or repeats an earlier file of the same upload)
+skip parse/embed/insert entirely; see resume_dedup. The
+parse pool is shared by all requests in the process, so RESUME_PIPELINE_PARSE_CONCURRENCY
+caps concurrent Gemini calls regardless of how many uploads are running.
+"""
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any, Dict, List, Optional, Tuple
+
+from config import PDF_EXTRACT_WORKERS, RESUME_PIPELINE_PARSE_CONCURRENCY
+from pdf_extraction import extract_pdf_text_pooled
+from resume_parser import ResumeBatchPacker, parse_resume_texts
+from resume_dedup import (
+    count_in_batch_duplicates,
+    find_by_content_hash,
+    record_reuploads,
+    resume_content_hash,
+    summarize_dedup,
+)
+from resume_memory import build_resume_embedding_text, get_embeddings, upsert_parsed_resumes
+
+_parse_executor: Optional[ThreadPoolExecutor] = None
+_parse_executor_pid: Optional[int] = None
+_parse_executor_lock = threading.Lock()
+
+
+def _get_parse_executor() -> ThreadPoolExecutor:
+    global _parse_executor, _parse_executor_pid
+    with _parse_executor_lock:
+        # Executor threads do not survive fork(); rebuild in each worker process.
+        if _parse_executor is None or _parse_executor_pid != os.getpid():
+            _parse_executor = ThreadPoolExecutor(
+                max_workers=RESUME_PIPELINE_PARSE_CONCURRENCY,
+                thread_name_prefix="resume-parse",
+            )
+            _parse_executor_pid = os.getpid()
+        return _parse_executor
+
+
+def _elapsed_ms(start: float) -> float:
+    return round((time.perf_counter() - start) * 1000, 1)
+
+
+def _extract_and_check(contents: bytes) -> Tuple[str, str, Optional[Tuple[str, Dict[str, Any]]]]:
+    """Runs on a dispatch thread: extracted text, its content hash, and the existing row if any."""
+    raw_text = (extract_pdf_text_pooled(contents) or "").strip()
+    if not raw_text:
+        return raw_text, "", None
+    content_hash = resume_content_hash(raw_text)
+    return raw_text, content_hash, find_by_content_hash([content_hash]).get(content_hash)
+
+
+def _timed_parse(raw_texts: List[str]) -> Tuple[List[Any], float]:
+    # Per-resume failures come back as exception objects (return_exceptions).
+    start = time.perf_counter()
+    parsed = parse_resume_texts(raw_texts, return_exceptions=True)
+    return parsed, _elapsed_ms(start)
+
+
+def ingest_resume_files(
+    files: List[Tuple[str, bytes]],
+    source_url: Optional[str] = None,
+) -> Dict[str, Any]:
+    """
+    Ingest (file_name, pdf_bytes) pairs.
+
+    Returns {"count", "items", "timings"} where items keeps input order and the
+    per-file shape the upload UI expects (file_name/status/resume_id/... or reason).
+    """
+    started = time.perf_counter()
+    items: List[Optional[Dict[str, Any]]] = [None] * len(files)
+    timings: Dict[str, float] = {}
+
+    pending: List[int] = []
+    for idx, (filename, contents) in enumerate(files):
+        if not filename.lower().endswith(".pdf"):
+            items[idx] = {"file_name": filename, "status": "skipped", "reason": "not a PDF"}
+        elif not contents:
+            items[idx] = {"file_name": filename, "status": "error", "reason": "empty file"}
+        else:
+            pending.append(idx)
+
+    def _fail(idx: int, reason: str):
+        items[idx] = {"file_name": files[idx][0], "status": "error", "reason": reason}
+
+    texts: Dict[int, str] = {}
+    parsed: Dict[int, Dict[str, Any]] = {}
+    parse_ms: Dict[int, float] = {}
+    # Dedup short-circuits: already-ingested text, and repeats within this upload.
+    exact: Dict[int, Tuple[str, Dict[str, Any]]] = {}
+    first_with_hash: Dict[str, int] = {}
+    same_as: Dict[int, int] = {}
+
+    if pending:
+        # --- Stage 1+2: extraction feeding parse ---
+        stage_start = time.perf_counter()
+        parse_pool = _get_parse_executor()
+        # Dispatcher threads only wait on the extraction process pool (and serve cache hits).
+        dispatch_pool = ThreadPoolExecutor(
+            max_workers=min(len(pending), PDF_EXTRACT_WORKERS * 2),
+            thread_name_prefix="resume-extract",
+        )
+
+        extract_futures = {dispatch_pool.submit(_extract_and_check, files[idx][1]): idx for idx in pending}
+        parse_futures = {}
+        packer = ResumeBatchPacker()
+
+        def _submit(batch: List[int]):
+            if batch:
+                parse_futures[parse_pool.submit(_timed_parse, [texts[i] for i in batch])] = batch
+
+        for fut in as_completed(extract_futures):
+            idx = extract_futures[fut]
+            try:
+                raw_text, content_hash, existing = fut.result()
+            except Exception as e:
+                _fail(idx, f"PDF extraction failed: {e}")
+                continue
+
+            if not raw_text:
+                _fail(idx, "no text extracted")
+                continue
+            if existing:
+                exact[idx] = existing
+                continue
+            if content_hash in first_with_hash:
+                same_as[idx] = first_with_hash[content_hash]
+                continue
+            first_with_hash[content_hash] = idx
+            texts[idx] = raw_text
+            for batch in packer.add(idx, raw_text):
+                _submit(batch)
+        _submit(packer.flush())
+        dispatch_pool.shutdown(wait=False)
+        timings["extract_ms"] = _elapsed_ms(stage_start)
+
+        parse_start = time.perf_counter()
+        for fut in as_completed(parse_futures):
+            batch = parse_futures[fut]
+            try:
+                results, elapsed = fut.result()
+            except Exception as e:
+                results, elapsed = [e] * len(batch), None
+            for idx, result in zip(batch, results):
+                if isinstance(result, Exception):
+                    _fail(idx, str(result))
+                else:
+                    parsed[idx], parse_ms[idx] = result, elapsed
+        timings["parse_ms"] = _elapsed_ms(parse_start)
+
+    ready = [idx for idx in pending if idx in parsed]
+
+    # --- Stage 3: embeddings, one batched call set for the whole upload ---
+    embeddings: Dict[int, List[float]] = {}
+    if ready:
+        stage_start = time.perf_counter()
+        try:
+            vectors = get_embeddings([build_resume_embedding_text(parsed[idx]) for idx in ready])
+            embeddings = dict(zip(ready, vectors))
+        except Exception as e:
+            for idx in ready:
+                _fail(idx, f"embedding failed: {e}")
+            ready = []
+        timings["embed_ms"] = _elapsed_ms(stage_start)
+
+    # --- Stage 4: batched DB insert, per-row fallback so one bad row doesn't sink the batch ---
+    if ready:
+        stage_start = time.perf_counter()
+        records = [
+            {
+                "parsed_resume": parsed[idx],
+                "raw_text": texts[idx],
+                "source_url": source_url or files[idx][0],
+                "file_name": files[idx][0],
+                "embedding": embeddings[idx],
+            }
+            for idx in ready
+        ]
+        try:
+            saved = dict(zip(ready, upsert_parsed_resumes(records)))
+        except Exception:
+            saved = {}
+            for idx, record in zip(ready, records):
+                try:
+                    saved[idx] = upsert_parsed_resumes([record])[0]
+                except Exception as e:
+                    _fail(idx, str(e))
+        timings["db_ms"] = _elapsed_ms(stage_start)
+
+        for idx, (resume_id, action) in saved.items():
+            items[idx] = {
+                "file_name": files[idx][0],
+                "status": "ok",
+                "resume_id": resume_id,
+                "candidate_name": parsed[idx].get("candidate_name"),
+                "current_title": parsed[idx].get("current_title"),
+                # "offline": the rule-based fallback parsed it; re-upload once the LLM is back.
+                "parse_mode": parsed[idx].get("parse_mode") or "llm",
+                "parse_ms": parse_ms.get(idx),
+            }
+            if action != "new":
+                items[idx]["dedup"] = action
+
+    for idx, (resume_id, resume) in exact.items():
+        items[idx] = _duplicate_item(files[idx][0], resume_id, resume, "exact")
+    record_reuploads(
+        [(resume_id, source_url or files[idx][0], files[idx][0]) for idx, (resume_id, _) in exact.items()]
+    )
+    for idx, first in same_as.items():
+        leader = items[first] or {}
+        if leader.get("resume_id"):
+            items[idx] = _duplicate_item(files[idx][0], leader["resume_id"], parsed.get(first, {}), "in_batch")
+        else:
+            _fail(idx, leader.get("reason") or "duplicate of a file that failed")
+    count_in_batch_duplicates(len(same_as))
+
+    timings["total_ms"] = _elapsed_ms(started)
+    return {
+        "count": len(items),
+        "items": items,
+        "timings": timings,
+        "dedup": summarize_dedup(items),
+    }
+
+
+def _duplicate_item(file_name: str, resume_id: str, resume: Dict[str, Any], action: str) -> Dict[str, Any]:
+    return {
+        "file_name": file_name,
+        "status": "duplicate",
+        "resume_id": resume_id,
+        "candidate_name": resume.get("candidate_name"),
+        "current_title": resume.get("current_title"),
+        "dedup": action,
+    }
@@ -0,0 +1,220 @@
+"""
+Rule-based resume field extraction that runs before (or instead of) the LLM.
+
+prefill_resume() pulls fields extractable from the text itself: email and
+phone (pii regexes), the name and headline title from the top lines, and an
+explicit "N years of experience". Only the regex fields (RELIABLE_PREFILL_FIELDS)
+are left out of the LLM prompt; for the heuristic ones the LLM's value wins
+and the prefill only fills gaps.
+
+parse_resume_offline() adds section heuristics and the skills dictionary and
+returns a full, degraded parse ("parse_mode": "offline"). It is used when
+Gemini is unavailable or RESUME_PARSE_MODE=offline.
+"""
+import re
+from typing import Any, Dict, List, Optional
+
+from pii import EMAIL_REGEX, PHONE_REGEX
+from skills_taxonomy import AMBIGUOUS_ALIASES, SKILL_ALIASES
+
+# Fields prefill_resume may fill.
+PREFILL_FIELDS = ("candidate_name", "email", "phone", "current_title", "total_experience_years")
+# The subset trusted over the LLM, so resume_parser does not ask for them.
+RELIABLE_PREFILL_FIELDS = ("email", "phone")
+
+_SECTION_HEADERS = {
+    "summary": ("summary", "professional summary", "profile", "objective", "about me", "career objective"),
+    "skills": ("skills", "technical skills", "core skills", "key skills", "technologies", "tech stack"),
+    "experience": ("experience", "work experience", "professional experience", "employment", "employment history", "work history"),
+    "education": ("education", "academic background", "qualifications"),
+    "certifications": ("certifications", "certificates", "licenses & certifications", "licenses and certifications"),
+    "projects": ("projects", "personal projects", "key projects"),
+}
+_HEADER_TO_SECTION = {h: section for section, headers in _SECTION_HEADERS.items() for h in headers}
+
+_TITLE_WORDS = re.compile(
+    r"\b(engineer|developer|programmer|architect|scientist|analyst|manager|consultant|designer|"
+    r"administrator|specialist|lead|director|intern|officer|devops|sre|tester|qa|head|vp|"
+    r"president|founder|recruiter|accountant|executive|associate|researcher|technician)\b",
+    re.IGNORECASE,
+)
+_DEGREE_WORDS = re.compile(
+    r"\b(bachelor|master|ph\.?d|doctorate|b\.?\s?tech|m\.?\s?tech|b\.?e\b|b\.?sc?|m\.?sc?|mba|b\.?a\b|m\.?a\b|diploma|associate degree)",
+    re.IGNORECASE,
+)
+_YEAR_RE = re.compile(r"\b(19|20)\d{2}\b")
+_EXPERIENCE_RE = re.compile(
+    r"(\d{1,2}(?:\.\d)?)\s*\+?\s*(?:years?|yrs?)(?:\s+of)?(?:\s+(?:professional|industry|total|hands-on|work))?\s+experience",
+    re.IGNORECASE,
+)
+# Contact lines like "Jane Doe | Data Engineer | jane@x.com"
+_HEADER_SEPARATOR_RE = re.compile(r"\s[|•·]\s|\t")
+# pii.PHONE_REGEX plus the "(415) 555-0199" / "415.555.0199" styles.
+_PHONE_RE = re.compile(r"\+?\d?[\d\s().-]{8,}\d")
+_YEARS_ONLY_RE = re.compile(r"(?:(?:19|20)\d{2}[\s\-–]*)+")
+# "01.2015", "3/2018" and "2015 - 03.2018": employment dates, not phone numbers.
+_DATE_LIKE_RE = re.compile(
+    r"(?<!\d)(?:0?[1-9]|1[0-2])[./](?:19|20)\d{2}(?!\d)"
+    r"|(?<!\d)(?:19|20)\d{2}\s*[-–]\s*(?:(?:0?[1-9]|1[0-2])[./])?(?:19|20)\d{2}(?!\d)"
+)
+_NAME_TOKEN_RE = re.compile(r"^[A-Za-z][A-Za-z.'\-]*$")
+_NOT_A_NAME = {
+    "resume", "curriculum", "vitae", "cv", "profile", "contact", "page", "personal", "details",
+    "information", "info", "address", "summary", "objective", "declaration", "biodata", "bio", "data",
+}
+
+
+
+def _alias_pattern(aliases: List[str]) -> Optional["re.Pattern[str]"]:
+    if not aliases:
+        return None
+    return re.compile(
+        r"(?<![\w.+#/-])(?:" + "|".join(re.escape(a) for a in sorted(aliases, key=len, reverse=True)) + r")(?![\w+#/-])",
+        re.IGNORECASE,
+    )
+
+
+# canonical -> (pattern over all aliases, pattern without AMBIGUOUS_ALIASES)
+_SKILL_PATTERNS = [
+    (canonical, _alias_pattern(aliases), _alias_pattern([a for a in aliases if a not in AMBIGUOUS_ALIASES]))
+    for canonical, aliases in SKILL_ALIASES.items()
+]
+
+
+def _lines(text: str) -> List[str]:
+    return [line.strip() for line in (text or "").splitlines() if line.strip()]
+
+
+def _section_of(line: str) -> Optional[str]:
+    header = line.strip().rstrip(":").strip().lower()
+    return _HEADER_TO_SECTION.get(header) if len(header) <= 40 else None
+
+
+def split_sections(text: str) -> Dict[str, List[str]]:
+    """Lines grouped under known section headers; lines before any header go to "header"."""
+    sections: Dict[str, List[str]] = {"header": []}
+    current = "header"
+    for line in _lines(text):
+        section = _section_of(line)
+        if section:
+            current = section
+            sections.setdefault(current, [])
+            continue
+        sections.setdefault(current, []).append(line)
+    return sections
+
+
+def extract_email(text: str) -> Optional[str]:
+    match = EMAIL_REGEX.search(text or "")
+    return match.group(0).lower() if match else None
+
+
+def extract_phone(text: str) -> Optional[str]:
+    for regex in (PHONE_REGEX, _PHONE_RE):
+        for match in regex.finditer(text or ""):
+            digits = re.sub(r"\D", "", match.group(0))
+            candidate = match.group(0).strip()
+            # 10-15 digits and not a run of dates ("2015 - 2018", "01.2015 - 03.2018")
+            if not 10 <= len(digits) <= 15 or _YEARS_ONLY_RE.fullmatch(candidate) or _DATE_LIKE_RE.search(candidate):
+                continue
+            return candidate
+    return None
+
+
+def _looks_like_name(line: str) -> bool:
+    if "@" in line or any(ch.isdigit() for ch in line) or _section_of(line):
+        return False
+    tokens = line.replace(",", " ").split()
+    if not 2 <= len(tokens) <= 4 or not all(_NAME_TOKEN_RE.match(t) for t in tokens):
+        return False
+    if any(t.lower().strip(".") in _NOT_A_NAME for t in tokens) or _TITLE_WORDS.search(line):
+        return False
+    return all(t[0].isupper() for t in tokens)
+
+
+def extract_name(header_lines: List[str]) -> Optional[str]:
+    for line in header_lines[:5]:
+        # "Jane Doe | jane@x.com | 555..." -> first segment
+        candidate = _HEADER_SEPARATOR_RE.split(line)[0].strip()
+        if _looks_like_name(candidate):
+            return candidate.title() if candidate.isupper() else candidate
+    return None
+
+
+def extract_title(header_lines: List[str], name: Optional[str]) -> Optional[str]:
+    for line in header_lines[:6]:
+        for segment in _HEADER_SEPARATOR_RE.split(line):
+            segment = segment.strip()
+            if segment == name or "@" in segment or any(ch.isdigit() for ch in segment):
+                continue
+            if len(segment.split()) <= 8 and _TITLE_WORDS.search(segment):
+                return segment
+    return None
+
+
+def extract_experience_years(text: str) -> Optional[float]:
+    match = _EXPERIENCE_RE.search(text or "")
+    if not match:
+        return None
+    years = float(match.group(1))
+    return int(years) if years.is_integer() else years
+
+
+def extract_skills(text: str, *, skills_section: bool = False) -> List[str]:
+    """
+    Dictionary skills in order of first mention. Aliases that are also
+    ordinary words ("react", "swift") only count when `text` is a Skills section.
+    """
+    found = []
+    for canonical, all_aliases, unambiguous in _SKILL_PATTERNS:
+        pattern = all_aliases if skills_section else unambiguous
+        if pattern is None:
+            continue
+        match = pattern.search(text or "")
+        if match:
+            found.append((match.start(), canonical))
+    return [canonical for _, canonical in sorted(found)]
+
+
+def prefill_resume(text: str) -> Dict[str, Any]:
+    """The PREFILL_FIELDS found in `text`; missing fields are simply absent."""
+    header = split_sections(text)["header"]
+    name = extract_name(header)
+    fields = {
+        "candidate_name": name,
+        "email": extract_email(text),
+        "phone": extract_phone(text),
+        "current_title": extract_title(header, name),
+        "total_experience_years": extract_experience_years(text),
+    }
+    return {key: value for key, value in fields.items() if value is not None}
+
+
+def _education(lines: List[str]) -> List[Dict[str, Any]]:
+    entries = []
+    for line in lines:
+        if not _DEGREE_WORDS.search(line):
+            continue
+        years = [m.group(0) for m in _YEAR_RE.finditer(line)]
+        entries.append({"degree": line, "institution": None, "year": years[-1] if years else None})
+    return entries
+
+
+def parse_resume_offline(text: str) -> Dict[str, Any]:
+    """Degraded full parse from rules only (no LLM)."""
+    sections = split_sections(text)
+    parsed: Dict[str, Any] = prefill_resume(text)
+    parsed.setdefault("candidate_name", "Unknown Candidate")
+
+    skills_lines = sections.get("skills", [])
+    parsed["skills"] = extract_skills("\n".join(skills_lines), skills_section=True) if skills_lines else []
+    if not parsed["skills"]:
+        parsed["skills"] = extract_skills(text)
+    parsed["education"] = _education(sections.get("education", []))
+    parsed["certifications"] = sections.get("certifications", [])[:20]
+    parsed["work_experience"] = []
+    summary = " ".join(sections.get("summary", [])[:5])
+    if summary:
+        parsed["summary"] = summary
+    parsed["parse_mode"] = "offline"
+    return parsed
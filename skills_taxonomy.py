@@ -0,0 +1,260 @@
+"""
+Skills taxonomy: free-text skills ("Py", "python3", "Python 3.10") mapped to
+one canonical name and a stable integer id.
+
+Ids live in the skills table (key = lower-cased canonical name). At ingest,
+resumes.skill_ids gets the resume's skill ids (GIN-indexed int[]) and JD
+memories get primary_skill_ids / secondary_skill_ids in metadata, so
+"has all of {Python, Spark, Airflow}" is one GIN containment lookup
+(ranking.build_resume_filter_sql) instead of a scan over JSONB text.
+
+SKILL_ALIASES is the synonym map; skills it does not know keep their own
+(whitespace-normalized) name and still get an id.
+"""
+import json
+import re
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+from psycopg2.extras import execute_values
+
+# Canonical skill -> aliases. Also the dictionary resume_prefill matches in
+# free text (case-insensitively, on token boundaries), hence: words too common
+# to list at all ("rest", "excel", "spring") only appear in unambiguous forms,
+# and the ones listed bare that are also ordinary words are AMBIGUOUS_ALIASES.
+SKILL_ALIASES: Dict[str, List[str]] = {
+    "Python": ["python", "python3", "py"],
+    "Java": ["java"],
+    "JavaScript": ["javascript", "js", "ecmascript"],
+    "TypeScript": ["typescript", "ts"],
+    "Go": ["golang"],
+    "C++": ["c++", "cpp"],
+    "C#": ["c#", "csharp"],
+    "Ruby": ["ruby", "ruby on rails"],
+    "Rust": ["rust", "rustlang"],
+    "Scala": ["scala"],
+    "Kotlin": ["kotlin"],
+    "Swift": ["swift", "swiftlang"],
+    "PHP": ["php"],
+    "SQL": ["sql"],
+    "PostgreSQL": ["postgresql", "postgres"],
+    "MySQL": ["mysql"],
+    "MongoDB": ["mongodb", "mongo"],
+    "Redis": ["redis"],
+    "Elasticsearch": ["elasticsearch", "elastic search"],
+    "Cassandra": ["cassandra"],
+    "Snowflake": ["snowflake"],
+    "BigQuery": ["bigquery"],
+    "Spark": ["spark", "apache spark", "pyspark"],
+    "Hadoop": ["hadoop"],
+    "Kafka": ["kafka", "apache kafka"],
+    "Airflow": ["airflow", "apache airflow"],
+    "dbt": ["dbt"],
+    "Pandas": ["pandas"],
+    "NumPy": ["numpy"],
+    "scikit-learn": ["scikit-learn", "sklearn", "scikit learn"],
+    "TensorFlow": ["tensorflow"],
+    "PyTorch": ["pytorch", "torch"],
+    "Machine Learning": ["machine learning", "ml"],
+    "Deep Learning": ["deep learning"],
+    "NLP": ["nlp", "natural language processing"],
+    "Computer Vision": ["computer vision"],
+    "LLM": ["llm", "llms", "large language models"],
+    "React": ["react", "react.js", "reactjs"],
+    "Angular": ["angular", "angularjs"],
+    "Vue": ["vue", "vue.js", "vuejs"],
+    "Node.js": ["node.js", "nodejs"],
+    "Django": ["django"],
+    "Flask": ["flask"],
+    "FastAPI": ["fastapi"],
+    "Spring": ["spring boot", "springboot", "spring framework"],
+    ".NET": [".net", "dotnet", "asp.net"],
+    "HTML": ["html", "html5"],
+    "CSS": ["css", "css3"],
+    "GraphQL": ["graphql"],
+    "REST APIs": ["restful", "rest api", "rest apis"],
+    "AWS": ["aws", "amazon web services"],
+    "Azure": ["azure", "microsoft azure"],
+    "GCP": ["gcp", "google cloud", "google cloud platform"],
+    "Docker": ["docker"],
+    "Kubernetes": ["kubernetes", "k8s"],
+    "Terraform": ["terraform"],
+    "Ansible": ["ansible"],
+    "Jenkins": ["jenkins"],
+    "CI/CD": ["ci/cd", "cicd"],
+    "Git": ["git", "github", "gitlab"],
+    "Linux": ["linux", "unix"],
+    "Tableau": ["tableau"],
+    "Power BI": ["power bi", "powerbi"],
+    "Excel": ["ms excel", "microsoft excel"],
+    "Figma": ["figma"],
+    "Agile": ["agile", "scrum"],
+}
+
+# Aliases that are also everyday words ("react quickly", "swift turnaround").
+# canonical_skill still maps them (its input is already a skill-list item),
+# but resume_prefill only matches them inside a Skills section.
+AMBIGUOUS_ALIASES = frozenset({
+    "react", "swift", "rust", "spark", "ruby", "flask", "agile", "scala", "java",
+    "torch", "snowflake", "cassandra", "pandas", "angular", "tableau", "jenkins",
+    "airflow", "ml", "ts", "py",
+})
+
+_ALIAS_TO_CANONICAL: Dict[str, str] = {
+    alias: canonical
+    for canonical, aliases in SKILL_ALIASES.items()
+    for alias in (canonical.lower(), *aliases)
+}
+# "Python 3.10", "Angular 15", "java8"; only stripped when the rest is a known skill.
+_VERSION_SUFFIX_RE = re.compile(r"(?<=[a-z+#])\s*v?\d+(?:\.\d+)*$")
+# "node-js", "Node JS", "scikit_learn"
+_SEPARATOR_RE = re.compile(r"[\s\-_/]+")
+_MAX_SKILL_CHARS = 60
+
+# key -> id for skills read back from the table (committed, so ids are final).
+_ids_lock = threading.Lock()
+_ids: Dict[str, int] = {}
+
+
+def canonical_skill(raw: Any) -> Optional[str]:
+    """Canonical display name for a raw skill string, or None when it is empty/junk."""
+    name = " ".join(str(raw or "").split()).strip(" .,;:")
+    if not name or len(name) > _MAX_SKILL_CHARS:
+        return None
+    lowered = name.lower()
+    candidates = (
+        lowered,
+        _SEPARATOR_RE.sub(" ", lowered),
+        _SEPARATOR_RE.sub("", lowered),
+        _VERSION_SUFFIX_RE.sub("", lowered),
+    )
+    for candidate in candidates:
+        if candidate in _ALIAS_TO_CANONICAL:
+            return _ALIAS_TO_CANONICAL[candidate]
+    return name
+
+
+def skill_key(raw: Any) -> Optional[str]:
+    name = canonical_skill(raw)
+    return name.lower() if name else None
+
+
+def canonical_skills(raw_skills: Optional[Iterable[Any]]) -> List[str]:
+    """Canonical names, de-duplicated by key, in first-mention order."""
+    seen = set()
+    names = []
+    for raw in raw_skills or []:
+        name = canonical_skill(raw)
+        if name and name.lower() not in seen:
+            seen.add(name.lower())
+            names.append(name)
+    return names
+
+
+def resolve_skill_ids(cur, skill_lists: Sequence[Sequence[str]], *, cache: bool = True) -> List[List[int]]:
+    """
+    Ids for lists of canonical names (as returned by canonical_skills), adding
+    unknown skills to the table. Runs on the caller's cursor so the new skills
+    commit (or roll back) together with the rows that reference them.
+    cache=False for callers that insert several batches in one transaction,
+    where the SELECT can read back this transaction's own uncommitted ids.
+    """
+    names = {name.lower(): name for skills in skill_lists for name in skills}
+    with _ids_lock:
+        ids = {key: _ids[key] for key in names if key in _ids}
+
+    missing = [key for key in names if key not in ids]
+    if missing:
+        cur.execute("SELECT key, id FROM skills WHERE key = ANY(%s)", [missing])
+        found = dict(cur.fetchall())
+        if cache:
+            with _ids_lock:
+                _ids.update(found)
+        ids.update(found)
+
+        # Sorted so concurrent ingests lock new keys in the same order.
+        new = sorted((key, names[key]) for key in missing if key not in found)
+        if new:
+            # DO UPDATE (a no-op) so RETURNING also covers rows another
+            # transaction inserted concurrently. Not cached until read back
+            # committed: this transaction may still roll back.
+            ids.update(dict(execute_values(
+                cur,
+                """
+                INSERT INTO skills (key, name) VALUES %s
+                ON CONFLICT (key) DO UPDATE SET key = EXCLUDED.key
+                RETURNING key, id
+                """,
+                new,
+                fetch=True,
+            )))
+
+    return [[ids[name.lower()] for name in skills] for skills in skill_lists]
+
+
+def jd_skill_metadata(cur, primary_skills: Any, secondary_skills: Any, *, cache: bool = True) -> Dict[str, Any]:
+    """Canonical primary/secondary skills of a JD plus their ids, for memories.metadata."""
+    primary = canonical_skills(primary_skills if isinstance(primary_skills, list) else [])
+    primary_keys = {name.lower() for name in primary}
+    # A skill listed as both primary and secondary counts as primary.
+    secondary = [
+        name
+        for name in canonical_skills(secondary_skills if isinstance(secondary_skills, list) else [])
+        if name.lower() not in primary_keys
+    ]
+    primary_ids, secondary_ids = resolve_skill_ids(cur, [primary, secondary], cache=cache)
+    return {
+        "primary_skills": primary,
+        "secondary_skills": secondary,
+        "primary_skill_ids": primary_ids,
+        "secondary_skill_ids": secondary_ids,
+    }
+
+
+def backfill_skill_ids(cur, batch_size: int = 500) -> int:
+    """Canonicalize and index skills of rows saved before the taxonomy existed."""
+    updated = 0
+    while True:
+        cur.execute(
+            """
+            SELECT id, metadata->'skills' FROM resumes
+            WHERE skill_ids IS NULL
+            LIMIT %s
+            """,
+            [batch_size],
+        )
+        rows = cur.fetchall()
+        if not rows:
+            break
+        skills = [canonical_skills(raw if isinstance(raw, list) else []) for _, raw in rows]
+        ids = resolve_skill_ids(cur, skills, cache=False)
+        execute_values(
+            cur,
+            """
+            UPDATE resumes AS r
+            SET skill_ids = v.skill_ids,
+                metadata = COALESCE(r.metadata, '{}'::jsonb) || v.patch
+            FROM (VALUES %s) AS v(id, skill_ids, patch)
+            WHERE r.id = v.id
+            """,
+            [
+                (resume_id, skill_ids, json.dumps({"skills": names}))
+                for (resume_id, _), names, skill_ids in zip(rows, skills, ids)
+            ],
+            template="(%s::uuid, %s::int[], %s::jsonb)",
+        )
+        updated += len(rows)
+
+    cur.execute(
+        """
+        SELECT id, metadata->'primary_skills', metadata->'secondary_skills' FROM memories
+        WHERE type = 'job' AND metadata IS NOT NULL AND NOT metadata ? 'primary_skill_ids'
+        """
+    )
+    for memory_id, primary, secondary in cur.fetchall():
+        cur.execute(
+            "UPDATE memories SET metadata = metadata || %s::jsonb WHERE id = %s",
+            [json.dumps(jd_skill_metadata(cur, primary, secondary, cache=False)), memory_id],
+        )
+        updated += 1
+    return updated
@@ -0,0 +1,271 @@
+"""
+JSON replies from Gemini for the resume and JD parsers.
+
+generate_json() asks for native structured output (response_mime_type plus a
+response_schema converted from the parser's JSON schema), streams the reply
+through JSONStreamScanner and stops reading as soon as the top-level value is
+closed, or as soon as the text cannot be JSON. A reply that does not parse
+is repaired locally (code fences, trailing commas, single quotes, truncation)
+before a second model call is made; at most LLM_JSON_MAX_RECALLS re-calls.
+"""
+import json
+import re
+import threading
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import yaml
+
+from config import LLM_JSON_STREAM, LLM_JSON_MAX_RECALLS
+from llm_client import generate
+
+_TRAILING_COMMA_RE = re.compile(r",\s*([}\]])")
+_CLOSERS = {"{": "}", "[": "]"}
+# Truncation repair tries this many cut points, newest first.
+_MAX_CUTS = 20
+
+_lock = threading.Lock()
+_stats = {
+    "calls": 0,
+    "valid": 0,
+    "repaired": 0,
+    "recalls": 0,
+    "failed": 0,
+    "early_aborts": 0,
+}
+
+
+class StructuredOutputError(ValueError):
+    pass
+
+
+def _bump(counter: str, n: int = 1):
+    with _lock:
+        _stats[counter] += n
+
+
+def to_gemini_schema(schema: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    JSON schema -> the OpenAPI subset Gemini's response_schema accepts:
+    upper-case type names, ["x", "null"] unions as nullable, no other keywords.
+    """
+    out: Dict[str, Any] = {}
+    schema_type = schema.get("type")
+    if isinstance(schema_type, list):
+        non_null = [t for t in schema_type if t != "null"]
+        if len(non_null) < len(schema_type):
+            out["nullable"] = True
+        schema_type = non_null[0] if non_null else "string"
+    if schema_type:
+        out["type"] = schema_type.upper()
+    for key in ("description", "enum", "nullable"):
+        if key in schema:
+            out[key] = schema[key]
+    if "properties" in schema:
+        out["properties"] = {name: to_gemini_schema(prop) for name, prop in schema["properties"].items()}
+    if "required" in schema:
+        out["required"] = list(schema["required"])
+    if "items" in schema:
+        out["items"] = to_gemini_schema(schema["items"])
+    return out
+
+
+class JSONStreamScanner:
+    """
+    Structural check of a JSON reply fed chunk by chunk: tracks open
+    containers and string state, notices when the top-level value is closed,
+    and flags text that cannot be JSON (mismatched brackets, or prose where the
+    value should start). Also records where a truncated reply can be cut and
+    closed again.
+    """
+
+    MAX_PREAMBLE = 256  # e.g. a ```json fence before the value
+
+    def __init__(self):
+        self.stack: List[str] = []
+        self.in_string = False
+        self.complete = False
+        self.invalid = False
+        self.start: Optional[int] = None
+        self.end: Optional[int] = None
+        # (offset, open containers) just before a ',' or just after a bracket
+        self.cut_points: List[Tuple[int, Tuple[str, ...]]] = []
+        self._offset = 0
+        self._escape = False
+
+    def feed(self, chunk: str):
+        for ch in chunk:
+            if self.complete or self.invalid:
+                return
+            self._feed_char(ch)
+            self._offset += 1
+
+    def _feed_char(self, ch: str):
+        if self.in_string:
+            if self._escape:
+                self._escape = False
+            elif ch == "\\":
+                self._escape = True
+            elif ch == '"':
+                self.in_string = False
+            return
+
+        if self.start is None:
+            if ch not in "{[":
+                if self._offset >= self.MAX_PREAMBLE:
+                    self.invalid = True
+                return
+            self.start = self._offset
+
+        if ch == '"':
+            self.in_string = True
+        elif ch in "{[":
+            self.stack.append(ch)
+            self.cut_points.append((self._offset + 1, tuple(self.stack)))
+        elif ch in "}]":
+            if not self.stack or _CLOSERS[self.stack[-1]] != ch:
+                self.invalid = True
+                return
+            self.stack.pop()
+            if not self.stack:
+                self.complete = True
+                self.end = self._offset + 1
+            else:
+                self.cut_points.append((self._offset + 1, tuple(self.stack)))
+        elif ch == ",":
+            self.cut_points.append((self._offset, tuple(self.stack)))
+
+
+def _strip_code_fences(text: str) -> str:
+    text = text.strip()
+    if text.startswith("```json"):
+        text = text[7:]
+    if text.startswith("```"):
+        text = text[3:]
+    if text.endswith("```"):
+        text = text[:-3]
+    return text.strip()
+
+
+def _repair_candidates(text: str) -> Iterator[str]:
+    scanner = JSONStreamScanner()
+    scanner.feed(text)
+    if scanner.start is None:
+        return
+
+    if scanner.complete:
+        # Drop prose/fences around the value; then fix trailing commas.
+        body = text[scanner.start:scanner.end]
+        yield body
+        yield _TRAILING_COMMA_RE.sub(r"\1", body)
+        return
+    if scanner.invalid:
+        yield text[scanner.start:]
+        return
+
+    # Truncated: cut back to a clean boundary and close what is still open.
+    # A top-level array is only cut between items, so a half-written item is
+    # dropped rather than passed off as complete.
+    root_is_array = text[scanner.start] == "["
+    tried = 0
+    for offset, stack in reversed(scanner.cut_points):
+        if root_is_array and len(stack) != 1:
+            continue
+        yield text[scanner.start:offset] + "".join(_CLOSERS[c] for c in reversed(stack))
+        tried += 1
+        if tried >= _MAX_CUTS:
+            return
+
+
+def parse_json_reply(text: str, expected: type = dict) -> Tuple[Any, str]:
+    """
+    Returns (value, "valid" | "repaired") for a reply whose top-level value is
+    of type `expected`; raises ValueError when nothing usable is recoverable.
+    """
+    text = _strip_code_fences(text or "")
+    try:
+        value = json.loads(text)
+        if isinstance(value, expected):
+            return value, "valid"
+    except ValueError:
+        pass
+
+    for candidate in _repair_candidates(text):
+        try:
+            value = json.loads(candidate)
+        except ValueError:
+            # Single quotes, bare words, Python literals...
+            try:
+                value = yaml.safe_load(candidate)
+            except yaml.YAMLError:
+                continue
+        if isinstance(value, expected):
+            return value, "repaired"
+    raise ValueError("LLM response missing valid JSON")
+
+
+def _consume_stream(response: Any) -> str:
+    scanner = JSONStreamScanner()
+    parts = []
+    for chunk in response:
+        try:
+            text = chunk.text
+        except ValueError:
+            continue  # chunk without text parts (e.g. the final finish_reason chunk)
+        parts.append(text)
+        scanner.feed(text)
+        if scanner.complete:
+            break
+        if scanner.invalid:
+            _bump("early_aborts")
+            break
+    return "".join(parts)
+
+
+def _read_reply(prompt: str, generation_config: Dict[str, Any]) -> str:
+    if LLM_JSON_STREAM:
+        return generate(prompt, generation_config=generation_config, stream=True, consume=_consume_stream)
+    return generate(prompt, generation_config=generation_config).text or ""
+
+
+def generate_json(prompt: str, schema: Dict[str, Any], *, max_recalls: Optional[int] = None) -> Any:
+    """
+    Structured-output call returning the decoded top-level value (dict or list,
+    per `schema`). Raises StructuredOutputError once repair and re-calls are
+    exhausted; API errors propagate unchanged.
+    """
+    if max_recalls is None:
+        max_recalls = LLM_JSON_MAX_RECALLS
+    generation_config = {
+        "response_mime_type": "application/json",
+        "response_schema": to_gemini_schema(schema),
+    }
+    expected = list if schema.get("type") == "array" else dict
+
+    _bump("calls")
+    error: Optional[Exception] = None
+    for attempt in range(max_recalls + 1):
+        if attempt:
+            _bump("recalls")
+        reply = _read_reply(prompt, generation_config)
+        try:
+            value, outcome = parse_json_reply(reply, expected)
+        except ValueError as e:
+            print(f"Unusable JSON reply (attempt {attempt + 1}): {e}; reply starts {reply[:200]!r}")
+            error = e
+            continue
+        _bump(outcome)
+        return value
+
+    _bump("failed")
+    raise StructuredOutputError(str(error))
+
+
+def get_structured_output_stats() -> Dict[str, Any]:
+    with _lock:
+        stats = dict(_stats)
+    calls = stats["calls"]
+    stats["stream"] = LLM_JSON_STREAM
+    stats["max_recalls"] = LLM_JSON_MAX_RECALLS
+    stats["repair_rate"] = round(stats["repaired"] / calls, 3) if calls else 0.0
+    stats["recall_rate"] = round(stats["recalls"] / calls, 3) if calls else 0.0
+    return stats
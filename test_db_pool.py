@@ -0,0 +1,185 @@
+import threading
+import time
+from unittest.mock import MagicMock, patch
+
+import psycopg2
+import pytest
+from psycopg2 import extensions
+
+import db
+from db import ConnectionPool, PoolTimeout
+
+
+def _fake_connection():
+    conn = MagicMock()
+    conn.closed = 0
+    conn.autocommit = False
+    conn.readonly = False
+    conn.isolation_level = extensions.ISOLATION_LEVEL_DEFAULT
+    conn.info.transaction_status = extensions.TRANSACTION_STATUS_IDLE
+    return conn
+
+
+@pytest.fixture
+def connections():
+    opened = []
+
+    def connect():
+        opened.append(_fake_connection())
+        return opened[-1]
+
+    with patch.object(db, "_connect", side_effect=connect), patch.object(db, "_register_vector", return_value=True):
+        yield opened
+
+
+def _pool(**kwargs):
+    options = {"min_size": 0, "max_size": 2, "timeout": 1.0, "max_lifetime": 0, "healthcheck_idle": 60}
+    options.update(kwargs)
+    return ConnectionPool(**options)
+
+
+def test_close_returns_the_connection_for_reuse(connections):
+    pool = _pool()
+
+    first = pool.getconn()
+    first.close()
+    second = pool.getconn()
+
+    assert len(connections) == 1
+    assert second.raw is connections[0]
+    assert pool.stats()["checkouts"] == 2
+    connections[0].close.assert_not_called()
+
+
+def test_released_proxy_refuses_further_use(connections):
+    pool = _pool()
+    conn = pool.getconn()
+    conn.close()
+
+    assert conn.closed == 1
+    with pytest.raises(psycopg2.InterfaceError):
+        conn.cursor()
+    with pytest.raises(psycopg2.InterfaceError):
+        conn.autocommit = True
+
+
+def test_attribute_writes_reach_the_real_connection(connections):
+    conn = _pool().getconn()
+
+    conn.autocommit = True
+
+    assert connections[0].autocommit is True
+
+
+def test_release_rolls_back_an_open_transaction(connections):
+    pool = _pool()
+    conn = pool.getconn()
+    connections[0].info.transaction_status = extensions.TRANSACTION_STATUS_INTRANS
+
+    conn.close()
+
+    connections[0].rollback.assert_called()
+    connections[0].reset.assert_not_called()
+    assert pool.stats()["idle"] == 1
+
+
+def test_release_resets_borrower_session_settings(connections):
+    pool = _pool()
+    conn = pool.getconn()
+    conn.autocommit = True
+
+    conn.close()
+
+    connections[0].reset.assert_called_once()
+    assert connections[0].autocommit is False
+    assert pool.stats()["idle"] == 1
+
+
+def test_failed_reset_discards_the_connection(connections):
+    pool = _pool()
+    conn = pool.getconn()
+    conn.readonly = True
+    connections[0].reset.side_effect = psycopg2.OperationalError("server closed the connection")
+
+    conn.close()
+
+    stats = pool.stats()
+    assert (stats["idle"], stats["size"], stats["connections_closed"]) == (0, 0, 1)
+
+
+def test_expired_connection_is_recycled_on_release(connections):
+    pool = _pool(max_lifetime=10)
+    conn = pool.getconn()
+
+    with patch.object(db.time, "monotonic", return_value=time.monotonic() + 11):
+        conn.close()
+
+    stats = pool.stats()
+    assert (stats["idle"], stats["size"], stats["connections_recycled"]) == (0, 0, 1)
+    connections[0].close.assert_called_once()
+
+
+def test_expired_idle_connection_is_replaced_on_checkout(connections):
+    pool = _pool(max_lifetime=10)
+    pool.getconn().close()
+
+    with patch.object(db.time, "monotonic", return_value=time.monotonic() + 11):
+        conn = pool.getconn()
+
+    assert conn.raw is connections[1]
+    assert pool.stats()["connections_recycled"] == 1
+
+
+def test_broken_idle_connection_is_replaced_on_checkout(connections):
+    pool = _pool(healthcheck_idle=0)
+    pool.getconn().close()
+    connections[0].cursor.side_effect = psycopg2.OperationalError("connection lost")
+
+    conn = pool.getconn()
+
+    assert conn.raw is connections[1]
+    assert pool.stats()["healthcheck_failures"] == 1
+
+
+def test_saturated_pool_times_out(connections):
+    pool = _pool(max_size=1, timeout=0.05)
+    held = pool.getconn()
+
+    with pytest.raises(PoolTimeout):
+        pool.getconn()
+    assert pool.stats()["timeouts"] == 1
+    held.close()
+
+
+def test_dropped_proxy_returns_its_connection(connections):
+    pool = _pool(max_size=1)
+    conn = pool.getconn()
+
+    del conn
+
+    assert pool.stats()["idle"] == 1
+
+
+def test_waiter_gets_the_released_connection(connections):
+    pool = _pool(max_size=1, timeout=5)
+    held = pool.getconn()
+    got = []
+    waiter = threading.Thread(target=lambda: got.append(pool.getconn()))
+    waiter.start()
+
+    while pool.stats()["waiting"] == 0:
+        time.sleep(0.005)
+    held.close()
+    waiter.join(timeout=5)
+
+    assert got and got[0].raw is connections[0]
+    assert pool.stats()["waits"] == 1
+
+
+def test_warm_up_opens_min_size_connections(connections):
+    pool = _pool(min_size=2, max_size=3)
+
+    pool.warm_up()
+
+    stats = pool.stats()
+    assert (stats["size"], stats["idle"], len(connections)) == (2, 2, 2)
@@ -0,0 +1,118 @@
+import pytest
+
+from resume_prefill import (
+    extract_email,
+    extract_experience_years,
+    extract_name,
+    extract_phone,
+    extract_skills,
+    extract_title,
+    parse_resume_offline,
+    prefill_resume,
+    split_sections,
+)
+
+RESUME = """JANE DOE
+Senior Data Engineer | jane.doe@Example.com | +1 (415) 555-0199
+Summary
+Data engineer with 7+ years of experience building pipelines.
+Skills:
+Python, Apache Spark, React, Rust, PostgreSQL
+Experience
+Acme Corp 01.2015 - 03.2018
+Able to react quickly to incidents.
+Education
+B.Tech Computer Science 2014
+"""
+
+
+def test_split_sections_groups_lines_under_headers():
+    sections = split_sections(RESUME)
+
+    assert sections["header"][0] == "JANE DOE"
+    assert sections["skills"] == ["Python, Apache Spark, React, Rust, PostgreSQL"]
+    assert sections["education"] == ["B.Tech Computer Science 2014"]
+
+
+def test_prefill_resume_fields():
+    assert prefill_resume(RESUME) == {
+        "candidate_name": "Jane Doe",
+        "email": "jane.doe@example.com",
+        "phone": "+1 (415) 555-0199",
+        "current_title": "Senior Data Engineer",
+        "total_experience_years": 7,
+    }
+
+
+@pytest.mark.parametrize(
+    "text",
+    [
+        "Acme Corp 2015 - 2018 2019 - 2021",
+        "Worked there 01.2015 - 03.2018",
+        "Period: 2015 - 03.2018",
+    ],
+)
+def test_extract_phone_ignores_date_ranges(text):
+    assert extract_phone(text) is None
+
+
+@pytest.mark.parametrize("phone", ["+91 98765 43210", "(415) 555-0199", "415.555.0199", "+1-415-555-0199"])
+def test_extract_phone_keeps_real_numbers(phone):
+    assert extract_phone(f"Call me on {phone} any time") == phone
+
+
+def test_extract_email_is_lowercased():
+    assert extract_email("Mail: John.Smith@Mail.COM") == "john.smith@mail.com"
+    assert extract_email("no address here") is None
+
+
+@pytest.mark.parametrize(
+    "lines",
+    [
+        ["Personal Details"],
+        ["Curriculum Vitae"],
+        ["Software Engineer"],
+        ["jane@example.com"],
+        ["Skills"],
+    ],
+)
+def test_extract_name_rejects_headings_and_contact_lines(lines):
+    assert extract_name(lines) is None
+
+
+def test_extract_name_takes_first_segment_of_a_contact_line():
+    assert extract_name(["Resume", "Jane Doe | jane@example.com"]) == "Jane Doe"
+
+
+def test_extract_title_skips_the_name_and_contact_details():
+    assert extract_title(["Jane Doe", "jane@example.com", "Lead Backend Developer"], "Jane Doe") == "Lead Backend Developer"
+
+
+def test_extract_experience_years():
+    assert extract_experience_years("4.5 years of professional experience") == 4.5
+    assert extract_experience_years("10+ yrs experience in sales") == 10
+    assert extract_experience_years("graduated in 2019") is None
+
+
+def test_extract_skills_ignores_everyday_words_outside_a_skills_section():
+    prose = "Able to react quickly, swift turnaround, agile mindset, spark ideas, ruby anniversary"
+
+    assert extract_skills(prose) == []
+    assert extract_skills("Rust, Swift, Agile", skills_section=True) == ["Rust", "Swift", "Agile"]
+    assert extract_skills("Built with React.js and Apache Spark") == ["React", "Spark"]
+
+
+def test_parse_resume_offline_uses_the_skills_section():
+    parsed = parse_resume_offline(RESUME)
+
+    assert parsed["parse_mode"] == "offline"
+    assert parsed["skills"] == ["Python", "Spark", "React", "Rust", "PostgreSQL"]
+    assert parsed["education"][0]["year"] == "2014"
+    assert parsed["summary"].startswith("Data engineer")
+
+
+def test_parse_resume_offline_without_a_name():
+    parsed = parse_resume_offline("worked with python and docker")
+
+    assert parsed["candidate_name"] == "Unknown Candidate"
+    assert parsed["skills"] == ["Python", "Docker"]
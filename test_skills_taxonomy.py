@@ -0,0 +1,82 @@
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+import skills_taxonomy
+from skills_taxonomy import canonical_skill, canonical_skills, resolve_skill_ids, skill_key
+
+
+@pytest.mark.parametrize(
+    "raw, expected",
+    [
+        ("python3", "Python"),
+        ("  Py ", "Python"),
+        ("Python 3.10", "Python"),
+        ("java8", "Java"),
+        ("Angular 15", "Angular"),
+        ("Node JS", "Node.js"),
+        ("node-js", "Node.js"),
+        ("scikit_learn", "scikit-learn"),
+        ("Spring Boot", "Spring"),
+        ("C++", "C++"),
+        ("c#", "C#"),
+        ("ReactJS.", "React"),
+    ],
+)
+def test_canonical_skill_resolves_aliases(raw, expected):
+    assert canonical_skill(raw) == expected
+
+
+def test_canonical_skill_keeps_unknown_names_and_their_versions():
+    assert canonical_skill("Apache   Beam") == "Apache Beam"
+    # The version is only stripped when what is left is a known skill.
+    assert canonical_skill("Oracle 19") == "Oracle 19"
+
+
+@pytest.mark.parametrize("raw", [None, "", "  ;; ", "x" * 61])
+def test_canonical_skill_rejects_junk(raw):
+    assert canonical_skill(raw) is None
+
+
+def test_skill_key_is_the_lowercased_canonical_name():
+    assert skill_key("K8s") == "kubernetes"
+    assert skill_key("") is None
+
+
+def test_canonical_skills_dedupes_by_key_in_first_mention_order():
+    assert canonical_skills(["python", "SQL", "Python 3", None, "sql", "Go", "golang"]) == ["Python", "SQL", "Go"]
+    assert canonical_skills(None) == []
+
+
+@pytest.fixture
+def empty_id_cache():
+    with patch.dict(skills_taxonomy._ids, clear=True):
+        yield skills_taxonomy._ids
+
+
+def test_resolve_skill_ids_reads_known_and_inserts_new_keys(empty_id_cache):
+    cur = MagicMock()
+    cur.fetchall.return_value = [("python", 1)]
+    with patch.object(skills_taxonomy, "execute_values", return_value=[("airflow", 7), ("dbt", 8)]) as insert:
+        ids = resolve_skill_ids(cur, [["Python", "dbt"], ["Airflow", "Python"]])
+
+    assert ids == [[1, 8], [7, 1]]
+    # New keys are inserted in sorted order and not cached until committed.
+    assert insert.call_args.args[2] == [("airflow", "Airflow"), ("dbt", "dbt")]
+    assert empty_id_cache == {"python": 1}
+
+
+def test_resolve_skill_ids_skips_the_database_for_cached_keys(empty_id_cache):
+    empty_id_cache.update({"python": 1, "sql": 2})
+    cur = MagicMock()
+
+    assert resolve_skill_ids(cur, [["Python", "SQL"], []]) == [[1, 2], []]
+    cur.execute.assert_not_called()
+
+
+def test_resolve_skill_ids_without_cache_leaves_it_untouched(empty_id_cache):
+    cur = MagicMock()
+    cur.fetchall.return_value = [("python", 1)]
+
+    assert resolve_skill_ids(cur, [["Python"]], cache=False) == [[1]]
+    assert empty_id_cache == {}
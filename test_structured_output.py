@@ -0,0 +1,138 @@
+from types import SimpleNamespace
+from unittest.mock import patch
+
+import pytest
+
+import structured_output
+from structured_output import (
+    JSONStreamScanner,
+    StructuredOutputError,
+    generate_json,
+    parse_json_reply,
+    to_gemini_schema,
+)
+
+
+def test_to_gemini_schema_converts_nullable_unions():
+    schema = {
+        "type": "object",
+        "properties": {
+            "name": {"type": ["string", "null"], "description": "full name"},
+            "skills": {"type": "array", "items": {"type": "string"}, "minItems": 1},
+        },
+        "required": ["name"],
+        "additionalProperties": False,
+    }
+
+    assert to_gemini_schema(schema) == {
+        "type": "OBJECT",
+        "properties": {
+            "name": {"type": "STRING", "nullable": True, "description": "full name"},
+            "skills": {"type": "ARRAY", "items": {"type": "STRING"}},
+        },
+        "required": ["name"],
+    }
+
+
+def test_scanner_ignores_brackets_inside_strings():
+    scanner = JSONStreamScanner()
+    scanner.feed('{"a": "x}]\\"{", ')
+    assert not scanner.complete and scanner.stack == ["{"]
+
+    scanner.feed('"b": [1]} trailing')
+    assert scanner.complete and not scanner.invalid
+    assert scanner.end == len('{"a": "x}]\\"{", "b": [1]}')
+
+
+def test_scanner_flags_mismatched_brackets_and_prose():
+    mismatched = JSONStreamScanner()
+    mismatched.feed('{"a": [1}')
+    assert mismatched.invalid
+
+    prose = JSONStreamScanner()
+    prose.feed("I could not find any resume in the text you sent. " * 10)
+    assert prose.invalid and prose.start is None
+
+
+def test_scanner_allows_a_short_preamble():
+    scanner = JSONStreamScanner()
+    scanner.feed('```json\n{"a": 1}')
+    assert scanner.complete and scanner.start == len("```json\n")
+
+
+def test_parse_json_reply_valid():
+    assert parse_json_reply('{"a": 1}') == ({"a": 1}, "valid")
+    assert parse_json_reply("[1, 2]", list) == ([1, 2], "valid")
+
+
+@pytest.mark.parametrize(
+    "reply, expected",
+    [
+        ('```json\n{"a": 1}\n```', ({"a": 1}, "valid")),
+        ('Here you go: {"a": 1} Hope that helps!', ({"a": 1}, "repaired")),
+        ('{"a": [1, 2,], "b": 3,}', ({"a": [1, 2], "b": 3}, "repaired")),
+        ("{'a': 'single quoted'}", ({"a": "single quoted"}, "repaired")),
+    ],
+)
+def test_parse_json_reply_repairs(reply, expected):
+    assert parse_json_reply(reply) == expected
+
+
+def test_parse_json_reply_closes_a_truncated_object():
+    value, outcome = parse_json_reply('{"name": "Jane", "skills": ["Python", "SQL"], "summary": "Data eng')
+
+    assert outcome == "repaired"
+    assert value == {"name": "Jane", "skills": ["Python", "SQL"]}
+
+
+def test_parse_json_reply_drops_a_half_written_array_item():
+    value, outcome = parse_json_reply('[{"name": "A", "skills": ["x"]}, {"name": "B", "skills": ["y"', list)
+
+    assert outcome == "repaired"
+    assert value == [{"name": "A", "skills": ["x"]}]
+
+
+def test_parse_json_reply_rejects_wrong_type_and_prose():
+    with pytest.raises(ValueError):
+        parse_json_reply("[1, 2]", dict)
+    with pytest.raises(ValueError):
+        parse_json_reply("Sorry, I can't help with that.")
+
+
+def _chunks(*texts):
+    return [SimpleNamespace(text=text) for text in texts]
+
+
+def test_consume_stream_stops_once_the_value_is_closed():
+    consumed = []
+
+    def stream():
+        for chunk in _chunks('{"a":', ' 1}', "never read"):
+            consumed.append(chunk.text)
+            yield chunk
+
+    assert structured_output._consume_stream(stream()) == '{"a": 1}'
+    assert consumed == ['{"a":', " 1}"]
+
+
+def test_consume_stream_aborts_on_invalid_text():
+    before = structured_output.get_structured_output_stats()["early_aborts"]
+
+    reply = structured_output._consume_stream(iter(_chunks('{"a": ]', "more")))
+
+    assert reply == '{"a": ]'
+    assert structured_output.get_structured_output_stats()["early_aborts"] == before + 1
+
+
+def test_generate_json_recalls_until_usable():
+    replies = iter(["no json here", '{"a": 1}'])
+    with patch.object(structured_output, "_read_reply", side_effect=lambda *a: next(replies)) as read:
+        assert generate_json("prompt", {"type": "object"}, max_recalls=1) == {"a": 1}
+    assert read.call_count == 2
+
+
+def test_generate_json_raises_after_the_last_recall():
+    with patch.object(structured_output, "_read_reply", return_value="no json here") as read:
+        with pytest.raises(StructuredOutputError):
+            generate_json("prompt", {"type": "object"}, max_recalls=2)
+    assert read.call_count == 3
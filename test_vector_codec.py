@@ -0,0 +1,47 @@
+import numpy as np
+from psycopg2.extensions import ISQLQuote
+
+from config import EMBEDDING_STORAGE
+from vector_codec import VectorParam, format_vector, parse_vector, to_float32, vector_param
+
+
+def test_format_vector_round_trips_float32_exactly():
+    vec = np.random.default_rng(0).standard_normal(768).astype(np.float32)
+
+    parsed = parse_vector(format_vector(vec))
+
+    assert parsed.dtype == np.float32
+    assert np.array_equal(parsed, vec)
+
+
+def test_format_vector_is_compact():
+    text = format_vector([0.1, -2.5, 1e-7, 0.0])
+
+    assert text == "[0.100000001,-2.5,1.00000001e-07,0]"
+
+
+def test_to_float32_accepts_text_lists_and_arrays():
+    expected = np.array([1.0, 2.5, -3.0], dtype=np.float32)
+
+    assert np.array_equal(to_float32("[1,2.5,-3]"), expected)
+    assert np.array_equal(to_float32([1, 2.5, -3]), expected)
+    assert np.array_equal(to_float32(np.array([[1.0, 2.5, -3.0]])), expected)
+
+
+def test_parse_vector_tolerates_whitespace():
+    assert np.array_equal(parse_vector(" [1, 2,3] \n"), np.array([1, 2, 3], dtype=np.float32))
+
+
+def test_vector_param_renders_as_storage_literal():
+    param = vector_param([0.5, -1])
+
+    assert param.__conform__(ISQLQuote) is param
+    assert param.__conform__(object()) is None
+    assert param.getquoted() == f"'[0.5,-1]'::{EMBEDDING_STORAGE}".encode("ascii")
+    assert len(param) == 2
+
+
+def test_vector_param_does_not_rewrap():
+    param = VectorParam([1, 2, 3])
+
+    assert vector_param(param) is param